@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserFiles, FileDownloadTransaction, AiSummaries, UserProfile, FileChunk
+from .models import UserFiles, FileDownloadTransaction, AiSummaries, UserProfile, FileChunk, FileBlob, DownloadRollup, UserUsage
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -13,6 +13,12 @@ class UserFilesAdmin(admin.ModelAdmin):
     search_fields = ('file_title', 'user__username', 'file_name', 'upload_id')
     list_filter = ('user', 'uploaded_at', 'is_upload_complete')
 
+@admin.register(FileBlob)
+class FileBlobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'content_hash', 'size', 'ref_count', 'created_at')
+    search_fields = ('content_hash',)
+    readonly_fields = ('created_at',)
+
 @admin.register(FileChunk)
 class FileChunkAdmin(admin.ModelAdmin):
     list_display = ('id', 'user_file', 'chunk_number', 'chunk_size', 'is_uploaded', 'uploaded_at')
@@ -22,9 +28,21 @@ class FileChunkAdmin(admin.ModelAdmin):
 
 @admin.register(FileDownloadTransaction)
 class FileDownloadTransactionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'file', 'user', 'timestamp', 'ip_address', 'user_agent')
+    list_display = ('id', 'file', 'user', 'timestamp', 'ip_address', 'browser', 'os', 'device')
     search_fields = ('file__file_title', 'user__username', 'ip_address', 'user_agent')
-    list_filter = ('user', 'timestamp')
+    list_filter = ('user', 'timestamp', 'browser', 'os', 'device')
+
+@admin.register(UserUsage)
+class UserUsageAdmin(admin.ModelAdmin):
+    list_display = ('user', 'file_count', 'total_bytes', 'total_downloads', 'updated_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('updated_at',)
+
+@admin.register(DownloadRollup)
+class DownloadRollupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'file', 'day', 'browser', 'device', 'count')
+    search_fields = ('file__file_title',)
+    list_filter = ('day', 'browser', 'device')
 
 @admin.register(AiSummaries)
 class AiSummariesAdmin(admin.ModelAdmin):
@@ -1,25 +1,53 @@
 import os
+import re
+import uuid
 import random
 import string
+import hashlib
 import logging
 from ninja import File, Form, NinjaAPI
+from ninja.decorators import decorate_view
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 from ninja.files import UploadedFile
 from ninja_jwt.authentication import JWTAuth
 from project_main import settings
-from .models import UserFiles, FileDownloadTransaction, AiSummaries, UserProfile, FileChunk
+from .models import UserFiles, FileDownloadTransaction, AiSummaries, UserProfile, FileChunk, DownloadRollup
 from .schemas import (SignupIn, LoginIn, TokenOut, FileUploadIn, UserFileOut, AiSummaryOut, 
                      GenerateSummaryIn, UserProfileOut, UserProfileUpdateIn, TokenOutWithProfile,
                      ChunkedUploadInitIn, ChunkedUploadChunkIn, ChunkedUploadCompleteIn, ChunkedUploadStatusOut)
-from .utils.encryption import encrypt_file_content, decrypt_file_content, AES_KEY, random_filename
+from .utils.encryption import (iter_decrypt_file, detect_format,
+                               new_container_header, encrypt_segment,
+                               SegmentedReader, ContainerError, FORMAT_SEGMENTED, HEADER_SIZE, SEGMENT_OVERHEAD,
+                               AES_KEY)
 from .utils.file_extractor import FileContentExtractor
+from .utils.compression import CODEC_NONE
+from .utils.http_range import parse_byte_range, if_range_matches, RangeNotSatisfiable
+from .utils.chunk_bitmap import set_chunks, is_set, count_set, missing_ranges, expand_ranges
+from .utils.blob_store import find_blob, acquire_blob, store_blob, release_blob
+from .utils.storage import get_storage
+from .utils.upload_handlers import encrypt_uploaded_file, encrypt_uploads_on_receipt
+from .utils.download_log import log_download
+from .utils.download_export import EXPORT_FORMATS, download_history, iter_export
+from .utils.time_series import time_series
+from .utils.usage import get_usage, record_file_stored, record_file_removed
+from .utils.stats_cache import cached_stats, cache_metrics, invalidate_user_stats
+from .utils.dashboard import (dashboard, parse_sections, daily_points, daily_downloads_chart, daily_uploads_chart,
+                              device_pie_chart, device_bar_chart, browser_pie_chart, overview)
+from .utils.upload_assembly import (get_chunks_dir, get_upload_storage_name, get_upload_name, get_container_header,
+                                    assemble_chunked_upload,
+                                    set_completion_phase, ACTIVE_PHASES, PHASE_QUEUED, PHASE_FAILED)
 from .utils.ai_summarizer import get_mistral_summarizer
 from .utils.event_publisher import event_publisher
 from .utils.celery_event_publisher import celery_event_publisher
 from typing import List
-from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import BigIntegerField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+from datetime import date, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -178,6 +206,7 @@ def partial_update_user_profile(request, data: UserProfileUpdateIn):
     return update_user_profile(request, data)
 
 @api.post("/upload-file", auth=JWTAuth())
+@decorate_view(encrypt_uploads_on_receipt('file'))
 def upload_file(
     request,
     file_title: str = Form(...),
@@ -188,39 +217,238 @@ def upload_file(
         return api.create_response(request, {"detail": "Authentication required"}, status=401)
 
     original_filename = file.name
-    ext = os.path.splitext(original_filename)[1]
-    new_file_name = random_filename(ext)
 
-    # Read and encrypt file content
-    file_bytes = file.read()
-    encrypted_bytes = encrypt_file_content(file_bytes, AES_KEY)
-    file_size = str(len(file_bytes))  # Record file size in bytes as string
-
-    # Save encrypted content to a file in MEDIA_ROOT/user_files/
-    encrypted_path = os.path.join('user_files', new_file_name)
-    full_path = os.path.join(settings.MEDIA_ROOT, encrypted_path)
-    os.makedirs(os.path.dirname(full_path), exist_ok=True)
-    with open(full_path, 'wb') as f:
-        f.write(encrypted_bytes)
+    # Normally encrypted while the body was received (see encrypt_uploads_on_receipt)
+    encrypted = encrypt_uploaded_file(file)
+    try:
+        # Identical content already in the blob store is shared instead of stored again
+        blob = store_blob(encrypted.temp_path, encrypted.content_hash, encrypted.size,
+                          compression=encrypted.compression)
+    except Exception:
+        encrypted.discard()
+        raise
+    if encrypted.codec != CODEC_NONE:
+        logger.info(f"Compressed {original_filename} with {encrypted.compression}: "
+                    f"{encrypted.size} -> {encrypted.stored_size} bytes")
 
     # Save DB record (using Django's FileField, you can use the relative path)
-    user_file = UserFiles.objects.create(
-        file_title=file_title,
-        user=user,
-        file=encrypted_path,  # Save relative path
-        file_name=os.path.basename(original_filename),
-        file_size=file_size
-    )
+    with transaction.atomic():
+        user_file = UserFiles.objects.create(
+            file_title=file_title,
+            user=user,
+            file=blob.file.name,  # Save relative path
+            blob=blob,
+            content_hash=blob.content_hash,
+            file_name=os.path.basename(original_filename),
+            file_size=encrypted.size
+        )
+        record_file_stored(user_file)
 
     return {
         "detail": "File uploaded and encrypted successfully",
         "file_id": user_file.id,
         "file_name": user_file.file_name,
-        "stored_file_path": user_file.file.url
+        "stored_file_path": user_file.file.url,
+        "compression": blob.compression,
+        "stored_size": blob.stored_size
     }
 
 # Chunked Upload Endpoints
 
+def mark_chunks_received(user_file, chunks):
+    """
+    Set the bitmap bits for chunks, a list of (chunk_number, chunk_size, chunk_hash).
+
+    The row is locked for the read-modify-write so parallel chunk posts can't
+    lose each other's updates. Returns the refreshed UserFiles record.
+    """
+    with transaction.atomic():
+        locked = UserFiles.objects.select_for_update().get(pk=user_file.pk)
+        bitmap, newly_set = set_chunks(locked.received_chunks, [c[0] for c in chunks], locked.total_chunks)
+        locked.last_activity_at = timezone.now()
+        if newly_set:
+            locked.received_chunks = bitmap
+            locked.uploaded_chunks = count_set(bitmap)
+        locked.save(update_fields=['received_chunks', 'uploaded_chunks', 'last_activity_at'])
+        
+        if settings.UPLOAD_TRACK_CHUNK_ROWS:
+            for chunk_number, chunk_size, chunk_hash in chunks:
+                FileChunk.objects.update_or_create(
+                    user_file=locked,
+                    chunk_number=chunk_number,
+                    defaults={
+                        'chunk_size': chunk_size,
+                        'chunk_hash': chunk_hash,
+                        'is_uploaded': True
+                    }
+                )
+    return locked
+
+def get_expected_chunk_size(user_file, chunk_number):
+    """Plaintext size of a chunk: chunk_size for all but the last one"""
+    if chunk_number < user_file.total_chunks - 1:
+        return user_file.chunk_size
+    return user_file.file_size - (user_file.total_chunks - 1) * user_file.chunk_size
+
+def is_hex_digest(value, length):
+    """Whether value is a lowercase hex digest of exactly length characters"""
+    return re.fullmatch(f'[0-9a-f]{{{length}}}', value) is not None
+
+def get_chunk_hashes_path(upload_id):
+    """Per-chunk MD5 digests declared at init, 16 raw bytes per chunk"""
+    return os.path.join(get_chunks_dir(upload_id), 'hashes')
+
+def write_declared_chunk_hashes(upload_id, chunk_hashes):
+    os.makedirs(get_chunks_dir(upload_id), exist_ok=True)
+    with open(get_chunk_hashes_path(upload_id), 'wb') as f:
+        f.write(b''.join(bytes.fromhex(h) for h in chunk_hashes))
+
+def read_declared_chunk_hashes(upload_id):
+    """All declared digests of a session as a list of hex strings, or None"""
+    try:
+        with open(get_chunk_hashes_path(upload_id), 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    return [raw[i:i + 16].hex() for i in range(0, len(raw), 16)]
+
+def read_declared_chunk_hash(upload_id, chunk_number):
+    """The digest declared for one chunk, read without loading the whole list"""
+    try:
+        with open(get_chunk_hashes_path(upload_id), 'rb') as f:
+            f.seek(chunk_number * 16)
+            raw = f.read(16)
+    except FileNotFoundError:
+        return None
+    return raw.hex() if len(raw) == 16 else None
+
+def get_upload_fingerprint(file_size, chunk_size, file_hash, chunk_hashes):
+    """Identify an upload's content and chunk layout, if the client described it"""
+    if chunk_hashes:
+        content = ','.join(chunk_hashes)
+    elif file_hash:
+        content = file_hash
+    else:
+        return None
+    return hashlib.sha256(f"{file_size}:{chunk_size}:{content}".encode()).hexdigest()
+
+def find_resumable_upload(user, data, fingerprint, chunk_hashes, max_candidates=5):
+    """
+    Find an incomplete session of this user that a new init can continue.
+
+    An identical fingerprint resumes the session as is. Otherwise, with per-chunk
+    hashes, recent sessions with the same layout are compared chunk by chunk and
+    the one sharing the most received chunks is adopted: chunks whose hash no
+    longer matches are marked missing again and the new hash list is recorded.
+    """
+    if fingerprint is None:
+        return None
+    sessions = UserFiles.objects.filter(
+        user=user,
+        is_upload_complete=False,
+        file_size=data.file_size,
+        chunk_size=data.chunk_size,
+        total_chunks=data.total_chunks
+    ).order_by('-uploaded_at')
+    
+    exact = sessions.filter(upload_fingerprint=fingerprint).first()
+    if exact is not None and upload_data_exists(exact):
+        return exact
+    if not chunk_hashes:
+        return None
+    
+    best, best_matches = None, []
+    for candidate in sessions.exclude(received_chunks=None)[:max_candidates]:
+        previous_hashes = read_declared_chunk_hashes(candidate.upload_id)
+        if previous_hashes is None or len(previous_hashes) != len(chunk_hashes) or not upload_data_exists(candidate):
+            continue
+        matches = [
+            n for n, (old, new) in enumerate(zip(previous_hashes, chunk_hashes))
+            if old == new and is_set(candidate.received_chunks, n)
+        ]
+        if len(matches) > len(best_matches):
+            best, best_matches = candidate, matches
+    if best is None:
+        return None
+    
+    # Keep only the chunks whose content is unchanged
+    with transaction.atomic():
+        locked = UserFiles.objects.select_for_update().get(pk=best.pk)
+        bitmap, _ = set_chunks(None, best_matches, locked.total_chunks)
+        locked.received_chunks = bitmap
+        locked.uploaded_chunks = count_set(bitmap)
+        locked.upload_fingerprint = fingerprint
+        locked.save(update_fields=['received_chunks', 'uploaded_chunks', 'upload_fingerprint'])
+        write_declared_chunk_hashes(locked.upload_id, chunk_hashes)
+    return locked
+
+def validate_chunk(user_file, chunk_number, chunk_data, chunk_hash):
+    """Check a chunk's hash, number and size; returns an error payload or None"""
+    chunk_size = len(chunk_data)
+    
+    # Verify chunk hash if provided
+    if chunk_hash:
+        calculated_hash = hashlib.md5(chunk_data).hexdigest()
+        
+        # Handle both full hash (32 chars) and truncated hash (8 chars)
+        if len(chunk_hash) == 8:
+            calculated_short_hash = calculated_hash[:8]
+            if calculated_short_hash != chunk_hash:
+                return {
+                    "detail": f"Chunk integrity check failed. Expected: {chunk_hash}, Got: {calculated_short_hash}",
+                    "full_calculated_hash": calculated_hash,
+                    "chunk_size": chunk_size
+                }
+        elif len(chunk_hash) == 32:
+            if calculated_hash != chunk_hash:
+                return {
+                    "detail": f"Chunk integrity check failed. Expected: {chunk_hash}, Got: {calculated_hash}",
+                    "chunk_size": chunk_size
+                }
+        else:
+            return {
+                "detail": f"Invalid hash format. Expected 8 or 32 characters, got {len(chunk_hash)}"
+            }
+    
+    if not 0 <= chunk_number < user_file.total_chunks:
+        return {
+            "detail": f"Invalid chunk number {chunk_number}, expected 0 to {user_file.total_chunks - 1}"
+        }
+    
+    expected_size = get_expected_chunk_size(user_file, chunk_number)
+    if chunk_size != expected_size:
+        return {
+            "detail": f"Chunk {chunk_number} has size {chunk_size}, expected {expected_size}"
+        }
+    
+    # Chunks must match the hashes declared at init, which resume relies on
+    declared_hash = read_declared_chunk_hash(user_file.upload_id, chunk_number)
+    if declared_hash and hashlib.md5(chunk_data).hexdigest() != declared_hash:
+        return {
+            "detail": f"Chunk {chunk_number} does not match the hash declared at init",
+            "chunk_size": chunk_size
+        }
+    return None
+
+def upload_data_exists(user_file):
+    """Sessions created before chunks were encrypted on arrival have no upload data"""
+    return user_file.chunk_size is not None and get_storage().upload_exists(
+        user_file.upload_id, get_upload_name(user_file), user_file.storage_upload_id)
+
+def write_chunk_segments(user_file, chunks):
+    """
+    Encrypt each (chunk_number, chunk_data) as its own segment and hand it to storage
+    (its offset in the local part file, or its own S3 part), so plaintext never touches the disk
+    """
+    storage = get_storage()
+    header = get_container_header(user_file)
+    name = get_upload_name(user_file)
+    for chunk_number, chunk_data in chunks:
+        sealed = encrypt_segment(header, AES_KEY, chunk_number, chunk_data,
+                                 is_last=chunk_number == user_file.total_chunks - 1)
+        storage.write_segment(user_file.upload_id, name, user_file.storage_upload_id, chunk_number,
+                              user_file.chunk_size, header, sealed)
+
 @api.post("/upload-chunk/init", auth=JWTAuth())
 def init_chunked_upload(request, data: ChunkedUploadInitIn):
     """Initialize a chunked file upload session"""
@@ -228,26 +456,134 @@ def init_chunked_upload(request, data: ChunkedUploadInitIn):
     
     user = request.user
     
+    # Every chunk but the last must be exactly chunk_size, since each one becomes
+    # a fixed-size encrypted segment of the final file
+    if data.chunk_size <= 0 or data.file_size < 0:
+        return api.create_response(request, {"detail": "Invalid file_size or chunk_size"}, status=400)
+    expected_chunks = -(-data.file_size // data.chunk_size)
+    if data.total_chunks != expected_chunks:
+        return api.create_response(request, {
+            "detail": f"total_chunks does not match file_size and chunk_size (expected {expected_chunks})"
+        }, status=400)
+    
+    # Object storage puts limits on multipart uploads, which chunks map onto
+    storage = get_storage()
+    if data.total_chunks > 1 and data.chunk_size + SEGMENT_OVERHEAD < storage.min_part_size:
+        min_chunk_size = storage.min_part_size - SEGMENT_OVERHEAD
+        return api.create_response(request, {
+            "detail": f"chunk_size must be at least {min_chunk_size} bytes for this storage backend",
+            "min_chunk_size": min_chunk_size
+        }, status=400)
+    if storage.max_parts and data.total_chunks > storage.max_parts:
+        return api.create_response(request, {
+            "detail": f"At most {storage.max_parts} chunks are supported by this storage backend"
+        }, status=400)
+    
     # Generate unique upload ID
     upload_id = str(uuid.uuid4())
     
+    # Checked before anything is written to storage, so a bad digest can't leave a half-started upload behind
+    file_hash = data.file_hash.lower() if data.file_hash else None
+    if file_hash is not None and not is_hex_digest(file_hash, 64):
+        return api.create_response(request, {"detail": "file_hash must be a 64 character hex SHA-256 digest"}, status=400)
+    
+    chunk_hashes = [h.lower() for h in data.chunk_hashes] if data.chunk_hashes else None
+    if chunk_hashes is not None:
+        if len(chunk_hashes) != data.total_chunks:
+            return api.create_response(request, {"detail": "chunk_hashes must have one entry per chunk"}, status=400)
+        if not all(is_hex_digest(h, 32) for h in chunk_hashes):
+            return api.create_response(request, {"detail": "chunk_hashes must be full 32 character hex MD5 digests"}, status=400)
+    
+    # Content the user has already stored completes immediately without sending any bytes
+    if file_hash:
+        scope_user = None if settings.BLOB_INSTANT_UPLOAD_SCOPE == 'global' else user
+        blob = find_blob(file_hash, user=scope_user)
+        if blob is not None and blob.size == data.file_size:
+            with transaction.atomic():
+                blob = acquire_blob(blob)
+                user_file = UserFiles.objects.create(
+                    file_title=data.file_title,
+                    user=user,
+                    file_name=data.file_name,
+                    file_size=data.file_size,
+                    upload_id=upload_id,
+                    total_chunks=data.total_chunks,
+                    chunk_size=data.chunk_size,
+                    uploaded_chunks=data.total_chunks,
+                    is_upload_complete=True,
+                    file=blob.file.name,
+                    blob=blob,
+                    content_hash=file_hash
+                )
+                record_file_stored(user_file)
+            return {
+                "upload_id": upload_id,
+                "file_id": user_file.id,
+                "detail": "File already stored, upload completed instantly",
+                "instant": True,
+                "total_chunks": data.total_chunks,
+                "chunk_size": data.chunk_size
+            }
+    
+    # Pick up an earlier incomplete session for the same content, so only the
+    # chunks it is missing have to be sent again
+    fingerprint = get_upload_fingerprint(data.file_size, data.chunk_size, file_hash, chunk_hashes)
+    resumed = find_resumable_upload(user, data, fingerprint, chunk_hashes)
+    if resumed is not None:
+        resumed.file_title = data.file_title
+        resumed.file_name = data.file_name
+        resumed.content_hash = file_hash
+        resumed.last_activity_at = timezone.now()
+        resumed.save(update_fields=['file_title', 'file_name', 'content_hash', 'last_activity_at'])
+        missing = missing_ranges(resumed.received_chunks, resumed.total_chunks)
+        return {
+            "upload_id": resumed.upload_id,
+            "file_id": resumed.id,
+            "detail": "Resuming existing upload",
+            "instant": False,
+            "resumed": True,
+            "total_chunks": resumed.total_chunks,
+            "chunk_size": resumed.chunk_size,
+            "uploaded_chunks": resumed.uploaded_chunks,
+            "missing_chunks": expand_ranges(missing),
+            "missing_ranges": missing
+        }
+    
+    # Start the encrypted container that chunks are written into as they arrive
+    header = new_container_header(data.chunk_size)
+    storage_name = get_upload_storage_name(upload_id)
+    storage_upload_id = storage.start_upload(upload_id, storage_name, header)
+    if chunk_hashes:
+        write_declared_chunk_hashes(upload_id, chunk_hashes)
+    
     # Create initial UserFiles record
     user_file = UserFiles.objects.create(
         file_title=data.file_title,
         user=user,
         file_name=data.file_name,
-        file_size=str(data.file_size),
+        file_size=data.file_size,
         upload_id=upload_id,
         total_chunks=data.total_chunks,
+        chunk_size=data.chunk_size,
         uploaded_chunks=0,
         is_upload_complete=False,
+        content_hash=file_hash,
+        upload_fingerprint=fingerprint,
+        last_activity_at=timezone.now(),
+        container_header=header,
+        storage_name=storage_name,
+        storage_upload_id=storage_upload_id,
         file=""  # Will be set when upload is complete
     )
+    # Pending uploads show up in the upload counts
+    invalidate_user_stats(user.id)
     
     return {
         "upload_id": upload_id,
         "file_id": user_file.id,
         "detail": "Chunked upload initialized successfully",
+        "instant": False,
+        "resumed": False,
         "total_chunks": data.total_chunks,
         "chunk_size": data.chunk_size
     }
@@ -272,117 +608,135 @@ def complete_chunked_upload(request, data: ChunkedUploadCompleteIn):
         return api.create_response(request, {"detail": "Upload already completed"}, status=400)
     
     # Check if all chunks are uploaded
-    uploaded_chunks = FileChunk.objects.filter(user_file=user_file, is_uploaded=True).count()
+    uploaded_chunks = count_set(user_file.received_chunks)
     print(f"[DEBUG] Chunks status - uploaded: {uploaded_chunks}, total: {user_file.total_chunks}")
     
     if uploaded_chunks != user_file.total_chunks:
-        missing_chunks = list(range(user_file.total_chunks))
-        for chunk in FileChunk.objects.filter(user_file=user_file, is_uploaded=True):
-            missing_chunks.remove(chunk.chunk_number)
+        missing = missing_ranges(user_file.received_chunks, user_file.total_chunks)
         
-        print(f"[DEBUG] ERROR: Missing chunks found - uploaded: {uploaded_chunks}, missing: {missing_chunks}")
+        print(f"[DEBUG] ERROR: Missing chunks found - uploaded: {uploaded_chunks}, missing: {missing}")
         return api.create_response(request, {
             "detail": "Not all chunks uploaded",
             "uploaded_chunks": uploaded_chunks,
             "total_chunks": user_file.total_chunks,
-            "missing_chunks": missing_chunks
+            "missing_chunks": expand_ranges(missing),
+            "missing_ranges": missing
         }, status=400)
     
-    # Assemble chunks into final file
-    chunks_dir = os.path.join(settings.MEDIA_ROOT, 'temp_chunks', data.upload_id)
-    print(f"[DEBUG] Chunks directory: {chunks_dir}")
-    print(f"[DEBUG] Chunks directory exists: {os.path.exists(chunks_dir)}")
-    
-    if os.path.exists(chunks_dir):
-        chunk_files = os.listdir(chunks_dir)
-        print(f"[DEBUG] Files in chunks directory: {chunk_files}")
+    if not settings.UPLOAD_COMPLETE_ASYNC:
+        try:
+            response_data = assemble_chunked_upload(user_file.pk)
+            print(f"[DEBUG] Success response: {response_data}")
+            return response_data
+        except Exception as e:
+            print(f"[DEBUG] EXCEPTION in complete_chunked_upload: {str(e)}")
+            logger.error(f"Error completing chunked upload: {str(e)}")
+            return api.create_response(request, {
+                "detail": f"Error completing upload: {str(e)}"
+            }, status=500)
     
-    try:
-        # Generate final filename
-        ext = os.path.splitext(user_file.file_name)[1]
-        final_filename = random_filename(ext)
-        print(f"[DEBUG] Generated final filename: {final_filename}")
-        
-        # Assemble chunks in order
-        assembled_data = b''
-        total_assembled_size = 0
-        
-        for chunk_num in range(user_file.total_chunks):
-            chunk_file_path = os.path.join(chunks_dir, f"chunk_{chunk_num:04d}")
-            print(f"[DEBUG] Processing chunk {chunk_num}, path: {chunk_file_path}")
-            
-            if os.path.exists(chunk_file_path):
-                chunk_size = os.path.getsize(chunk_file_path)
-                print(f"[DEBUG] Chunk {chunk_num} size: {chunk_size} bytes")
-                
-                with open(chunk_file_path, 'rb') as f:
-                    chunk_data = f.read()
-                    assembled_data += chunk_data
-                    total_assembled_size += len(chunk_data)
-                    
-                print(f"[DEBUG] Chunk {chunk_num} assembled, total size so far: {total_assembled_size} bytes")
-            else:
-                print(f"[DEBUG] ERROR: Chunk file not found: {chunk_file_path}")
-                return api.create_response(request, {
-                    "detail": f"Chunk {chunk_num} file not found"
-                }, status=500)
-        
-        print(f"[DEBUG] Assembly complete - total assembled size: {len(assembled_data)} bytes")
-        print(f"[DEBUG] Expected file size from DB: {user_file.file_size}")
-        
-        # Encrypt the assembled file
-        print(f"[DEBUG] Starting encryption of assembled data...")
-        encrypted_data = encrypt_file_content(assembled_data, AES_KEY)
-        print(f"[DEBUG] Encryption complete - encrypted size: {len(encrypted_data)} bytes")
-        
-        # Save final encrypted file
-        final_path = os.path.join('user_files', final_filename)
-        full_final_path = os.path.join(settings.MEDIA_ROOT, final_path)
-        print(f"[DEBUG] Final file path: {full_final_path}")
-        
-        os.makedirs(os.path.dirname(full_final_path), exist_ok=True)
-        
-        with open(full_final_path, 'wb') as f:
-            f.write(encrypted_data)
-            
-        print(f"[DEBUG] Final encrypted file saved successfully")
-        
-        # Update UserFiles record
-        user_file.file = final_path
-        user_file.is_upload_complete = True
-        user_file.save()
-        print(f"[DEBUG] UserFiles record updated - marked as complete")
-        
-        # Clean up temporary chunk files
-        import shutil
-        if os.path.exists(chunks_dir):
-            print(f"[DEBUG] Cleaning up temporary chunks directory: {chunks_dir}")
-            shutil.rmtree(chunks_dir)
-            print(f"[DEBUG] Cleanup complete")
+    # Assembly runs as a Celery job; a retried request joins the job already running
+    stale_before = timezone.now() - timedelta(seconds=settings.UPLOAD_COMPLETE_STALE_SECONDS)
+    with transaction.atomic():
+        locked = UserFiles.objects.select_for_update().get(pk=user_file.pk)
+        if locked.is_upload_complete:
+            return api.create_response(request, {"detail": "Upload already completed"}, status=400)
+        running = (locked.completion_job_id and locked.completion_phase in ACTIVE_PHASES
+                   and locked.last_activity_at and locked.last_activity_at >= stale_before)
+        if running:
+            job_id = locked.completion_job_id
+            logger.info(f"Attaching to running completion job {job_id} for upload {data.upload_id}")
         else:
-            print(f"[DEBUG] Chunks directory not found for cleanup: {chunks_dir}")
-        
-        response_data = {
-            "detail": "File upload completed successfully",
-            "file_id": user_file.id,
-            "file_name": user_file.file_name,
-            "file_size": user_file.file_size,
-            "upload_id": data.upload_id,
-            "stored_file_path": user_file.file.url
-        }
-        print(f"[DEBUG] Success response: {response_data}")
-        return response_data
-        
+            job_id = str(uuid.uuid4())
+            locked.completion_job_id = job_id
+            locked.completion_phase = PHASE_QUEUED
+            locked.completion_bytes_done = 0
+            locked.completion_error = None
+            locked.last_activity_at = timezone.now()
+            locked.save(update_fields=['completion_job_id', 'completion_phase', 'completion_bytes_done',
+                                       'completion_error', 'last_activity_at'])
+            transaction.on_commit(lambda: enqueue_upload_completion(locked.pk, job_id))
+            logger.info(f"Queued completion job {job_id} for upload {data.upload_id}")
+    
+    return api.create_response(request, {
+        "detail": "Upload completion in progress",
+        "job_id": job_id,
+        "upload_id": data.upload_id,
+        "status_url": f"/api/upload-chunk/status/{data.upload_id}"
+    }, status=202)
+
+def enqueue_upload_completion(user_file_id, job_id):
+    """Hand a completion job to Celery, recording a failure if the broker is unreachable"""
+    from .tasks import complete_chunked_upload as complete_task
+    try:
+        complete_task.apply_async(args=[user_file_id], task_id=job_id)
     except Exception as e:
-        print(f"[DEBUG] EXCEPTION in complete_chunked_upload: {str(e)}")
-        print(f"[DEBUG] Exception type: {type(e).__name__}")
-        import traceback
-        print(f"[DEBUG] Full traceback: {traceback.format_exc()}")
-        
-        logger.error(f"Error completing chunked upload: {str(e)}")
+        logger.error(f"Could not queue completion job {job_id}: {str(e)}")
+        set_completion_phase(user_file_id, PHASE_FAILED, error="Could not queue the completion job")
+
+@api.post("/upload-chunk/batch/{upload_id}", auth=JWTAuth())
+def upload_chunk_batch(
+    request,
+    upload_id: str,
+    chunk_numbers: List[int] = Form(...),
+    chunk_hashes: List[str] = Form(None),
+    chunks: List[UploadedFile] = File(...)
+):
+    """
+    Upload several chunks in one multipart body.
+
+    chunk_numbers[i] and (optionally) chunk_hashes[i] describe chunks[i]; an empty
+    hash skips the integrity check for that chunk. Valid chunks are stored even if
+    others in the batch fail, and the result for each chunk is reported.
+    """
+    user = request.user
+    
+    try:
+        user_file = UserFiles.objects.get(upload_id=upload_id, user=user)
+    except UserFiles.DoesNotExist:
+        return api.create_response(request, {"detail": "Upload session not found"}, status=404)
+    
+    if user_file.is_upload_complete:
+        return api.create_response(request, {"detail": "Upload already completed"}, status=400)
+    
+    chunk_hashes = chunk_hashes or [''] * len(chunks)
+    if not (len(chunk_numbers) == len(chunks) == len(chunk_hashes)):
         return api.create_response(request, {
-            "detail": f"Error completing upload: {str(e)}"
-        }, status=500)
+            "detail": "chunk_numbers, chunk_hashes and chunks must have the same length"
+        }, status=400)
+    
+    if not upload_data_exists(user_file):
+        return api.create_response(request, {
+            "detail": "Upload data not found, please start a new upload"
+        }, status=409)
+    
+    results = []
+    accepted = []
+    for chunk_number, chunk_hash, chunk in zip(chunk_numbers, chunk_hashes, chunks):
+        chunk_data = chunk.read()
+        error = validate_chunk(user_file, chunk_number, chunk_data, chunk_hash or None)
+        if error:
+            results.append({"chunk_number": chunk_number, "uploaded": False, **error})
+            continue
+        write_chunk_segments(user_file, [(chunk_number, chunk_data)])
+        accepted.append((chunk_number, len(chunk_data), chunk_hash or None))
+        results.append({"chunk_number": chunk_number, "uploaded": True})
+    
+    # One locked bitmap update for the whole batch
+    if accepted:
+        user_file = mark_chunks_received(user_file, accepted)
+    
+    progress = (user_file.uploaded_chunks / user_file.total_chunks) * 100 if user_file.total_chunks > 0 else 0
+    
+    return {
+        "detail": f"{len(accepted)} of {len(results)} chunks uploaded successfully",
+        "upload_id": upload_id,
+        "results": results,
+        "uploaded_chunks": user_file.uploaded_chunks,
+        "total_chunks": user_file.total_chunks,
+        "progress_percentage": round(progress, 2),
+        "is_complete": user_file.uploaded_chunks >= user_file.total_chunks
+    }
 
 @api.post("/upload-chunk/{upload_id}", auth=JWTAuth())
 def upload_chunk(
@@ -393,9 +747,6 @@ def upload_chunk(
     chunk: UploadedFile = File(...)
 ):
     """Upload a single chunk of a file"""
-    import hashlib
-    import os
-    
     user = request.user
     
     # Get the UserFiles record
@@ -411,71 +762,27 @@ def upload_chunk(
     chunk_data = chunk.read()
     chunk_size = len(chunk_data)
     
-    # Verify chunk hash if provided
-    if chunk_hash:
-        calculated_hash = hashlib.md5(chunk_data).hexdigest()
-        
-        # Handle both full hash (32 chars) and truncated hash (8 chars)
-        if len(chunk_hash) == 8:
-            calculated_short_hash = calculated_hash[:8]
-            if calculated_short_hash != chunk_hash:
-                return api.create_response(request, {
-                    "detail": f"Chunk integrity check failed. Expected: {chunk_hash}, Got: {calculated_short_hash}",
-                    "full_calculated_hash": calculated_hash,
-                    "chunk_size": chunk_size
-                }, status=400)
-        elif len(chunk_hash) == 32:
-            if calculated_hash != chunk_hash:
-                return api.create_response(request, {
-                    "detail": f"Chunk integrity check failed. Expected: {chunk_hash}, Got: {calculated_hash}",
-                    "chunk_size": chunk_size
-                }, status=400)
-        else:
-            return api.create_response(request, {
-                "detail": f"Invalid hash format. Expected 8 or 32 characters, got {len(chunk_hash)}"
-            }, status=400)
+    error = validate_chunk(user_file, chunk_number, chunk_data, chunk_hash)
+    if error:
+        return api.create_response(request, error, status=400)
     
-    # Create temporary directory for chunks if it doesn't exist
-    chunks_dir = os.path.join(settings.MEDIA_ROOT, 'temp_chunks', upload_id)
-    os.makedirs(chunks_dir, exist_ok=True)
-    
-    # Save chunk to temporary file
-    chunk_file_path = os.path.join(chunks_dir, f"chunk_{chunk_number:04d}")
-    with open(chunk_file_path, 'wb') as f:
-        f.write(chunk_data)
-    
-    # Create or update FileChunk record
-    file_chunk, created = FileChunk.objects.get_or_create(
-        user_file=user_file,
-        chunk_number=chunk_number,
-        defaults={
-            'chunk_size': chunk_size,
-            'chunk_hash': chunk_hash,
-            'is_uploaded': True
-        }
-    )
+    if not upload_data_exists(user_file):
+        return api.create_response(request, {
+            "detail": "Upload data not found, please start a new upload"
+        }, status=409)
     
-    if not created and not file_chunk.is_uploaded:
-        # Update existing chunk that wasn't uploaded before
-        file_chunk.chunk_size = chunk_size
-        file_chunk.chunk_hash = chunk_hash
-        file_chunk.is_uploaded = True
-        file_chunk.save()
-        
-        # Increment uploaded chunks count
-        user_file.uploaded_chunks += 1
-        user_file.save()
-    elif created:
-        # New chunk, increment uploaded chunks count
-        user_file.uploaded_chunks += 1
-        user_file.save()
-    
-    # Calculate progress
-    progress = (user_file.uploaded_chunks / user_file.total_chunks) * 100 if user_file.total_chunks > 0 else 0
+    write_chunk_segments(user_file, [(chunk_number, chunk_data)])
     
+    # Record the chunk in the session bitmap
+    user_file = mark_chunks_received(user_file, [(chunk_number, chunk_size, chunk_hash)])
+    return chunk_upload_result(user_file, chunk_number)
+
+def chunk_upload_result(user_file, chunk_number):
+    """Response body for an accepted chunk"""
+    progress = (user_file.uploaded_chunks / user_file.total_chunks) * 100 if user_file.total_chunks > 0 else 0
     return {
         "detail": f"Chunk {chunk_number} uploaded successfully",
-        "upload_id": upload_id,
+        "upload_id": user_file.upload_id,
         "chunk_number": chunk_number,
         "uploaded_chunks": user_file.uploaded_chunks,
         "total_chunks": user_file.total_chunks,
@@ -494,23 +801,30 @@ def get_upload_status(request, upload_id: str):
     except UserFiles.DoesNotExist:
         return api.create_response(request, {"detail": "Upload session not found"}, status=404)
     
-    # Get missing chunks
-    uploaded_chunk_numbers = set(
-        FileChunk.objects.filter(user_file=user_file, is_uploaded=True)
-        .values_list('chunk_number', flat=True)
-    )
-    missing_chunks = [i for i in range(user_file.total_chunks) if i not in uploaded_chunk_numbers]
+    return build_upload_status(user_file)
+
+def build_upload_status(user_file):
+    """Status of a chunked upload session, including its completion job"""
+    # Get missing chunks as runs from the bitmap
+    missing = missing_ranges(user_file.received_chunks, user_file.total_chunks or 0)
+    missing_chunks = expand_ranges(missing)
     
     progress_percentage = round((user_file.uploaded_chunks / user_file.total_chunks) * 100, 2) if user_file.total_chunks > 0 else 0
     
     return ChunkedUploadStatusOut(
-        upload_id=upload_id,
+        upload_id=user_file.upload_id,
         file_title=user_file.file_title,
         total_chunks=user_file.total_chunks,
         uploaded_chunks=user_file.uploaded_chunks,
         is_complete=user_file.is_upload_complete,
         progress_percentage=progress_percentage,
-        missing_chunks=missing_chunks if missing_chunks else None
+        missing_chunks=missing_chunks if missing_chunks else None,
+        missing_ranges=missing if missing else None,
+        completion_job_id=user_file.completion_job_id,
+        completion_phase=user_file.completion_phase,
+        completion_bytes_done=user_file.completion_bytes_done,
+        completion_bytes_total=user_file.file_size if user_file.completion_phase else 0,
+        completion_error=user_file.completion_error
     )
 
 @api.delete("/upload-chunk/cancel/{upload_id}", auth=JWTAuth())
@@ -526,8 +840,9 @@ def cancel_chunked_upload(request, upload_id: str):
     if user_file.is_upload_complete:
         return api.create_response(request, {"detail": "Cannot cancel completed upload"}, status=400)
     
-    # Clean up temporary chunk files
-    chunks_dir = os.path.join(settings.MEDIA_ROOT, 'temp_chunks', upload_id)
+    # Clean up the received data and temporary chunk files
+    get_storage().abort_upload(upload_id, get_upload_name(user_file), user_file.storage_upload_id)
+    chunks_dir = get_chunks_dir(upload_id)
     if os.path.exists(chunks_dir):
         import shutil
         shutil.rmtree(chunks_dir)
@@ -537,35 +852,12 @@ def cancel_chunked_upload(request, upload_id: str):
     
     # Delete UserFiles record
     user_file.delete()
+    invalidate_user_stats(user.id)
     
     return {
         "detail": "Upload cancelled and cleaned up successfully",
         "upload_id": upload_id
     }
-    """Cancel a chunked upload and clean up"""
-    user = request.user
-    
-    try:
-        user_file = UserFiles.objects.get(upload_id=upload_id, user=user)
-    except UserFiles.DoesNotExist:
-        return api.create_response(request, {"detail": "Upload session not found"}, status=404)
-    
-    if user_file.is_upload_complete:
-        return api.create_response(request, {"detail": "Cannot cancel completed upload"}, status=400)
-    
-    # Clean up temporary chunk files
-    chunks_dir = os.path.join(settings.MEDIA_ROOT, 'temp_chunks', upload_id)
-    if os.path.exists(chunks_dir):
-        import shutil
-        shutil.rmtree(chunks_dir)
-    
-    # Delete FileChunk records
-    FileChunk.objects.filter(user_file=user_file).delete()
-    
-    # Delete UserFiles record
-    user_file.delete()
-    
-    return {"detail": "Upload cancelled and cleaned up successfully"}
 
 @api.post("/debug/chunk-hash", auth=JWTAuth())
 def debug_chunk_hash(request, chunk: UploadedFile = File(...)):
@@ -601,6 +893,131 @@ def list_user_files(request):
         for f in files
     ]
 
+@api.delete("/delete-file/{file_id}", auth=JWTAuth())
+def delete_file(request, file_id: int):
+    """Delete one of the user's files; shared blob content is removed with its last reference"""
+    user_file = get_object_or_404(UserFiles, id=file_id, user=request.user)
+    
+    if not user_file.is_upload_complete and user_file.upload_id and not user_file.file:
+        return api.create_response(request, {
+            "detail": "Upload is still in progress, cancel it instead"
+        }, status=400)
+    
+    blob_id = user_file.blob_id
+    file_name = str(user_file.file) if user_file.file else None
+    
+    with transaction.atomic():
+        downloads = user_file.downloads.filter(is_partial=False).count()
+        user_file.delete()
+        if blob_id is not None:
+            release_blob(blob_id)
+        if file_name:
+            record_file_removed(user_file, downloads)
+    
+    # Files that predate the blob store belong to this row alone
+    if blob_id is None and file_name:
+        get_storage().delete(file_name)
+    
+    return {"detail": "File deleted successfully", "file_id": file_id}
+
+def describe_stored_file(user_file):
+    """
+    Size, validators and format of a file's stored container, worked out
+    without decrypting anything; raises Http404 if it is missing or unreadable
+    """
+    storage = get_storage()
+    encrypted_name = str(user_file.file)
+    print(f"Resolved encrypted file: {encrypted_name}")
+    try:
+        stored_size, modified_time = storage.stat(encrypted_name)
+    except FileNotFoundError:
+        print(f"File does not exist in storage: {encrypted_name}")
+        raise Http404(f"File not found in storage: {encrypted_name}")
+
+    plaintext_size = None
+    with storage.open(encrypted_name) as f:
+        is_segmented = detect_format(f.read(HEADER_SIZE)) == FORMAT_SEGMENTED
+        is_compressed = False
+        if is_segmented:
+            f.seek(0)
+            try:
+                reader = SegmentedReader(f, AES_KEY, total_size=stored_size)
+            except ContainerError as e:
+                print(f"Decryption failed: {e}")
+                raise Http404("Decryption failed")
+            is_compressed = reader.codec != CODEC_NONE
+            # Compressed containers hold compressed bytes; the plaintext size is on the record
+            plaintext_size = user_file.file_size if is_compressed else reader.size
+    return {
+        "name": encrypted_name,
+        "plaintext_size": plaintext_size,
+        "is_compressed": is_compressed,
+        # Only uncompressed segmented files can be decrypted from an arbitrary offset
+        "supports_ranges": is_segmented and not is_compressed,
+        "etag": f'"{user_file.id}-{int(modified_time)}-{stored_size}"',
+        "last_modified": http_date(modified_time)
+    }
+
+def resolve_download_range(request, stored):
+    """The (start, end) byte range to serve, None for the whole file, or a 416 response"""
+    if not stored["supports_ranges"]:
+        return None
+    if not if_range_matches(request.META.get('HTTP_IF_RANGE', ''), stored["etag"], stored["last_modified"]):
+        return None
+    try:
+        return parse_byte_range(request.META.get('HTTP_RANGE', ''), stored["plaintext_size"])
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stored["plaintext_size"]}'
+        return response
+
+def download_transaction_fields(request, user_file, byte_range):
+    """
+    FileDownloadTransaction fields for a download. Range requests that don't
+    start at the beginning (resumes, seeks) are logged as partial so they
+    aren't counted as separate downloads.
+    """
+    return {
+        "file_id": user_file.id,
+        "user_id": request.user.id,
+        "ip_address": request.META.get('REMOTE_ADDR'),
+        "user_agent": request.META.get('HTTP_USER_AGENT', ''),
+        "is_partial": byte_range is not None and byte_range[0] > 0,
+        "range_start": byte_range[0] if byte_range else None,
+        "range_end": byte_range[1] if byte_range else None
+    }
+
+def iter_download_content(stored, byte_range):
+    """Plaintext blocks of the requested range (or whole file), decrypted as they are read"""
+    with get_storage().open(stored["name"]) as f:
+        try:
+            if stored["supports_ranges"]:
+                start, end = byte_range if byte_range is not None else (0, stored["plaintext_size"] - 1)
+                yield from SegmentedReader(f, AES_KEY).iter_range(start, end + 1)
+            else:
+                # Legacy CBC files and compressed files are decrypted (and decompressed) as one stream
+                yield from iter_decrypt_file(f, AES_KEY)
+        except (ValueError, ContainerError) as e:
+            print(f"Decryption failed: {e}")
+            raise Http404("Decryption failed")
+
+def build_download_response(user_file, stored, byte_range, content):
+    """Streaming response for content (a sync or async iterator) with the range and caching headers"""
+    if byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(content, status=206, content_type='application/octet-stream')
+        response['Content-Range'] = f'bytes {start}-{end}/{stored["plaintext_size"]}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = StreamingHttpResponse(content, content_type='application/octet-stream')
+        if stored["plaintext_size"] is not None:
+            response['Content-Length'] = str(stored["plaintext_size"])
+    response['Accept-Ranges'] = 'bytes' if stored["supports_ranges"] else 'none'
+    response['ETag'] = stored["etag"]
+    response['Last-Modified'] = stored["last_modified"]
+    response['Content-Disposition'] = f'attachment; filename="{user_file.file_name}"'
+    return response
+
 @api.get("/download-file/{file_id}", auth=JWTAuth())
 def download_file(request, file_id: int):
     user = request.user
@@ -611,92 +1028,77 @@ def download_file(request, file_id: int):
         print(f"No file found in DB for file_id={file_id} and user={user}")
         raise Http404("File not found")
 
-    encrypted_path = os.path.join(settings.MEDIA_ROOT, str(user_file.file))
-    print(f"Resolved encrypted_path: {encrypted_path}")
-    if not os.path.exists(encrypted_path):
-        print(f"File does not exist on disk: {encrypted_path}")
-        raise Http404(f"File not found on disk: {encrypted_path}")
-
-    # Record the download transaction
-    ip_address = request.META.get('REMOTE_ADDR')
-    user_agent = request.META.get('HTTP_USER_AGENT', '')
-    FileDownloadTransaction.objects.create(
-        file=user_file,
-        user=user,
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
+    stored = describe_stored_file(user_file)
+    byte_range = resolve_download_range(request, stored)
+    if isinstance(byte_range, HttpResponse):
+        return byte_range
 
-    def decrypted_file_generator():
-        chunk_size = 8192  # 8KB
-        with open(encrypted_path, "rb") as f:
-            encrypted_bytes = f.read()
-            try:
-                decrypted_bytes = decrypt_file_content(encrypted_bytes, AES_KEY)
-            except Exception as e:
-                print(f"Decryption failed: {e}")
-                raise Http404("Decryption failed")
-            for i in range(0, len(decrypted_bytes), chunk_size):
-                yield decrypted_bytes[i:i+chunk_size]
-
-    response = StreamingHttpResponse(
-        decrypted_file_generator(),
-        content_type='application/octet-stream'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{user_file.file_name}"'
-    return response
+    # Buffered; the row is bulk-inserted after the response has started
+    log_download(**download_transaction_fields(request, user_file, byte_range))
+    return build_download_response(user_file, stored, byte_range, iter_download_content(stored, byte_range))
 
 @api.get("/account-stats", auth=JWTAuth())
+@cached_stats
 def account_stats(request):
     user = request.user
     files = UserFiles.objects.filter(user=user)
-    total_files = files.count()
-    total_size = 0
-    total_downloads = 0
-    for f in files:
-        try:
-            total_size += int(f.file_size)
-        except Exception:
-            pass
-        total_downloads += f.downloads.count()
+    usage = get_usage(user)
+    # Bytes not written to (and not read back from) disk thanks to compression
+    saved_per_file = ExpressionWrapper(F('blob__size') - F('blob__stored_size'), output_field=BigIntegerField())
+    disk_saved = files.filter(blob__compression__isnull=False).aggregate(saved=Sum(saved_per_file))['saved'] or 0
+    io_saved = FileDownloadTransaction.objects.filter(
+        file__user=user, is_partial=False, file__blob__compression__isnull=False
+    ).aggregate(saved=Sum(ExpressionWrapper(F('file__blob__size') - F('file__blob__stored_size'),
+                                            output_field=BigIntegerField())))['saved'] or 0
     return {
-        "total_files": total_files,
-        "total_file_size": total_size,  # bytes
-        "total_downloads": total_downloads
+        "total_files": usage.file_count,
+        "total_file_size": usage.total_bytes,  # bytes
+        "total_downloads": usage.total_downloads,
+        "compression_saved_bytes": disk_saved,
+        "compression_io_saved_bytes": io_saved
     }
 
 @api.get("/download-reports", auth=JWTAuth())
+@cached_stats
 def download_reports(request):
     user = request.user
-    files = UserFiles.objects.filter(user=user)
+    browsers_by_file = {}
+    for file_id, browser, total in (user_download_rollups(user).values_list('file_id', 'browser')
+                                    .annotate(total=Sum('count'))):
+        browsers_by_file.setdefault(file_id, {})[browser] = total
     report = []
-    for f in files:
-        downloads = f.downloads.all()
-        browser_counts = {}
-        for d in downloads:
-            agent = d.user_agent or "Unknown"
-            # Simple browser extraction (can be improved)
-            if "Chrome" in agent:
-                browser = "Chrome"
-            elif "Firefox" in agent:
-                browser = "Firefox"
-            elif "Safari" in agent and "Chrome" not in agent:
-                browser = "Safari"
-            elif "Edge" in agent:
-                browser = "Edge"
-            elif "MSIE" in agent or "Trident" in agent:
-                browser = "Internet Explorer"
-            else:
-                browser = "Other"
-            browser_counts[browser] = browser_counts.get(browser, 0) + 1
+    for f in UserFiles.objects.filter(user=user).only('id', 'file_title'):
+        browser_counts = browsers_by_file.get(f.id, {})
         report.append({
             "file_id": f.id,
             "file_title": f.file_title,
-            "total_downloads": downloads.count(),
+            "total_downloads": sum(browser_counts.values()),
             "browsers": browser_counts
         })
     return report
 
+@api.get("/download-history/export", auth=JWTAuth())
+def export_download_history(request, format: str = "ndjson", start: date = None, end: date = None,
+                            file_id: int = None):
+    """
+    Stream the user's download history as NDJSON or CSV, oldest first,
+    optionally limited to dates start..end (inclusive) and one file. Rows are
+    read through a cursor as they are sent, so memory stays flat.
+    """
+    if format not in EXPORT_FORMATS:
+        return api.create_response(request, {
+            "detail": f"Unknown format '{format}', expected one of: {', '.join(EXPORT_FORMATS)}"
+        }, status=400)
+    if start and end and start > end:
+        return api.create_response(request, {"detail": "start must not be after end"}, status=400)
+    if file_id is not None and not UserFiles.objects.filter(id=file_id, user=request.user).exists():
+        return api.create_response(request, {"detail": "File not found"}, status=404)
+
+    rows = download_history(request.user, start=start, end=end, file_id=file_id)
+    response = StreamingHttpResponse(iter_export(rows, format), content_type=EXPORT_FORMATS[format])
+    response['Content-Disposition'] = f'attachment; filename="download-history.{format}"'
+    return response
+
 @api.post("/generate-summary", auth=JWTAuth())
 def generate_summary(request, data: GenerateSummaryIn):
     """Generate AI summary for a user's file"""
@@ -729,9 +1131,7 @@ def generate_summary(request, data: GenerateSummaryIn):
                 logger.info(f"Force regenerating summary for file_id: {data.file_id}")
                 existing_summary.delete()
         
-        # Get the encrypted file path
-        encrypted_file_path = os.path.join(settings.MEDIA_ROOT, str(user_file.file))
-        
+
         # Check if file type is supported (using original filename)
         if not FileContentExtractor.is_supported_file(user_file.file_name):
             return api.create_response(request, {
@@ -740,16 +1140,12 @@ def generate_summary(request, data: GenerateSummaryIn):
         
         # First decrypt the file content
         try:
-            with open(encrypted_file_path, 'rb') as f:
-                encrypted_bytes = f.read()
-            
-            # Decrypt the file content
-            decrypted_bytes = decrypt_file_content(encrypted_bytes, AES_KEY)
-            
-            # Create a temporary file with the decrypted content
+            # Stream the decrypted content into a temporary file
             import tempfile
-            with tempfile.NamedTemporaryFile(suffix=os.path.splitext(user_file.file_name)[1], delete=False) as temp_file:
-                temp_file.write(decrypted_bytes)
+            with get_storage().open(str(user_file.file)) as f, \
+                    tempfile.NamedTemporaryFile(suffix=os.path.splitext(user_file.file_name)[1], delete=False) as temp_file:
+                for block in iter_decrypt_file(f, AES_KEY):
+                    temp_file.write(block)
                 temp_file_path = temp_file.name
             
             # Extract text content from the temporary decrypted file
@@ -869,285 +1265,116 @@ def delete_file_summary(request, file_id: int):
 
 # Statistics APIs for Charts
 
+def user_download_rollups(user):
+    """Download rollup rows of a user's files; statistics read these instead of scanning every download"""
+    return DownloadRollup.objects.filter(file__user=user)
+
+@api.get("/statistics/time-series", auth=JWTAuth())
+@cached_stats
+def time_series_stats(request, metric: str = "downloads", granularity: str = "day",
+                      start: date = None, end: date = None):
+    """
+    Uploads, downloads or uploaded bytes per hour, day, week or month between
+    two dates (inclusive, default the last 7 days); one query for any range
+    """
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=6)
+    try:
+        data = time_series(request.user, metric, start, end, granularity)
+    except ValueError as e:
+        return api.create_response(request, {"detail": str(e)}, status=400)
+    return {
+        "metric": metric,
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "data": [{"period": point["period"].isoformat(), "value": point["value"]} for point in data],
+        "total": sum(point["value"] for point in data)
+    }
+
+def last_7_days(user, metric: str, count_key: str):
+    """Daily points of a metric for the last 7 days, in the shape the dashboard charts use"""
+    end_date = timezone.localdate()
+    counts = {point["period"]: point["value"]
+              for point in time_series(user, metric, end_date - timedelta(days=6), end_date, 'day')}
+    return daily_points(counts, end_date, count_key)
+
 @api.get("/statistics/daily-downloads", auth=JWTAuth())
+@cached_stats
 def daily_downloads_stats(request):
     """Get daily download statistics for the last 7 days (for line chart)"""
-    from datetime import datetime, timedelta
-    from django.db.models import Count
-    from django.utils import timezone
-    
-    user = request.user
-    user_files = UserFiles.objects.filter(user=user)
-    
-    # Get last 7 days
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=6)
-    
-    daily_stats = []
-    for i in range(7):
-        current_date = start_date + timedelta(days=i)
-        downloads_count = FileDownloadTransaction.objects.filter(
-            file__in=user_files,
-            timestamp__date=current_date
-        ).count()
-        
-        daily_stats.append({
-            "date": current_date.strftime("%Y-%m-%d"),
-            "day_name": current_date.strftime("%a"),  # Mon, Tue, etc.
-            "download_count": downloads_count
-        })
-    
-    return {
-        "chart_type": "line_chart",
-        "title": "Daily Downloads (Last 7 Days)",
-        "data": daily_stats,
-        "total_downloads": sum(stat["download_count"] for stat in daily_stats)
-    }
+    return daily_downloads_chart(last_7_days(request.user, 'downloads', "download_count"))
 
 @api.get("/statistics/daily-uploads", auth=JWTAuth())
+@cached_stats
 def daily_uploads_stats(request):
     """Get daily file upload statistics for the last 7 days (for bar chart)"""
-    from datetime import datetime, timedelta
-    from django.utils import timezone
-    
-    user = request.user
-    
-    # Get last 7 days
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=6)
-    
-    daily_stats = []
-    for i in range(7):
-        current_date = start_date + timedelta(days=i)
-        uploads_count = UserFiles.objects.filter(
-            user=user,
-            uploaded_at__date=current_date
-        ).count()
-        
-        daily_stats.append({
-            "date": current_date.strftime("%Y-%m-%d"),
-            "day_name": current_date.strftime("%a"),
-            "upload_count": uploads_count
-        })
-    
-    return {
-        "chart_type": "bar_chart",
-        "title": "Daily File Uploads (Last 7 Days)",
-        "data": daily_stats,
-        "total_uploads": sum(stat["upload_count"] for stat in daily_stats)
-    }
+    return daily_uploads_chart(last_7_days(request.user, 'uploads', "upload_count"))
+
+def downloads_by(user, field: str):
+    """Full downloads of a user's files grouped by a rollup column (device or browser)"""
+    return dict(user_download_rollups(user).values_list(field).annotate(total=Sum('count')))
 
 @api.get("/statistics/device-downloads-pie", auth=JWTAuth())
+@cached_stats
 def device_downloads_pie_chart(request):
     """Get device-based download statistics for pie chart"""
-    from django.db.models import Count
-    
-    user = request.user
-    user_files = UserFiles.objects.filter(user=user)
-    
-    downloads = FileDownloadTransaction.objects.filter(file__in=user_files)
-    
-    device_stats = {}
-    total_downloads = 0
-    
-    for download in downloads:
-        agent = download.user_agent or "Unknown"
-        device = extract_device_from_user_agent(agent)
-        device_stats[device] = device_stats.get(device, 0) + 1
-        total_downloads += 1
-    
-    # Convert to percentage for pie chart
-    pie_data = []
-    for device, count in device_stats.items():
-        percentage = round((count / total_downloads * 100), 1) if total_downloads > 0 else 0
-        pie_data.append({
-            "device": device,
-            "count": count,
-            "percentage": percentage
-        })
-    
-    # Sort by count (descending)
-    pie_data.sort(key=lambda x: x["count"], reverse=True)
-    
-    return {
-        "chart_type": "pie_chart",
-        "title": "Downloads by Device Type",
-        "data": pie_data,
-        "total_downloads": total_downloads
-    }
+    return device_pie_chart(downloads_by(request.user, 'device'))
 
 @api.get("/statistics/device-downloads-bar", auth=JWTAuth())
+@cached_stats
 def device_downloads_bar_chart(request):
     """Get device-based download statistics for bar chart"""
-    user = request.user
-    user_files = UserFiles.objects.filter(user=user)
-    
-    downloads = FileDownloadTransaction.objects.filter(file__in=user_files)
-    
-    device_stats = {}
-    for download in downloads:
-        agent = download.user_agent or "Unknown"
-        device = extract_device_from_user_agent(agent)
-        device_stats[device] = device_stats.get(device, 0) + 1
-    
-    # Convert to list format for bar chart
-    bar_data = []
-    for device, count in device_stats.items():
-        bar_data.append({
-            "device": device,
-            "download_count": count
-        })
-    
-    # Sort by count (descending)
-    bar_data.sort(key=lambda x: x["download_count"], reverse=True)
-    
-    return {
-        "chart_type": "bar_chart",
-        "title": "Downloads by Device Type",
-        "data": bar_data,
-        "total_downloads": sum(item["download_count"] for item in bar_data)
-    }
+    return device_bar_chart(downloads_by(request.user, 'device'))
 
 @api.get("/statistics/browser-downloads-pie", auth=JWTAuth())
+@cached_stats
 def browser_downloads_pie_chart(request):
     """Get browser-based download statistics for pie chart"""
-    user = request.user
-    user_files = UserFiles.objects.filter(user=user)
-    
-    downloads = FileDownloadTransaction.objects.filter(file__in=user_files)
-    
-    browser_stats = {}
-    total_downloads = 0
-    
-    for download in downloads:
-        agent = download.user_agent or "Unknown"
-        browser = extract_browser_from_user_agent(agent)
-        browser_stats[browser] = browser_stats.get(browser, 0) + 1
-        total_downloads += 1
-    
-    # Convert to percentage for pie chart
-    pie_data = []
-    for browser, count in browser_stats.items():
-        percentage = round((count / total_downloads * 100), 1) if total_downloads > 0 else 0
-        pie_data.append({
-            "browser": browser,
-            "count": count,
-            "percentage": percentage
-        })
-    
-    # Sort by count (descending)
-    pie_data.sort(key=lambda x: x["count"], reverse=True)
-    
-    return {
-        "chart_type": "pie_chart",
-        "title": "Downloads by Browser",
-        "data": pie_data,
-        "total_downloads": total_downloads
-    }
+    return browser_pie_chart(downloads_by(request.user, 'browser'))
 
 @api.get("/statistics/overview", auth=JWTAuth())
+@cached_stats
 def statistics_overview(request):
     """Get complete statistics overview for dashboard"""
-    from datetime import datetime, timedelta
-    from django.utils import timezone
-    
     user = request.user
     user_files = UserFiles.objects.filter(user=user)
+    rollups = user_download_rollups(user)
     
-    # Basic stats
-    total_files = user_files.count()
-    total_downloads = FileDownloadTransaction.objects.filter(file__in=user_files).count()
-    
-    # Calculate total file size
-    total_size = 0
-    for f in user_files:
-        try:
-            total_size += int(f.file_size)
-        except:
-            pass
-    
-    # Recent activity (last 7 days)
+    # Recent activity (last 7 days; downloads by calendar day, as in the daily chart)
     last_week = timezone.now() - timedelta(days=7)
     recent_uploads = user_files.filter(uploaded_at__gte=last_week).count()
-    recent_downloads = FileDownloadTransaction.objects.filter(
-        file__in=user_files,
-        timestamp__gte=last_week
-    ).count()
+    recent_downloads = rollups.filter(
+        day__gt=timezone.localdate() - timedelta(days=7)
+    ).aggregate(total=Sum('count'))['total'] or 0
     
     # Most downloaded file
-    most_downloaded_file = None
-    if user_files.exists():
-        from django.db.models import Count
-        most_downloaded = user_files.annotate(
-            download_count=Count('downloads')
-        ).order_by('-download_count').first()
-        
-        if most_downloaded:
-            most_downloaded_file = {
-                "file_title": most_downloaded.file_title,
-                "download_count": most_downloaded.download_count
-            }
+    top = rollups.values('file_id').annotate(total=Sum('count')).order_by('-total').first()
+    most_downloaded = user_files.filter(id=top['file_id']).first() if top else user_files.first()
     
-    return {
-        "overview": {
-            "total_files": total_files,
-            "total_downloads": total_downloads,
-            "total_file_size_bytes": total_size,
-            "total_file_size_mb": round(total_size / (1024 * 1024), 2),
-            "recent_uploads_7_days": recent_uploads,
-            "recent_downloads_7_days": recent_downloads,
-            "most_downloaded_file": most_downloaded_file
-        },
-        "generated_at": timezone.now().isoformat()
-    }
+    return overview(get_usage(user), recent_uploads, recent_downloads, most_downloaded, top['total'] if top else 0)
 
-# Helper functions for device and browser extraction
-def extract_device_from_user_agent(user_agent):
-    """Extract device type from user agent string"""
-    if not user_agent:
-        return "Unknown"
-    
-    user_agent = user_agent.lower()
-    
-    if "mobile" in user_agent or "android" in user_agent or "iphone" in user_agent:
-        if "android" in user_agent:
-            return "Android Mobile"
-        elif "iphone" in user_agent or "ios" in user_agent:
-            return "iPhone"
-        else:
-            return "Mobile"
-    elif "tablet" in user_agent or "ipad" in user_agent:
-        if "ipad" in user_agent:
-            return "iPad"
-        else:
-            return "Tablet"
-    elif "windows" in user_agent:
-        return "Windows Desktop"
-    elif "mac" in user_agent and "iphone" not in user_agent and "ipad" not in user_agent:
-        return "Mac Desktop"
-    elif "linux" in user_agent:
-        return "Linux Desktop"
-    else:
-        return "Desktop"
-
-def extract_browser_from_user_agent(user_agent):
-    """Extract browser from user agent string"""
-    if not user_agent:
-        return "Unknown"
-    
-    user_agent = user_agent.lower()
-    
-    if "chrome" in user_agent and "edg" not in user_agent:
-        return "Chrome"
-    elif "firefox" in user_agent:
-        return "Firefox"
-    elif "safari" in user_agent and "chrome" not in user_agent:
-        return "Safari"
-    elif "edg" in user_agent or "edge" in user_agent:
-        return "Edge"
-    elif "opera" in user_agent:
-        return "Opera"
-    elif "msie" in user_agent or "trident" in user_agent:
-        return "Internet Explorer"
-    else:
-        return "Other"
\ No newline at end of file
+@api.get("/statistics/dashboard", auth=JWTAuth())
+@cached_stats
+def statistics_dashboard(request, sections: str = None):
+    """
+    Every dashboard chart in one response, from a single pass over the
+    download rollups; sections picks a comma-separated subset of
+    overview, daily_downloads, daily_uploads, device_pie, device_bar, browser_pie
+    """
+    try:
+        requested = parse_sections(sections)
+    except ValueError as e:
+        return api.create_response(request, {"detail": str(e)}, status=400)
+    return dashboard(request.user, requested)
+
+@api.get("/statistics/cache-metrics", auth=JWTAuth())
+def statistics_cache_metrics(request):
+    """Hit ratio and recompute time of the statistics cache (staff only)"""
+    if not request.user.is_staff:
+        return api.create_response(request, {"detail": "Staff access required"}, status=403)
+    return cache_metrics()
+
+# Async variants of the transfer endpoints (/api/async/...) for ASGI deployments
+from .api_async import router as async_router  # noqa: E402
+api.add_router("/async", async_router)
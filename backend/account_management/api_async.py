@@ -0,0 +1,102 @@
+"""
+Async variants of the transfer endpoints, mounted under /api/async/.
+
+Under an ASGI server (uvicorn project_main.asgi:application) a slow client
+only costs a suspended coroutine: database calls use the async ORM, and file
+reads, decryption and encryption run one block at a time on a thread pool,
+so no thread is held between blocks. Under WSGI these views still work but
+gain nothing; keep using the sync endpoints there.
+"""
+import logging
+from typing import Iterator
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from ninja import File, Form, Router
+from ninja.files import UploadedFile
+from ninja_jwt.authentication import AsyncJWTAuth
+from .models import UserFiles
+from .api import (api, describe_stored_file, resolve_download_range, download_transaction_fields,
+                  iter_download_content, build_download_response, validate_chunk, upload_data_exists,
+                  write_chunk_segments, mark_chunks_received, chunk_upload_result, build_upload_status)
+from .utils.download_log import alog_download
+
+logger = logging.getLogger(__name__)
+
+router = Router(tags=["async"])
+
+# Blocking work that touches no database connection can run on any pool thread
+run_blocking = sync_to_async(lambda func, *args: func(*args), thread_sensitive=False)
+
+async def iterate_in_thread(iterator: Iterator[bytes]):
+    """Drive a blocking iterator from async code, one block per thread-pool hop"""
+    done = object()
+    try:
+        while True:
+            block = await run_blocking(next, iterator, done)
+            if block is done:
+                break
+            yield block
+    finally:
+        # Closes the underlying file when the client goes away mid-transfer
+        await run_blocking(iterator.close)
+
+@router.get("/download-file/{file_id}", auth=AsyncJWTAuth())
+async def download_file_async(request, file_id: int):
+    user = request.user
+    logger.debug(f"Download requested (async): file_id={file_id}, user={user}")
+    try:
+        user_file = await UserFiles.objects.aget(id=file_id, user=user)
+    except UserFiles.DoesNotExist:
+        logger.warning(f"No file found in DB for file_id={file_id} and user={user}")
+        raise Http404("File not found")
+
+    stored = await run_blocking(describe_stored_file, user_file)
+    byte_range = resolve_download_range(request, stored)
+    if isinstance(byte_range, HttpResponse):
+        return byte_range
+
+    await alog_download(**download_transaction_fields(request, user_file, byte_range))
+    content = iterate_in_thread(iter_download_content(stored, byte_range))
+    return build_download_response(user_file, stored, byte_range, content)
+
+@router.post("/upload-chunk/{upload_id}", auth=AsyncJWTAuth())
+async def upload_chunk_async(
+    request,
+    upload_id: str,
+    chunk_number: int = Form(...),
+    chunk_hash: str = Form(None),
+    chunk: UploadedFile = File(...)
+):
+    """Upload a single chunk of a file"""
+    try:
+        user_file = await UserFiles.objects.aget(upload_id=upload_id, user=request.user)
+    except UserFiles.DoesNotExist:
+        return api.create_response(request, {"detail": "Upload session not found"}, status=404)
+
+    if user_file.is_upload_complete:
+        return api.create_response(request, {"detail": "Upload already completed"}, status=400)
+
+    chunk_data = await run_blocking(chunk.read)
+    error = await run_blocking(validate_chunk, user_file, chunk_number, chunk_data, chunk_hash)
+    if error:
+        return api.create_response(request, error, status=400)
+
+    if not await run_blocking(upload_data_exists, user_file):
+        return api.create_response(request, {
+            "detail": "Upload data not found, please start a new upload"
+        }, status=409)
+
+    await run_blocking(write_chunk_segments, user_file, [(chunk_number, chunk_data)])
+
+    # The bitmap update locks the row in a transaction, which has no async API yet
+    user_file = await sync_to_async(mark_chunks_received)(user_file, [(chunk_number, len(chunk_data), chunk_hash)])
+    return chunk_upload_result(user_file, chunk_number)
+
+@router.get("/upload-chunk/status/{upload_id}", auth=AsyncJWTAuth())
+async def get_upload_status_async(request, upload_id: str):
+    """Get the status of a chunked upload"""
+    try:
+        user_file = await UserFiles.objects.aget(upload_id=upload_id, user=request.user)
+    except UserFiles.DoesNotExist:
+        return api.create_response(request, {"detail": "Upload session not found"}, status=404)
+    return build_upload_status(user_file)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from account_management.utils.download_log import backfill_download_agents
+from account_management.utils.download_rollup import rebuild_download_rollups
+
+class Command(BaseCommand):
+    help = "Store browser, OS and device for downloads logged before user agents were classified at ingest"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Downloads classified per transaction")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches")
+        parser.add_argument('--skip-rollups', action='store_true',
+                            help="Don't rebuild the download rollups from the backfilled columns afterwards")
+
+    def handle(self, *args, **options):
+        stats = backfill_download_agents(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Classified {stats['rows']} downloads in {stats['batches']} batches in {stats['duration_ms']} ms"
+        ))
+        if stats['rows'] and not options['skip_rollups']:
+            rollups = rebuild_download_rollups()
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {rollups['rows']} rollup rows for {rollups['files']} files in {rollups['duration_ms']} ms"
+            ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from account_management.utils.upload_gc import run_upload_gc
+
+class Command(BaseCommand):
+    help = "Reclaim abandoned chunked uploads, leftover temp_chunks data and completed FileChunk rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-hours', type=float, help="Reclaim incomplete uploads older than this")
+        parser.add_argument('--idle-hours', type=float, help="Reclaim incomplete uploads with no activity for this long")
+        parser.add_argument('--batch-size', type=int, help="Rows deleted per batch")
+        parser.add_argument('--pause', type=float, help="Seconds to sleep between full batches")
+        parser.add_argument('--max-batches', type=int, help="Upper bound on batches per step")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be reclaimed without deleting")
+
+    def handle(self, *args, **options):
+        stats = run_upload_gc(
+            max_age_hours=options['max_age_hours'],
+            idle_hours=options['idle_hours'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            max_batches=options['max_batches'],
+            dry_run=options['dry_run']
+        )
+        prefix = "Would reclaim" if stats["dry_run"] else "Reclaimed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {stats['sessions_reclaimed']} sessions, {stats['rows_reclaimed']} rows "
+            f"({stats['chunk_rows_compacted']} completed chunk rows) and {stats['bytes_reclaimed']} bytes "
+            f"in {stats['duration_ms']} ms"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from account_management.utils.download_log import replay_orphaned_journals
+
+class Command(BaseCommand):
+    help = "Insert download events from journals left behind by crashed processes"
+
+    def handle(self, *args, **options):
+        stats = replay_orphaned_journals()
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {stats['events']} download events from {stats['journals']} journals"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from account_management.utils.download_rollup import rebuild_download_rollups
+
+class Command(BaseCommand):
+    help = "Recompute the download rollup tables behind the statistics endpoints from the download log"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Files rebuilt per transaction")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches")
+
+    def handle(self, *args, **options):
+        stats = rebuild_download_rollups(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {stats['rows']} rollup rows for {stats['files']} files in {stats['duration_ms']} ms"
+        ))
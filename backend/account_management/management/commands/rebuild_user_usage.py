@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from account_management.utils.usage import rebuild_usage
+
+class Command(BaseCommand):
+    help = "Recount the per-user file, storage and download totals from files and downloads"
+
+    def handle(self, *args, **options):
+        stats = rebuild_usage()
+        self.stdout.write(self.style.SUCCESS(f"Recounted usage for {stats['users']} users in {stats['duration_ms']} ms"))
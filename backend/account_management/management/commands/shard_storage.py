@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from account_management.utils.shard_migration import migrate_to_sharded_layout
+
+class Command(BaseCommand):
+    help = "Move locally stored files from the flat blobs/ and user_files/ layout into hash-prefix shards"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Files relocated per batch")
+        parser.add_argument('--pause', type=float, default=0.5,
+                            help="Seconds between switching a batch over and unlinking its old names")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches per table")
+        parser.add_argument('--dry-run', action='store_true', help="Count the files that would move")
+
+    def handle(self, *args, **options):
+        try:
+            stats = migrate_to_sharded_layout(
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                max_batches=options['max_batches'],
+                dry_run=options['dry_run']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        prefix = "Would relocate" if stats["dry_run"] else "Relocated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {stats['relocated']} files in {stats['batches']} batches "
+            f"({stats['missing']} missing) in {stats['duration_ms']} ms"
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0006_userfiles_is_upload_complete_userfiles_total_chunks_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filedownloadtransaction',
+            name='is_partial',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='filedownloadtransaction',
+            name='range_end',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='filedownloadtransaction',
+            name='range_start',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0007_filedownloadtransaction_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfiles',
+            name='chunk_size',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
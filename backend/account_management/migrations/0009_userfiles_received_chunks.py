@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0008_userfiles_chunk_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfiles',
+            name='received_chunks',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
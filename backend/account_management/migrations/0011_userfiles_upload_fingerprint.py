@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0010_fileblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfiles',
+            name='upload_fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
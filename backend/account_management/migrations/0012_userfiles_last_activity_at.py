@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0011_userfiles_upload_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfiles',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0012_userfiles_last_activity_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfiles',
+            name='completion_bytes_done',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userfiles',
+            name='completion_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userfiles',
+            name='completion_job_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='userfiles',
+            name='completion_phase',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+    ]
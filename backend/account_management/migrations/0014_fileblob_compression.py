@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0013_userfiles_completion_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileblob',
+            name='compression',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='fileblob',
+            name='stored_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
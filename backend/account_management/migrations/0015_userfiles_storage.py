@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0014_fileblob_compression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfiles',
+            name='container_header',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userfiles',
+            name='storage_name',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='userfiles',
+            name='storage_upload_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
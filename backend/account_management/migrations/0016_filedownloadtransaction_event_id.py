@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0015_userfiles_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filedownloadtransaction',
+            name='event_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='filedownloadtransaction',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
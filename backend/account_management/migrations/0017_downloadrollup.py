@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:30
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from account_management.utils.user_agent import classify_user_agent
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll up the downloads logged so far; browser/device aren't stored yet, so they come from user_agent"""
+    FileDownloadTransaction = apps.get_model('account_management', 'FileDownloadTransaction')
+    DownloadRollup = apps.get_model('account_management', 'DownloadRollup')
+    counts = Counter()
+    for row in (FileDownloadTransaction.objects.filter(is_partial=False)
+                .annotate(day=TruncDate('timestamp'))
+                .values('file_id', 'day', 'user_agent')
+                .annotate(count=Count('id'))
+                .order_by()):
+        agent = classify_user_agent(row['user_agent'])
+        counts[row['file_id'], row['day'], agent.browser, agent.device] += row['count']
+    DownloadRollup.objects.bulk_create(
+        [DownloadRollup(file_id=file_id, day=day, browser=browser, device=device, count=count)
+         for (file_id, day, browser, device), count in counts.items()],
+        batch_size=500
+    )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0016_filedownloadtransaction_event_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DownloadRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('browser', models.CharField(max_length=50)),
+                ('device', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='download_rollups', to='account_management.userfiles')),
+            ],
+            options={
+                'unique_together': {('file', 'day', 'browser', 'device')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
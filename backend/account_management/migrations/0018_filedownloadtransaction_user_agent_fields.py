@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:34
+
+from django.db import migrations, models
+
+from account_management.utils.user_agent import classify_user_agent
+
+
+def classify_existing_downloads(apps, schema_editor):
+    """Fill browser/os/device of the downloads logged so far, one UPDATE per distinct user agent"""
+    FileDownloadTransaction = apps.get_model('account_management', 'FileDownloadTransaction')
+    unclassified = FileDownloadTransaction.objects.filter(browser='')
+    for user_agent in list(unclassified.values_list('user_agent', flat=True).distinct().order_by()):
+        unclassified.filter(user_agent=user_agent).update(**classify_user_agent(user_agent)._asdict())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0017_downloadrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filedownloadtransaction',
+            name='browser',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='filedownloadtransaction',
+            name='device',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='filedownloadtransaction',
+            name='os',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.RunPython(classify_existing_downloads, migrations.RunPython.noop),
+    ]
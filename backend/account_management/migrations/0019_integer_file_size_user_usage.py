@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def clean_file_sizes(apps, schema_editor):
+    """file_size was free text; anything that isn't a byte count becomes 0 before the type change"""
+    UserFiles = apps.get_model('account_management', 'UserFiles')
+    for file_id, file_size in UserFiles.objects.values_list('id', 'file_size').iterator():
+        cleaned = (file_size or '').strip()
+        if not cleaned.isdigit():
+            cleaned = '0'
+        if cleaned != file_size:
+            UserFiles.objects.filter(id=file_id).update(file_size=cleaned)
+
+
+def backfill_usage(apps, schema_editor):
+    UserFiles = apps.get_model('account_management', 'UserFiles')
+    FileDownloadTransaction = apps.get_model('account_management', 'FileDownloadTransaction')
+    UserUsage = apps.get_model('account_management', 'UserUsage')
+    usage = {}
+    for row in (UserFiles.objects.exclude(file='').values('user_id')
+                .annotate(file_count=Count('id'), total_bytes=Sum('file_size'))):
+        usage[row['user_id']] = UserUsage(user_id=row['user_id'], file_count=row['file_count'],
+                                          total_bytes=row['total_bytes'] or 0)
+    for row in (FileDownloadTransaction.objects.filter(is_partial=False).values('file__user_id')
+                .annotate(total=Count('id'))):
+        user_id = row['file__user_id']
+        usage.setdefault(user_id, UserUsage(user_id=user_id)).total_downloads = row['total']
+    UserUsage.objects.bulk_create(usage.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_management', '0018_filedownloadtransaction_user_agent_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_file_sizes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='userfiles',
+            name='file_size',
+            field=models.BigIntegerField(),
+        ),
+        migrations.CreateModel(
+            name='UserUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_count', models.IntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('total_downloads', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
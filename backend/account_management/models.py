@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # User Profile extension
 class UserProfile(models.Model):
@@ -14,26 +15,56 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+class FileBlob(models.Model):
+    """Encrypted file content, stored once and shared by every UserFiles row with the same plaintext"""
+    content_hash = models.CharField(max_length=64, unique=True)  # SHA-256 of the plaintext
+    file = models.FileField(upload_to='blobs/')
+    size = models.BigIntegerField()  # Plaintext size in bytes
+    stored_size = models.BigIntegerField(blank=True, null=True)  # Bytes on disk, after compression and encryption
+    compression = models.CharField(max_length=10, blank=True, null=True)  # Codec applied before encryption, if any
+    ref_count = models.IntegerField(default=0)  # Number of UserFiles rows pointing at this blob
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Blob {self.content_hash[:12]} ({self.ref_count} refs)"
+
 #Userfile models
 class UserFiles(models.Model):
     file_title = models.CharField(max_length=255)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='files')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     file = models.FileField(upload_to='user_files/')
-    file_size = models.CharField(max_length=255)
+    file_size = models.BigIntegerField()  # Plaintext size in bytes (declared size until a chunked upload completes)
     file_name = models.CharField(max_length=200)
+    blob = models.ForeignKey(FileBlob, on_delete=models.PROTECT, blank=True, null=True, related_name='user_files')
+    content_hash = models.CharField(max_length=64, blank=True, null=True)  # SHA-256 declared by the client at upload init
     
     # New fields for chunk upload support
     upload_id = models.CharField(max_length=100, unique=True, blank=True, null=True)  # Unique identifier for chunked upload
     is_upload_complete = models.BooleanField(default=False)  # Track if all chunks are uploaded
     total_chunks = models.IntegerField(blank=True, null=True)  # Total number of chunks expected
     uploaded_chunks = models.IntegerField(default=0)  # Number of chunks uploaded so far
+    chunk_size = models.IntegerField(blank=True, null=True)  # Size of every chunk except the last; also the encrypted segment size
+    received_chunks = models.BinaryField(blank=True, null=True)  # Bitmap of received chunks, see utils/chunk_bitmap.py
+    upload_fingerprint = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # Identifies the content for resuming
+    last_activity_at = models.DateTimeField(blank=True, null=True)  # Last init/chunk for an in-progress upload, used by the upload GC
+    container_header = models.BinaryField(blank=True, null=True)  # Encrypted container header, written with chunk 0
+    storage_name = models.CharField(max_length=255, blank=True, null=True)  # Where the upload's data is stored once complete
+    storage_upload_id = models.CharField(max_length=255, blank=True, null=True)  # Storage backend's multipart upload id, if any
+    completion_job_id = models.CharField(max_length=64, blank=True, null=True)  # Celery task assembling the upload
+    completion_phase = models.CharField(max_length=20, blank=True, null=True)  # See utils/upload_assembly.py
+    completion_bytes_done = models.BigIntegerField(default=0)
+    completion_error = models.TextField(blank=True, null=True)
     
     def __str__(self):
         return f"{self.file_title} ({self.user.username})"
 
 class FileChunk(models.Model):
-    """Model to track individual file chunks during upload"""
+    """
+    Model to track individual file chunks during upload.
+    Only written when UPLOAD_TRACK_CHUNK_ROWS is enabled; UserFiles.received_chunks
+    is the source of truth for which chunks have arrived.
+    """
     user_file = models.ForeignKey(UserFiles, on_delete=models.CASCADE, related_name='chunks')
     chunk_number = models.IntegerField()  # Chunk sequence number (0-based)
     chunk_size = models.IntegerField()  # Size of this chunk in bytes
@@ -59,12 +90,57 @@ class AiSummaries(models.Model):
     def __str__(self):
         return f"Summary for {self.file.file_title}"
     
+class UserUsage(models.Model):
+    """
+    Per-user totals over stored files (rows with content; unfinished chunked
+    uploads don't count) and their full downloads. Adjusted in the same
+    transaction as the change it reflects, see utils/usage.py.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='usage')
+    file_count = models.IntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    total_downloads = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.file_count} files, {self.total_bytes} bytes"
+
 class FileDownloadTransaction(models.Model):
     file = models.ForeignKey(UserFiles, on_delete=models.CASCADE, related_name='downloads')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='file_downloads')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the download starts; rows may be written later by the buffered download log
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Identifies a buffered event, so replaying a journal never inserts it twice
+    event_id = models.UUIDField(unique=True, null=True, blank=True, editable=False)
     ip_address = models.CharField(max_length=45, blank=True, null=True)  # supports IPv6
     user_agent = models.CharField(max_length=512, blank=True, null=True)
+    # Classified from user_agent when the row is written (utils/user_agent.py); '' until backfilled
+    browser = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    os = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    device = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    
+    # Range request tracking (resumed/seeking downloads are logged as partial)
+    is_partial = models.BooleanField(default=False)  # Range request that doesn't start at byte 0
+    range_start = models.BigIntegerField(blank=True, null=True)
+    range_end = models.BigIntegerField(blank=True, null=True)  # Inclusive
+
+    def __str__(self):
+        return f"{self.user.username} downloaded {self.file.file_title} at {self.timestamp}"
+
+class DownloadRollup(models.Model):
+    """
+    Full (non-partial) downloads of a file per day, browser and device.
+    Kept up to date as downloads are logged (utils/download_rollup.py) and
+    rebuildable with manage.py rebuild_download_rollups.
+    """
+    file = models.ForeignKey(UserFiles, on_delete=models.CASCADE, related_name='download_rollups')
+    day = models.DateField(db_index=True)  # In TIME_ZONE, like the date filters of the statistics endpoints
+    browser = models.CharField(max_length=50)
+    device = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('file', 'day', 'browser', 'device')
 
     def __str__(self):
-        return f"{self.user.username} downloaded {self.file.file_title} at {self.timestamp}"
\ No newline at end of file
+        return f"{self.file.file_title} on {self.day}: {self.count} ({self.browser}, {self.device})"
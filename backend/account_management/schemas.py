@@ -1,5 +1,5 @@
 from ninja import Schema
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 class SignupIn(Schema):
@@ -46,6 +46,8 @@ class ChunkedUploadInitIn(Schema):
     file_size: int  # Total file size in bytes
     total_chunks: int
     chunk_size: int  # Size of each chunk (except possibly the last one)
+    file_hash: Optional[str] = None  # SHA-256 of the whole file; enables instant upload of known content
+    chunk_hashes: Optional[List[str]] = None  # MD5 of every chunk; lets an interrupted upload be resumed
 
 class ChunkedUploadChunkIn(Schema):
     upload_id: str
@@ -63,12 +65,18 @@ class ChunkedUploadStatusOut(Schema):
     is_complete: bool
     progress_percentage: float
     missing_chunks: Optional[list] = None
+    missing_ranges: Optional[list] = None  # Inclusive [start, end] runs of missing chunk numbers
+    completion_job_id: Optional[str] = None
+    completion_phase: Optional[str] = None  # queued, assembling, verifying, finalizing, complete or failed
+    completion_bytes_done: int = 0
+    completion_bytes_total: int = 0
+    completion_error: Optional[str] = None
 
 class UserFileOut(Schema):
     id: int
     file_title: str
     file_name: str
-    file_size: str
+    file_size: int
     uploaded_at: str
     file_url: str
     upload_id: Optional[str] = None
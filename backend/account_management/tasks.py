@@ -0,0 +1,18 @@
+from celery import shared_task
+from .models import UserFiles
+from .utils.upload_gc import run_upload_gc
+from .utils.upload_assembly import assemble_chunked_upload
+
+@shared_task
+def cleanup_abandoned_uploads():
+    """Periodic (Celery beat) reclamation of abandoned uploads and leftover chunk data"""
+    return run_upload_gc()
+
+@shared_task(bind=True)
+def complete_chunked_upload(self, user_file_id):
+    """Assemble a fully received chunked upload outside the request that completed it"""
+    # A stale job may have been replaced by a retried completion; only the current one runs
+    if not UserFiles.objects.filter(pk=user_file_id, completion_job_id=self.request.id,
+                                    is_upload_complete=False).exists():
+        return {"detail": "Superseded"}
+    return assemble_chunked_upload(user_file_id)
@@ -0,0 +1,109 @@
+import json
+import shutil
+import hashlib
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from project_main import settings
+from ..utils.storage import get_storage
+
+class StorageTestCase(TestCase):
+    """
+    Runs against an empty local storage root, with downloads logged inline,
+    uploads completed inline and statistics uncached unless a test says otherwise
+    """
+
+    settings_overrides = {
+        'FILE_STORAGE_BACKEND': 'local',
+        'DOWNLOAD_LOG_BUFFERED': False,
+        'UPLOAD_COMPLETE_ASYNC': False,
+        'STATS_CACHE_SECONDS': 0,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.set_settings(MEDIA_ROOT=self.media_root, **self.settings_overrides)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        get_storage.cache_clear()
+        self.addCleanup(get_storage.cache_clear)
+        cache.clear()
+
+    def set_settings(self, **values):
+        """Patch project settings for this test (the code reads them from project_main.settings)"""
+        for name, value in values.items():
+            patcher = mock.patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+class APITestCase(StorageTestCase):
+    """A StorageTestCase with a logged-in API client"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('alice')
+        self.client = self.client_for(self.user)
+
+    def create_user(self, username):
+        return User.objects.create_user(username, f'{username}@example.com', 'testpassword123')
+
+    def client_for(self, user):
+        return Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def post_json(self, path, data, client=None):
+        return (client or self.client).post(path, json.dumps(data), content_type='application/json')
+
+    def upload_file(self, content, name='file.bin', title='file', client=None):
+        response = (client or self.client).post('/api/upload-file', {
+            'file_title': title,
+            'file': SimpleUploadedFile(name, content)
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['file_id']
+
+    def download(self, file_id, client=None, **headers):
+        response = (client or self.client).get(f'/api/download-file/{file_id}', **headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def init_upload(self, content, chunk_size, **fields):
+        response = self.post_json('/api/upload-chunk/init', dict({
+            'file_title': 'chunked',
+            'file_name': 'chunked.bin',
+            'file_size': len(content),
+            'total_chunks': -(-len(content) // chunk_size),
+            'chunk_size': chunk_size
+        }, **fields))
+        return response
+
+    def send_chunk(self, upload_id, content, chunk_size, chunk_number, chunk_hash=None):
+        chunk = content[chunk_number * chunk_size:(chunk_number + 1) * chunk_size]
+        data = {'chunk_number': chunk_number, 'chunk': SimpleUploadedFile('chunk', chunk)}
+        if chunk_hash is not None:
+            data['chunk_hash'] = chunk_hash
+        return self.client.post(f'/api/upload-chunk/{upload_id}', data)
+
+    def complete_upload(self, upload_id):
+        return self.post_json('/api/upload-chunk/complete', {'upload_id': upload_id})
+
+    def upload_chunked(self, content, chunk_size, **fields):
+        """Send content as a chunked upload and complete it; returns the file id"""
+        response = self.init_upload(content, chunk_size, **fields)
+        self.assertEqual(response.status_code, 200, response.content)
+        upload_id = response.json()['upload_id']
+        for chunk_number in range(response.json()['total_chunks']):
+            self.assertEqual(self.send_chunk(upload_id, content, chunk_size, chunk_number).status_code, 200)
+        response = self.complete_upload(upload_id)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['file_id']
+
+def chunk_hashes(content, chunk_size):
+    return [hashlib.md5(content[offset:offset + chunk_size]).hexdigest()
+            for offset in range(0, len(content), chunk_size)]
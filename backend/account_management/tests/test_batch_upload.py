@@ -0,0 +1,59 @@
+import os
+from django.core.files.uploadedfile import SimpleUploadedFile
+from .base import APITestCase, chunk_hashes
+
+class BatchUploadTests(APITestCase):
+    CHUNK_SIZE = 1000
+
+    def send_batch(self, upload_id, content, chunk_numbers, chunk_hashes=None):
+        data = {
+            'chunk_numbers': chunk_numbers,
+            'chunks': [SimpleUploadedFile(f'chunk{n}', content[n * self.CHUNK_SIZE:(n + 1) * self.CHUNK_SIZE])
+                       for n in chunk_numbers]
+        }
+        if chunk_hashes is not None:
+            data['chunk_hashes'] = chunk_hashes
+        return self.client.post(f'/api/upload-chunk/batch/{upload_id}', data)
+
+    def test_batches_complete_an_upload(self):
+        content = os.urandom(10 * self.CHUNK_SIZE - 3)
+        upload_id = self.init_upload(content, self.CHUNK_SIZE).json()['upload_id']
+
+        response = self.send_batch(upload_id, content, [9, 0, 4, 5])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['uploaded_chunks'], 4)
+        self.assertFalse(response.json()['is_complete'])
+
+        response = self.send_batch(upload_id, content, [1, 2, 3, 6, 7, 8])
+        self.assertEqual(response.json()['uploaded_chunks'], 10)
+        self.assertTrue(response.json()['is_complete'])
+
+        response = self.complete_upload(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.download(response.json()['file_id'])[1], content)
+
+    def test_bad_chunks_do_not_fail_the_batch(self):
+        content = os.urandom(4 * self.CHUNK_SIZE)
+        upload_id = self.init_upload(content, self.CHUNK_SIZE).json()['upload_id']
+        hashes = chunk_hashes(content, self.CHUNK_SIZE)
+
+        response = self.send_batch(upload_id, content, [0, 1, 2], [hashes[0], 'f' * 32, ''])
+        self.assertEqual(response.status_code, 200)
+        results = {result['chunk_number']: result['uploaded'] for result in response.json()['results']}
+        self.assertEqual(results, {0: True, 1: False, 2: True})
+        self.assertEqual(response.json()['uploaded_chunks'], 2)
+
+        status = self.client.get(f'/api/upload-chunk/status/{upload_id}').json()
+        self.assertEqual(status['missing_chunks'], [1, 3])
+
+    def test_mismatched_lengths(self):
+        content = os.urandom(2 * self.CHUNK_SIZE)
+        upload_id = self.init_upload(content, self.CHUNK_SIZE).json()['upload_id']
+        response = self.send_batch(upload_id, content, [0, 1], ['a' * 32])
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_users_session(self):
+        content = os.urandom(2 * self.CHUNK_SIZE)
+        upload_id = self.init_upload(content, self.CHUNK_SIZE).json()['upload_id']
+        self.client = self.client_for(self.create_user('bob'))
+        self.assertEqual(self.send_batch(upload_id, content, [0]).status_code, 404)
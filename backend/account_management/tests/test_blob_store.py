@@ -0,0 +1,66 @@
+import os
+import hashlib
+from ..models import FileBlob, UserFiles
+from ..utils.storage import get_storage
+from .base import APITestCase
+
+class BlobDedupTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.urandom(50000)
+        self.content_hash = hashlib.sha256(self.content).hexdigest()
+
+    def delete_file(self, file_id, client=None):
+        response = (client or self.client).delete(f'/api/delete-file/{file_id}')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_same_content_is_stored_once(self):
+        # Chunked uploads join the blob store when they declare the whole-file hash
+        first = self.upload_chunked(self.content, 8192, file_hash=self.content_hash)
+        second = self.upload_file(self.content, title='second')
+        bob = self.client_for(self.create_user('bob'))
+        third = self.upload_file(self.content, title='third', client=bob)
+
+        blob = FileBlob.objects.get()
+        self.assertEqual(blob.content_hash, self.content_hash)
+        self.assertEqual(blob.ref_count, 3)
+        self.assertEqual(set(UserFiles.objects.values_list('blob_id', flat=True)), {blob.id})
+        for file_id, client in ((first, None), (second, None), (third, bob)):
+            self.assertEqual(self.download(file_id, client=client)[1], self.content)
+
+    def test_deleting_releases_references(self):
+        first = self.upload_file(self.content, title='first')
+        second = self.upload_file(self.content, title='second')
+        name = FileBlob.objects.get().file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.delete_file(first)
+        self.assertEqual(FileBlob.objects.get().ref_count, 1)
+        self.assertTrue(get_storage().exists(name))
+        self.assertEqual(self.download(second)[1], self.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.delete_file(second)
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertFalse(get_storage().exists(name))
+
+    def test_instant_upload(self):
+        self.upload_file(self.content)
+        response = self.init_upload(self.content, 8192, file_hash=self.content_hash)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['instant'])
+        self.assertEqual(FileBlob.objects.get().ref_count, 2)
+        self.assertEqual(self.download(response.json()['file_id'])[1], self.content)
+
+    def test_instant_upload_needs_own_copy(self):
+        # Knowing the hash of someone else's file must not hand it out
+        self.upload_file(self.content, client=self.client_for(self.create_user('bob')))
+        response = self.init_upload(self.content, 8192, file_hash=self.content_hash)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['instant'])
+        self.assertEqual(FileBlob.objects.get().ref_count, 1)
+
+    def test_bad_file_hash(self):
+        response = self.init_upload(self.content, 8192, file_hash='not-a-hash')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserFiles.objects.exists())
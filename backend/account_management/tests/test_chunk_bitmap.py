@@ -0,0 +1,104 @@
+import os
+import random
+import threading
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from ..api import mark_chunks_received
+from ..models import UserFiles
+from ..utils.chunk_bitmap import empty_bitmap, set_chunks, is_set, count_set, missing_ranges, expand_ranges
+from .base import APITestCase
+
+class ChunkBitmapTests(SimpleTestCase):
+    def test_set_and_count(self):
+        bitmap, newly_set = set_chunks(None, [0, 7, 8, 20], 21)
+        self.assertEqual(len(bitmap), 3)
+        self.assertEqual(newly_set, [0, 7, 8, 20])
+        self.assertEqual(count_set(bitmap), 4)
+        self.assertTrue(is_set(bitmap, 8))
+        self.assertFalse(is_set(bitmap, 9))
+        self.assertFalse(is_set(bitmap, 1000))
+        bitmap, newly_set = set_chunks(bitmap, [7, 9], 21)
+        self.assertEqual(newly_set, [9])
+        self.assertEqual(count_set(bitmap), 5)
+
+    def test_missing_ranges(self):
+        self.assertEqual(missing_ranges(None, 0), [])
+        self.assertEqual(missing_ranges(empty_bitmap(10), 10), [[0, 9]])
+        bitmap, _ = set_chunks(None, [0, 1, 2, 5, 9], 10)
+        self.assertEqual(missing_ranges(bitmap, 10), [[3, 4], [6, 8]])
+        bitmap, _ = set_chunks(None, range(10), 10)
+        self.assertEqual(missing_ranges(bitmap, 10), [])
+
+    def test_missing_ranges_match_a_plain_scan(self):
+        rng = random.Random(42)
+        for _ in range(200):
+            total = rng.randint(1, 100)
+            received = [n for n in range(total) if rng.random() < rng.choice((0.1, 0.5, 0.95))]
+            bitmap, _ = set_chunks(None, received, total)
+            with self.subTest(total=total, received=received):
+                self.assertEqual(expand_ranges(missing_ranges(bitmap, total)),
+                                 [n for n in range(total) if n not in received])
+
+class ConcurrentChunkTests(TransactionTestCase):
+    def test_parallel_updates_are_not_lost(self):
+        user = User.objects.create_user('alice', 'alice@example.com', 'testpassword123')
+        user_file = UserFiles.objects.create(file_title='t', user=user, file_name='t.bin', file_size=64 * 100,
+                                             upload_id='parallel', total_chunks=64, chunk_size=100)
+        errors = []
+
+        def receive(chunk_numbers):
+            try:
+                for chunk_number in chunk_numbers:
+                    mark_chunks_received(user_file, [(chunk_number, 100, None)])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=receive, args=(range(n, 64, 8),)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        user_file.refresh_from_db()
+        self.assertEqual(user_file.uploaded_chunks, 64)
+        self.assertEqual(missing_ranges(user_file.received_chunks, 64), [])
+
+class ChunkUploadTests(APITestCase):
+    CHUNK_SIZE = 1000
+
+    def test_status_reports_missing_chunks(self):
+        content = os.urandom(7 * self.CHUNK_SIZE + 1)
+        upload_id = self.init_upload(content, self.CHUNK_SIZE).json()['upload_id']
+        for chunk_number in (0, 1, 4, 7):
+            self.assertEqual(self.send_chunk(upload_id, content, self.CHUNK_SIZE, chunk_number).status_code, 200)
+        # Sending a chunk twice doesn't count it twice
+        self.assertEqual(self.send_chunk(upload_id, content, self.CHUNK_SIZE, 4).json()['uploaded_chunks'], 4)
+
+        status = self.client.get(f'/api/upload-chunk/status/{upload_id}').json()
+        self.assertEqual(status['uploaded_chunks'], 4)
+        self.assertEqual(status['missing_ranges'], [[2, 3], [5, 6]])
+        self.assertEqual(status['missing_chunks'], [2, 3, 5, 6])
+
+        # Completing early reports what is still missing
+        response = self.complete_upload(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['missing_ranges'], [[2, 3], [5, 6]])
+
+        for chunk_number in (2, 3, 5, 6):
+            self.send_chunk(upload_id, content, self.CHUNK_SIZE, chunk_number)
+        response = self.complete_upload(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.download(response.json()['file_id'])[1], content)
+
+    def test_rejects_bad_chunks(self):
+        content = os.urandom(3 * self.CHUNK_SIZE)
+        upload_id = self.init_upload(content, self.CHUNK_SIZE).json()['upload_id']
+        self.assertEqual(self.send_chunk(upload_id, content, self.CHUNK_SIZE, 3).status_code, 400)
+        # Short chunk in the middle
+        self.assertEqual(self.send_chunk(upload_id, content[:2500], self.CHUNK_SIZE, 2).status_code, 400)
+        self.assertEqual(self.send_chunk(upload_id, content, self.CHUNK_SIZE, 0, chunk_hash='0' * 32).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/upload-chunk/status/{upload_id}').json()['uploaded_chunks'], 0)
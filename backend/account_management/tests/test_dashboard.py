@@ -0,0 +1,64 @@
+import os
+from django.test import SimpleTestCase
+from ..utils.dashboard import parse_sections, DASHBOARD_SECTIONS
+from .base import APITestCase
+
+FIREFOX = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:130.0) Gecko/20100101 Firefox/130.0'
+SAFARI_IPHONE = 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 Version/17.5 Mobile Safari/604.1'
+
+class ParseSectionsTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(parse_sections(None), list(DASHBOARD_SECTIONS))
+        self.assertEqual(parse_sections(''), list(DASHBOARD_SECTIONS))
+        self.assertEqual(parse_sections(' device_pie, overview ,'), ['device_pie', 'overview'])
+        with self.assertRaises(ValueError):
+            parse_sections('overview,likes')
+
+class DashboardTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_id = self.upload_file(os.urandom(2000), title='report')
+        self.upload_file(os.urandom(1000), title='notes')
+        for user_agent in (FIREFOX, FIREFOX, SAFARI_IPHONE):
+            self.download(self.file_id, HTTP_USER_AGENT=user_agent)
+
+    def dashboard(self, sections=None):
+        return self.client.get('/api/statistics/dashboard', {'sections': sections} if sections else {})
+
+    def test_all_sections(self):
+        response = self.dashboard()
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), set(DASHBOARD_SECTIONS) | {'generated_at'})
+
+        overview = data['overview']
+        self.assertEqual((overview['total_files'], overview['total_downloads'], overview['total_file_size_bytes']),
+                         (2, 3, 3000))
+        self.assertEqual((overview['recent_uploads_7_days'], overview['recent_downloads_7_days']), (2, 3))
+        self.assertEqual(overview['most_downloaded_file'], {'file_title': 'report', 'download_count': 3})
+        self.assertEqual(data['daily_downloads']['total_downloads'], 3)
+        self.assertEqual(data['daily_uploads']['data'][-1]['upload_count'], 2)
+        self.assertEqual([(row['browser'], row['count']) for row in data['browser_pie']['data']],
+                         [('Firefox', 2), ('Safari', 1)])
+        self.assertEqual([(row['device'], row['download_count']) for row in data['device_bar']['data']],
+                         [('Windows Desktop', 2), ('iPhone', 1)])
+
+    def test_sections_match_the_single_chart_endpoints(self):
+        data = self.dashboard().json()
+        for section, path in (('daily_downloads', 'daily-downloads'), ('daily_uploads', 'daily-uploads'),
+                              ('device_pie', 'device-downloads-pie'), ('device_bar', 'device-downloads-bar'),
+                              ('browser_pie', 'browser-downloads-pie')):
+            with self.subTest(section=section):
+                self.assertEqual(self.client.get(f'/api/statistics/{path}').json(), data[section])
+        overview = self.client.get('/api/statistics/overview').json()['overview']
+        self.assertEqual(overview, data['overview'])
+
+    def test_subset(self):
+        data = self.dashboard('device_pie,daily_uploads').json()
+        self.assertEqual(set(data), {'device_pie', 'daily_uploads', 'generated_at'})
+        self.assertEqual(self.dashboard('overview').json()['overview']['total_downloads'], 3)
+
+    def test_unknown_section(self):
+        response = self.dashboard('overview,likes')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('likes', response.json()['detail'])
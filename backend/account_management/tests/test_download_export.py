@@ -0,0 +1,85 @@
+import os
+import csv
+import io
+import json
+from datetime import datetime
+from unittest import mock
+from django.utils import timezone
+from ..models import FileDownloadTransaction
+from ..utils.download_export import EXPORT_FIELDS
+from .base import APITestCase
+
+FIREFOX = 'Mozilla/5.0 (X11; Linux x86_64; rv:130.0) Gecko/20100101 Firefox/130.0'
+
+class DownloadExportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.report = self.upload_file(os.urandom(1000), title='report')
+        self.notes = self.upload_file(os.urandom(1000), title='notes, v2')
+        for file_id, day in ((self.report, 1), (self.notes, 2), (self.report, 3)):
+            self.download(file_id, HTTP_USER_AGENT=FIREFOX)
+            latest = FileDownloadTransaction.objects.latest('id')
+            FileDownloadTransaction.objects.filter(pk=latest.pk).update(
+                timestamp=timezone.make_aware(datetime(2026, 5, day, 12)))
+        self.download(self.report, HTTP_USER_AGENT=FIREFOX, HTTP_RANGE='bytes=10-19')
+        FileDownloadTransaction.objects.filter(is_partial=True).update(
+            timestamp=timezone.make_aware(datetime(2026, 5, 3, 18)))
+
+    def export(self, **params):
+        response = self.client.get('/api/download-history/export', params)
+        content = b''.join(response.streaming_content).decode() if response.streaming else response.content.decode()
+        return response, content
+
+    def ndjson(self, **params):
+        response, content = self.export(**params)
+        self.assertEqual(response.status_code, 200, content)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_ndjson(self):
+        rows = self.ndjson()
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(list(rows[0]), list(EXPORT_FIELDS))
+        self.assertEqual([row['file_title'] for row in rows], ['report', 'notes, v2', 'report', 'report'])
+        self.assertEqual(rows[0]['timestamp'], timezone.make_aware(datetime(2026, 5, 1, 12)).isoformat())
+        self.assertEqual((rows[0]['browser'], rows[0]['os']), ('Firefox', 'Linux'))
+        self.assertEqual((rows[3]['is_partial'], rows[3]['range_start'], rows[3]['range_end']), (True, 10, 19))
+        self.assertEqual([row['id'] for row in rows], sorted(row['id'] for row in rows))
+
+    def test_csv(self):
+        response, content = self.export(format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('download-history.csv', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], list(EXPORT_FIELDS))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[2][EXPORT_FIELDS.index('file_title')], 'notes, v2')
+
+    def test_filters(self):
+        self.assertEqual(len(self.ndjson(start='2026-05-02')), 3)
+        self.assertEqual(len(self.ndjson(end='2026-05-02')), 2)
+        self.assertEqual(len(self.ndjson(start='2026-05-02', end='2026-05-02')), 1)
+        self.assertEqual({row['file_id'] for row in self.ndjson(file_id=self.report)}, {self.report})
+        self.assertEqual(len(self.ndjson(file_id=self.report, start='2026-05-03')), 2)
+
+    def test_only_own_downloads(self):
+        bob = self.client_for(self.create_user('bob'))
+        bobs_file = self.upload_file(os.urandom(1000), client=bob)
+        self.download(bobs_file, client=bob)
+        self.assertEqual(len(self.ndjson()), 4)
+
+        response, _ = self.export(file_id=bobs_file)
+        self.assertEqual(response.status_code, 404)
+        response, _ = self.export(file_id=self.report + 1000)
+        self.assertEqual(response.status_code, 404)
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.export(format='xml')[0].status_code, 400)
+        self.assertEqual(self.export(start='2026-05-03', end='2026-05-01')[0].status_code, 400)
+
+    def test_streamed_in_blocks(self):
+        with mock.patch('account_management.utils.download_export.EXPORT_BLOCK_SIZE', 100):
+            response = self.client.get('/api/download-history/export')
+            blocks = list(response.streaming_content)
+        self.assertGreater(len(blocks), 1)
+        self.assertEqual(len(b''.join(blocks).decode().splitlines()), 4)
@@ -0,0 +1,122 @@
+import os
+import json
+import uuid
+import shutil
+import tempfile
+import threading
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from django.db import OperationalError
+from django.utils import timezone
+from ..models import FileDownloadTransaction, UserUsage
+from ..utils import download_log as download_log_module
+from ..utils.download_log import DownloadLog, alog_download, insert_events, replay_orphaned_journals, fcntl
+from .base import APITestCase
+
+@skipUnless(fcntl, "needs flock")
+class DownloadLogTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_id = self.upload_file(b'x' * 1000)
+        self.journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.journal_dir, ignore_errors=True)
+        # Flushes are driven by the test instead of the flusher thread
+        patcher = mock.patch.object(DownloadLog, '_run')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.log = DownloadLog(self.journal_dir, batch_size=1000, flush_interval=3600)
+        self.addCleanup(self.log.shutdown)
+
+    def fields(self, **overrides):
+        return dict({
+            'file_id': self.file_id,
+            'user_id': self.user.id,
+            'ip_address': '127.0.0.1',
+            'user_agent': 'Mozilla/5.0 (X11; Linux x86_64) Firefox/130.0',
+            'is_partial': False,
+            'range_start': None,
+            'range_end': None
+        }, **overrides)
+
+    def event(self, **overrides):
+        return dict(self.fields(**overrides), event_id=uuid.uuid4().hex, timestamp=timezone.now().isoformat())
+
+    def journals(self):
+        return sorted(os.listdir(self.journal_dir))
+
+    def test_flush_writes_buffered_events(self):
+        for _ in range(3):
+            self.log.record(**self.fields())
+        self.log.record(**self.fields(is_partial=True, range_start=500, range_end=999))
+        self.assertFalse(FileDownloadTransaction.objects.exists())
+        self.assertEqual(len(self.journals()), 1)
+
+        self.assertEqual(self.log.flush(), 4)
+        self.assertEqual(FileDownloadTransaction.objects.count(), 4)
+        self.assertEqual(FileDownloadTransaction.objects.filter(browser='Firefox').count(), 4)
+        self.assertEqual(UserUsage.objects.get(user=self.user).total_downloads, 3)
+        # Everything is in the database, so the journal is empty again
+        self.assertEqual(os.path.getsize(os.path.join(self.journal_dir, self.journals()[0])), 0)
+        self.assertEqual(self.log.flush(), 0)
+
+    def test_failed_flushes_keep_one_journal(self):
+        self.log.record(**self.fields())
+        with mock.patch.object(download_log_module, 'insert_events', side_effect=OperationalError('database is locked')):
+            for _ in range(3):
+                with self.assertRaises(OperationalError):
+                    self.log.flush()
+                self.log.record(**self.fields())
+        self.assertEqual(len(self.journals()), 1)
+        with open(os.path.join(self.journal_dir, self.journals()[0]), 'rb') as f:
+            self.assertEqual(len(f.readlines()), 4)
+
+        self.assertEqual(self.log.flush(), 4)
+        self.assertEqual(FileDownloadTransaction.objects.count(), 4)
+
+    def test_events_recorded_during_a_flush_stay_journalled(self):
+        def insert_and_record(events):
+            written = insert_events(events)
+            self.log.record(**self.fields())
+            return written
+
+        self.log.record(**self.fields())
+        with mock.patch.object(download_log_module, 'insert_events', side_effect=insert_and_record):
+            self.assertEqual(self.log.flush(), 1)
+        journals = self.journals()
+        self.assertEqual(len(journals), 1)
+        with open(os.path.join(self.journal_dir, journals[0]), 'rb') as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        self.assertEqual(self.log.flush(), 1)
+        self.assertEqual(FileDownloadTransaction.objects.count(), 2)
+
+    def test_replay_skips_events_already_inserted(self):
+        flushed = [self.event(), self.event()]
+        insert_events(flushed)
+        # A crashed process's journal: two events that made it to the database, one that
+        # didn't, a line torn mid-write and an event for a file deleted since
+        unflushed = self.event()
+        gone = self.event(file_id=self.file_id + 100)
+        with open(os.path.join(self.journal_dir, 'downloads-1-dead.jsonl'), 'wb') as f:
+            for event in flushed + [unflushed, gone]:
+                f.write(json.dumps(event).encode() + b'\n')
+            f.write(b'{"file_id": ')
+
+        # The journal of this (live) process is locked and left alone
+        self.log.record(**self.fields())
+
+        stats = replay_orphaned_journals(self.journal_dir)
+        self.assertEqual(stats, {"journals": 1, "events": 1})
+        self.assertEqual(FileDownloadTransaction.objects.count(), 3)
+        self.assertEqual(UserUsage.objects.get(user=self.user).total_downloads, 3)
+        self.assertEqual(len(self.journals()), 1)
+        self.assertEqual(replay_orphaned_journals(self.journal_dir), {"journals": 0, "events": 0})
+
+    def test_async_record_runs_off_the_event_loop(self):
+        self.set_settings(DOWNLOAD_LOG_BUFFERED=True)
+        threads = []
+        with mock.patch.object(download_log_module.download_log, 'record',
+                               side_effect=lambda **fields: threads.append(threading.current_thread())) as record:
+            async_to_sync(alog_download)(**self.fields())
+        record.assert_called_once_with(**self.fields())
+        self.assertIsNot(threads[0], threading.current_thread())
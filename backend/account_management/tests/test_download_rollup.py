@@ -0,0 +1,89 @@
+import os
+import importlib
+from django.apps import apps
+from django.utils import timezone
+from ..models import DownloadRollup, FileDownloadTransaction
+from ..utils.download_rollup import rebuild_download_rollups
+from .base import APITestCase
+
+FIREFOX = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:130.0) Gecko/20100101 Firefox/130.0'
+CHROME_ANDROID = 'Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 Chrome/129.0 Mobile Safari/537.36'
+
+def rollups():
+    return {(row.file_id, row.day, row.browser, row.device): row.count for row in DownloadRollup.objects.all()}
+
+class DownloadRollupTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_id = self.upload_file(os.urandom(5000))
+
+    def test_downloads_are_rolled_up(self):
+        for user_agent in (FIREFOX, FIREFOX, CHROME_ANDROID):
+            self.download(self.file_id, HTTP_USER_AGENT=user_agent)
+        # Resuming partway through isn't another download
+        self.download(self.file_id, HTTP_USER_AGENT=FIREFOX, HTTP_RANGE='bytes=100-')
+
+        today = timezone.localdate()
+        expected = {
+            (self.file_id, today, 'Firefox', 'Windows Desktop'): 2,
+            (self.file_id, today, 'Chrome', 'Android Mobile'): 1,
+        }
+        self.assertEqual(rollups(), expected)
+        self.assertEqual(FileDownloadTransaction.objects.count(), 4)
+
+        # A rebuild from the transactions arrives at the same rows
+        DownloadRollup.objects.update(count=0)
+        rebuild_download_rollups()
+        self.assertEqual(rollups(), expected)
+
+    def test_deleting_the_file_drops_its_rollups(self):
+        other_file_id = self.upload_file(os.urandom(5000), title='other')
+        self.download(self.file_id, HTTP_USER_AGENT=FIREFOX)
+        self.download(other_file_id, HTTP_USER_AGENT=FIREFOX)
+        self.assertEqual(self.client.delete(f'/api/delete-file/{self.file_id}').status_code, 200)
+        self.assertEqual(list(DownloadRollup.objects.values_list('file_id', 'count')), [(other_file_id, 1)])
+
+    def test_migration_backfill(self):
+        # Downloads logged before rollups (and the browser/device columns) existed
+        for user_agent, is_partial in ((FIREFOX, False), (FIREFOX, False), (CHROME_ANDROID, False), (FIREFOX, True)):
+            FileDownloadTransaction.objects.create(file_id=self.file_id, user=self.user, user_agent=user_agent,
+                                                   is_partial=is_partial)
+        migration = importlib.import_module('account_management.migrations.0017_downloadrollup')
+        migration.backfill_rollups(apps, None)
+
+        today = timezone.localdate()
+        self.assertEqual(rollups(), {
+            (self.file_id, today, 'Firefox', 'Windows Desktop'): 2,
+            (self.file_id, today, 'Chrome', 'Android Mobile'): 1,
+        })
+
+class UnclassifiedDownloadTests(APITestCase):
+    """Downloads logged before browser/os/device were stored have them empty"""
+
+    def setUp(self):
+        super().setUp()
+        self.file_id = self.upload_file(os.urandom(5000))
+        for user_agent in (FIREFOX, FIREFOX, CHROME_ANDROID, None):
+            FileDownloadTransaction.objects.create(file_id=self.file_id, user=self.user, user_agent=user_agent)
+        self.assertEqual(FileDownloadTransaction.objects.filter(browser='').count(), 4)
+
+    def test_migration_classifies_existing_rows(self):
+        migration = importlib.import_module('account_management.migrations.0018_filedownloadtransaction_user_agent_fields')
+        migration.classify_existing_downloads(apps, None)
+        self.assertFalse(FileDownloadTransaction.objects.filter(browser='').exists())
+        self.assertEqual(
+            sorted(FileDownloadTransaction.objects.values_list('browser', 'os', 'device')),
+            [('Chrome', 'Android', 'Android Mobile'), ('Firefox', 'Windows', 'Windows Desktop'),
+             ('Firefox', 'Windows', 'Windows Desktop'), ('Unknown', 'Unknown', 'Unknown')]
+        )
+
+    def test_rebuild_classifies_unclassified_rows(self):
+        FileDownloadTransaction.objects.create(file_id=self.file_id, user=self.user, user_agent=FIREFOX,
+                                               browser='Firefox', os='Windows', device='Windows Desktop')
+        rebuild_download_rollups()
+        today = timezone.localdate()
+        self.assertEqual(rollups(), {
+            (self.file_id, today, 'Firefox', 'Windows Desktop'): 3,
+            (self.file_id, today, 'Chrome', 'Android Mobile'): 1,
+            (self.file_id, today, 'Unknown', 'Unknown'): 1,
+        })
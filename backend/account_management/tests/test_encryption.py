@@ -0,0 +1,116 @@
+import io
+import os
+import random
+from django.test import TestCase
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from ..utils.compression import CODEC_ZLIB, new_compressor
+from ..utils.encryption import (
+    AES_KEY, ContainerError, SegmentedReader, SegmentedWriter, container_size, decrypt_file_content,
+    iter_decrypt_cbc, iter_decrypt_file
+)
+
+def encrypt_cbc(content: bytes, key: bytes) -> bytes:
+    """Legacy layout: IV followed by AES-CBC over the PKCS7-padded content"""
+    iv = os.urandom(16)
+    padder = padding.PKCS7(128).padder()
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+    return iv + encryptor.update(padder.update(content) + padder.finalize()) + encryptor.finalize()
+
+def blocks(data: bytes, block_size: int):
+    for offset in range(0, len(data), block_size):
+        yield data[offset:offset + block_size]
+
+class CBCDecryptionTests(TestCase):
+    def setUp(self):
+        self.random = random.Random(1234)
+
+    def assert_stream_matches(self, size: int, read_size: int):
+        content = os.urandom(size)
+        encrypted = encrypt_cbc(content, AES_KEY)
+        streamed = b''.join(iter_decrypt_cbc(io.BytesIO(encrypted), AES_KEY, block_size=read_size))
+        self.assertEqual(streamed, decrypt_file_content(encrypted, AES_KEY))
+        self.assertEqual(streamed, content)
+
+    def test_block_boundary_sizes(self):
+        for size in (0, 1, 15, 16, 17, 31, 32, 33, 64 * 1024):
+            for read_size in (1, 15, 16, 17, 33, 4096):
+                with self.subTest(size=size, read_size=read_size):
+                    self.assert_stream_matches(size, read_size)
+
+    def test_random_sizes(self):
+        for _ in range(50):
+            size = self.random.randint(0, 200_000)
+            read_size = self.random.randint(1, 70_000)
+            with self.subTest(size=size, read_size=read_size):
+                self.assert_stream_matches(size, read_size)
+
+    def test_iter_decrypt_file_reads_legacy_format(self):
+        content = os.urandom(100_003)
+        encrypted = encrypt_cbc(content, AES_KEY)
+        self.assertEqual(b''.join(iter_decrypt_file(io.BytesIO(encrypted), AES_KEY)), content)
+
+    def test_truncated_input(self):
+        with self.assertRaises(ValueError):
+            list(iter_decrypt_cbc(io.BytesIO(b'\x00' * 10), AES_KEY))
+
+class SegmentedContainerTests(TestCase):
+    SEGMENT_SIZE = 1000
+
+    def seal(self, content: bytes, segment_size: int = SEGMENT_SIZE, workers: int = 1, flags: int = 0) -> bytes:
+        destination = io.BytesIO()
+        writer = SegmentedWriter(destination, AES_KEY, segment_size=segment_size, flags=flags, workers=workers)
+        for block in blocks(content, 777):
+            writer.write(block)
+        writer.close()
+        return destination.getvalue()
+
+    def test_round_trip(self):
+        for size in (0, 1, 999, 1000, 1001, 5000, 12_345):
+            for workers in (1, 3):
+                with self.subTest(size=size, workers=workers):
+                    content = os.urandom(size)
+                    encrypted = self.seal(content, workers=workers)
+                    self.assertEqual(len(encrypted), container_size(size, self.SEGMENT_SIZE))
+                    self.assertEqual(decrypt_file_content(encrypted, AES_KEY), content)
+                    self.assertEqual(b''.join(iter_decrypt_file(io.BytesIO(encrypted), AES_KEY)), content)
+
+    def test_default_segment_size_in_parallel(self):
+        content = os.urandom(3 * 1024 * 1024 + 5)
+        destination = io.BytesIO()
+        writer = SegmentedWriter(destination, AES_KEY, workers=2)
+        for block in blocks(content, 64 * 1024):
+            writer.write(block)
+        writer.close()
+        self.assertEqual(writer.bytes_written, len(content))
+        self.assertEqual(decrypt_file_content(destination.getvalue(), AES_KEY), content)
+
+    def test_ranges(self):
+        content = os.urandom(4321)
+        reader = SegmentedReader(io.BytesIO(self.seal(content)), AES_KEY)
+        self.assertEqual(reader.size, len(content))
+        for start, end in ((0, 1), (0, 1000), (999, 1001), (1000, 2000), (1500, 4321), (4320, None), (3000, 99_999)):
+            with self.subTest(start=start, end=end):
+                self.assertEqual(b''.join(reader.iter_range(start, end)), content[start:end])
+        self.assertEqual(b''.join(reader.iter_range(4321)), b'')
+
+    def test_compressed_round_trip(self):
+        content = b'the same line over and over\n' * 2000
+        compressor = new_compressor(CODEC_ZLIB)
+        compressed = compressor.compress(content) + compressor.flush()
+        encrypted = self.seal(compressed, flags=CODEC_ZLIB)
+        self.assertEqual(SegmentedReader(io.BytesIO(encrypted), AES_KEY).codec, CODEC_ZLIB)
+        self.assertEqual(decrypt_file_content(encrypted, AES_KEY), content)
+
+    def test_tampering_is_detected(self):
+        encrypted = bytearray(self.seal(os.urandom(2500)))
+        encrypted[-20] ^= 1
+        with self.assertRaises(ContainerError):
+            decrypt_file_content(bytes(encrypted), AES_KEY)
+
+    def test_truncation_is_detected(self):
+        encrypted = self.seal(os.urandom(2500))
+        # Dropping the final segment leaves a container whose last segment isn't marked as last
+        truncated = encrypted[:len(encrypted) - (2500 - 2000) - 28]
+        with self.assertRaises(ContainerError):
+            decrypt_file_content(truncated, AES_KEY)
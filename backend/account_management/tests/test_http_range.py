@@ -0,0 +1,83 @@
+import os
+from django.test import SimpleTestCase
+from ..utils.http_range import parse_byte_range, if_range_matches, RangeNotSatisfiable
+from .base import APITestCase
+
+class ParseByteRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        cases = {
+            'bytes=0-99': (0, 99),
+            'bytes=100-': (100, 999),
+            'bytes=-100': (900, 999),
+            'bytes=-5000': (0, 999),
+            'bytes=990-5000': (990, 999),
+            ' Bytes = 5-5 ': (5, 5),
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(parse_byte_range(header, 1000), expected)
+
+    def test_ignored_headers(self):
+        for header in ('', 'bytes', 'items=0-1', 'bytes=0-1,5-6', 'bytes=abc-', 'bytes=5-1', 'bytes=0'):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_byte_range(header, 1000))
+
+    def test_unsatisfiable(self):
+        for header, size in (('bytes=1000-', 1000), ('bytes=-0', 1000), ('bytes=-1', 0), ('bytes=0-', 0)):
+            with self.subTest(header=header, size=size):
+                with self.assertRaises(RangeNotSatisfiable):
+                    parse_byte_range(header, size)
+
+    def test_if_range(self):
+        etag, last_modified = '"abc"', 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.assertTrue(if_range_matches('', etag, last_modified))
+        self.assertTrue(if_range_matches('"abc"', etag, last_modified))
+        self.assertFalse(if_range_matches('"old"', etag, last_modified))
+        self.assertFalse(if_range_matches('W/"abc"', etag, last_modified))
+        self.assertTrue(if_range_matches(last_modified, etag, last_modified))
+        self.assertFalse(if_range_matches('Thu, 22 Oct 2015 07:28:00 GMT', etag, last_modified))
+
+class RangeDownloadTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.urandom(3 * 1024 * 1024 + 17)
+        self.file_id = self.upload_file(self.content)
+
+    def test_full_download(self):
+        response, body = self.download(self.file_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response['Content-Length']), len(self.content))
+        self.assertEqual(body, self.content)
+
+    def test_partial_download_across_segments(self):
+        start, end = 1024 * 1024 - 10, 2 * 1024 * 1024 + 10
+        response, body = self.download(self.file_id, HTTP_RANGE=f'bytes={start}-{end}')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{len(self.content)}')
+        self.assertEqual(int(response['Content-Length']), end - start + 1)
+        self.assertEqual(body, self.content[start:end + 1])
+
+    def test_suffix_range(self):
+        response, body = self.download(self.file_id, HTTP_RANGE='bytes=-100')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.content[-100:])
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.download(self.file_id, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_if_range(self):
+        response, _ = self.download(self.file_id)
+        etag = response['ETag']
+        response, body = self.download(self.file_id, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=etag)
+        self.assertEqual((response.status_code, body), (206, self.content[10:20]))
+        # A changed validator gets the whole current file instead of a range of it
+        response, body = self.download(self.file_id, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, body), (200, self.content))
+
+    def test_other_users_file(self):
+        other = self.client_for(self.create_user('bob'))
+        response, _ = self.download(self.file_id, client=other, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 404)
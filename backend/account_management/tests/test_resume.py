@@ -0,0 +1,68 @@
+import os
+from ..models import UserFiles
+from .base import APITestCase, chunk_hashes
+
+class ResumeUploadTests(APITestCase):
+    CHUNK_SIZE = 1000
+
+    def setUp(self):
+        super().setUp()
+        self.content = os.urandom(5 * self.CHUNK_SIZE - 10)
+        self.hashes = chunk_hashes(self.content, self.CHUNK_SIZE)
+
+    def start(self, content, hashes, chunk_numbers):
+        response = self.init_upload(content, self.CHUNK_SIZE, chunk_hashes=hashes)
+        self.assertEqual(response.status_code, 200, response.content)
+        upload_id = response.json()['upload_id']
+        for chunk_number in chunk_numbers:
+            self.assertEqual(self.send_chunk(upload_id, content, self.CHUNK_SIZE, chunk_number).status_code, 200)
+        return upload_id
+
+    def test_resume_by_fingerprint(self):
+        upload_id = self.start(self.content, self.hashes, [0, 1, 3])
+
+        response = self.init_upload(self.content, self.CHUNK_SIZE, chunk_hashes=self.hashes, file_title='again')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['resumed'])
+        self.assertEqual(response.json()['upload_id'], upload_id)
+        self.assertEqual(response.json()['missing_chunks'], [2, 4])
+        self.assertEqual(UserFiles.objects.count(), 1)
+
+        for chunk_number in (2, 4):
+            self.send_chunk(upload_id, self.content, self.CHUNK_SIZE, chunk_number)
+        response = self.complete_upload(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.download(response.json()['file_id'])[1], self.content)
+
+    def test_changed_chunk_is_sent_again(self):
+        upload_id = self.start(self.content, self.hashes, [0, 1, 2, 3])
+        edited = self.content[:2500] + bytes(b ^ 0xff for b in self.content[2500:2510]) + self.content[2510:]
+        edited_hashes = chunk_hashes(edited, self.CHUNK_SIZE)
+
+        response = self.init_upload(edited, self.CHUNK_SIZE, chunk_hashes=edited_hashes)
+        self.assertTrue(response.json()['resumed'])
+        self.assertEqual(response.json()['upload_id'], upload_id)
+        self.assertEqual(response.json()['missing_ranges'], [[2, 2], [4, 4]])
+
+        # The old copy of chunk 2 no longer matches the declared hash
+        self.assertEqual(self.send_chunk(upload_id, self.content, self.CHUNK_SIZE, 2).status_code, 400)
+        for chunk_number in (2, 4):
+            self.assertEqual(self.send_chunk(upload_id, edited, self.CHUNK_SIZE, chunk_number).status_code, 200)
+        response = self.complete_upload(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.download(response.json()['file_id'])[1], edited)
+
+    def test_different_layout_starts_over(self):
+        self.start(self.content, self.hashes, [0])
+        response = self.init_upload(self.content, 2 * self.CHUNK_SIZE,
+                                    chunk_hashes=chunk_hashes(self.content, 2 * self.CHUNK_SIZE))
+        self.assertFalse(response.json()['resumed'])
+        self.assertEqual(UserFiles.objects.count(), 2)
+
+    def test_bad_hashes_leave_nothing_behind(self):
+        for fields in ({'chunk_hashes': ['zz' * 16] * 5}, {'chunk_hashes': self.hashes[:4]},
+                       {'chunk_hashes': [h[:8] for h in self.hashes]}):
+            with self.subTest(fields=fields):
+                self.assertEqual(self.init_upload(self.content, self.CHUNK_SIZE, **fields).status_code, 400)
+        self.assertFalse(UserFiles.objects.exists())
+        self.assertEqual([files for _, _, files in os.walk(self.media_root) if files], [])
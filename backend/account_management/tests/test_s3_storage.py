@@ -0,0 +1,182 @@
+import io
+import os
+import uuid
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock, skipUnless
+from django.test import SimpleTestCase
+from ..models import UserFiles
+from ..utils import storage as storage_module
+from ..utils.storage import S3Storage, ClientError, get_storage
+from ..utils.upload_assembly import get_upload_name
+from .base import APITestCase
+
+class StubS3Client:
+    """In-memory stand-in for the boto3 S3 client calls S3Storage makes"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+
+    def error(self, code, operation):
+        return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self.error('404', 'HeadObject')
+        data, modified = self.objects[Bucket, Key]
+        return {'ContentLength': len(data), 'LastModified': modified}
+
+    def get_object(self, Bucket, Key, Range):
+        if (Bucket, Key) not in self.objects:
+            raise self.error('NoSuchKey', 'GetObject')
+        start, end = (int(n) for n in Range[len('bytes='):].split('-'))
+        return {'Body': io.BytesIO(self.objects[Bucket, Key][0][start:end + 1])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def upload_file(self, Filename, Bucket, Key):
+        with open(Filename, 'rb') as f:
+            self.objects[Bucket, Key] = (f.read(), datetime.now(timezone.utc))
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = (Bucket, Key, {})
+        return {'UploadId': upload_id}
+
+    def parts(self, Bucket, Key, UploadId):
+        if UploadId not in self.uploads or self.uploads[UploadId][:2] != (Bucket, Key):
+            raise self.error('NoSuchUpload', 'ListParts')
+        return self.uploads[UploadId][2]
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.parts(Bucket, Key, UploadId)[PartNumber] = Body
+
+    def list_parts(self, Bucket, Key, UploadId, MaxParts=1000):
+        parts = self.parts(Bucket, Key, UploadId)
+        return {'Parts': [{'PartNumber': n, 'Size': len(parts[n]), 'ETag': hashlib.md5(parts[n]).hexdigest()}
+                          for n in sorted(parts)][:MaxParts]}
+
+    def get_paginator(self, operation):
+        client = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                yield getattr(client, operation)(**kwargs)
+        return Paginator()
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.parts(Bucket, Key, UploadId)
+        numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+        assert numbers == sorted(parts), numbers
+        self.objects[Bucket, Key] = (b''.join(parts[n] for n in numbers), datetime.now(timezone.utc))
+        del self.uploads[UploadId]
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.parts(Bucket, Key, UploadId)
+        del self.uploads[UploadId]
+
+@skipUnless(ClientError, "needs boto3")
+class S3StorageTests(SimpleTestCase):
+    def setUp(self):
+        self.s3 = StubS3Client()
+        self.storage = S3Storage('bucket', prefix='files/', client=self.s3)
+
+    def test_put_open_and_delete(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, ignore_errors=True)
+        path = os.path.join(temp_dir, 'data')
+        content = os.urandom(10000)
+        with open(path, 'wb') as f:
+            f.write(content)
+        self.storage.put_file(path, 'blobs/ab/cd/x')
+        self.assertFalse(os.path.exists(path))
+        self.assertIn(('bucket', 'files/blobs/ab/cd/x'), self.s3.objects)
+
+        self.assertEqual(self.storage.stat('blobs/ab/cd/x')[0], len(content))
+        with self.storage.open('blobs/ab/cd/x') as f:
+            f.seek(5000)
+            self.assertEqual(f.read(100), content[5000:5100])
+            f.seek(-10, io.SEEK_END)
+            self.assertEqual(f.read(), content[-10:])
+
+        self.storage.delete('blobs/ab/cd/x')
+        self.assertFalse(self.storage.exists('blobs/ab/cd/x'))
+        with self.assertRaises(FileNotFoundError):
+            self.storage.stat('blobs/ab/cd/x')
+
+    def test_multipart_upload(self):
+        token = self.storage.start_upload('u1', 'user_files/x', b'HEADER')
+        self.assertTrue(self.storage.upload_exists('u1', 'user_files/x', token))
+        self.storage.write_segment('u1', 'user_files/x', token, 1, 4, b'HEADER', b'seg1')
+        self.storage.write_segment('u1', 'user_files/x', token, 0, 4, b'HEADER', b'seg0')
+        self.assertEqual(self.storage.upload_size('u1', 'user_files/x', token), 14)
+
+        self.storage.finish_upload('u1', 'user_files/x', token)
+        self.assertFalse(self.storage.upload_exists('u1', 'user_files/x', token))
+        with self.storage.open('user_files/x') as f:
+            self.assertEqual(f.read(), b'HEADERseg0seg1')
+
+    def test_abort_upload(self):
+        token = self.storage.start_upload('u1', 'user_files/x', b'HEADER')
+        self.storage.abort_upload('u1', 'user_files/x', token)
+        self.assertFalse(self.storage.upload_exists('u1', 'user_files/x', token))
+        # Aborting twice (e.g. GC after a cancel) is not an error
+        self.storage.abort_upload('u1', 'user_files/x', token)
+        self.assertFalse(self.storage.upload_exists('u1', 'user_files/x', None))
+
+@skipUnless(ClientError, "needs boto3")
+class S3UploadTests(APITestCase):
+    """The upload and download endpoints running on S3Storage"""
+
+    def setUp(self):
+        super().setUp()
+        self.s3 = StubS3Client()
+        self.set_settings(FILE_STORAGE_BACKEND='s3', S3_BUCKET='bucket', S3_PREFIX='', S3_ENDPOINT_URL='', S3_REGION='')
+        patcher = mock.patch.object(storage_module.boto3, 'client', return_value=self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_storage.cache_clear()
+        self.chunk_size = S3Storage.min_part_size
+
+    def test_whole_file_upload(self):
+        content = os.urandom(100000)
+        file_id = self.upload_file(content)
+        self.assertEqual(len(self.s3.objects), 1)
+        response, body = self.download(file_id, HTTP_RANGE='bytes=1000-1999')
+        self.assertEqual((response.status_code, body), (206, content[1000:2000]))
+
+    def test_chunked_upload(self):
+        content = os.urandom(self.chunk_size + 1000)
+        file_id = self.upload_chunked(content, self.chunk_size)
+        self.assertEqual(self.s3.uploads, {})
+        self.assertEqual(self.download(file_id)[1], content)
+
+    def test_small_chunks_rejected(self):
+        response = self.init_upload(os.urandom(3000), 1000)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('min_chunk_size', response.json())
+        self.assertEqual(self.s3.uploads, {})
+
+    def test_cancel_aborts_multipart_upload(self):
+        content = os.urandom(self.chunk_size + 1000)
+        upload_id = self.init_upload(content, self.chunk_size).json()['upload_id']
+        self.send_chunk(upload_id, content, self.chunk_size, 0)
+        self.assertEqual(len(self.s3.uploads), 1)
+        self.assertEqual(self.client.delete(f'/api/upload-chunk/cancel/{upload_id}').status_code, 200)
+        self.assertEqual(self.s3.uploads, {})
+
+    def test_retry_after_multipart_upload_completed(self):
+        content = os.urandom(self.chunk_size + 1000)
+        upload_id = self.init_upload(content, self.chunk_size, file_hash=hashlib.sha256(content).hexdigest()).json()['upload_id']
+        for chunk_number in range(2):
+            self.send_chunk(upload_id, content, self.chunk_size, chunk_number)
+        user_file = UserFiles.objects.get(upload_id=upload_id)
+        get_storage().finish_upload(upload_id, get_upload_name(user_file), user_file.storage_upload_id)
+
+        response = self.complete_upload(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.download(response.json()['file_id'])[1], content)
@@ -0,0 +1,73 @@
+import os
+from django.db import transaction
+from ..utils.stats_cache import invalidate_user_stats
+from .base import APITestCase
+
+class StatsCacheTests(APITestCase):
+    settings_overrides = dict(APITestCase.settings_overrides, STATS_CACHE_SECONDS=300)
+
+    def total_files(self, client=None):
+        return (client or self.client).get('/api/account-stats').json()['total_files']
+
+    def metrics(self):
+        self.user.is_staff = True
+        self.user.save()
+        return self.client.get('/api/statistics/cache-metrics').json()['endpoints']['account_stats']
+
+    def test_changes_invalidate_on_commit(self):
+        self.assertEqual(self.total_files(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            file_id = self.upload_file(os.urandom(1000))
+        self.assertEqual(self.total_files(), 1)
+        self.assertEqual(self.total_files(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.download(file_id)
+        self.assertEqual(self.client.get('/api/account-stats').json()['total_downloads'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/delete-file/{file_id}')
+        self.assertEqual(self.total_files(), 0)
+
+        metrics = self.metrics()
+        self.assertEqual((metrics['hits'], metrics['misses']), (1, 4))
+
+    def test_cached_until_commit(self):
+        self.assertEqual(self.total_files(), 0)
+        # Without a commit the generation token stays, so the cached response is served
+        self.upload_file(os.urandom(1000))
+        self.assertEqual(self.total_files(), 0)
+
+        try:
+            with transaction.atomic():
+                invalidate_user_stats(self.user.id)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(self.total_files(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_user_stats(self.user.id)
+        self.assertEqual(self.total_files(), 1)
+
+    def test_users_are_invalidated_separately(self):
+        bob = self.client_for(self.create_user('bob'))
+        self.assertEqual(self.total_files(bob), 0)
+        self.assertEqual(self.total_files(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload_file(os.urandom(1000), client=bob)
+        self.assertEqual(self.total_files(bob), 1)
+        # Alice's response is still served from the cache
+        self.assertEqual(self.total_files(), 0)
+        self.assertEqual(self.metrics()['hits'], 1)
+
+    def test_errors_are_not_cached(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/statistics/time-series', {'granularity': 'minute'}).status_code, 400)
+        self.user.is_staff = True
+        self.user.save()
+        metrics = self.client.get('/api/statistics/cache-metrics').json()['endpoints']['time_series_stats']
+        self.assertEqual((metrics['hits'], metrics['misses']), (0, 2))
+
+    def test_metrics_are_staff_only(self):
+        self.assertEqual(self.client.get('/api/statistics/cache-metrics').status_code, 403)
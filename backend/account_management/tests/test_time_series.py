@@ -0,0 +1,106 @@
+from datetime import date, datetime, timedelta
+from django.test import SimpleTestCase
+from django.utils import timezone
+from ..models import UserFiles, DownloadRollup, FileDownloadTransaction
+from ..utils.time_series import bucket_starts, time_series, MAX_BUCKETS
+from .base import APITestCase
+
+class BucketStartsTests(SimpleTestCase):
+    def test_granularities(self):
+        start, end = date(2026, 1, 28), date(2026, 3, 2)
+        days = bucket_starts(start, end, 'day')
+        self.assertEqual((len(days), days[0], days[-1]), (34, start, end))
+        # Weeks start on Monday, months on the 1st, even before start
+        self.assertEqual(bucket_starts(start, end, 'week')[:2], [date(2026, 1, 26), date(2026, 2, 2)])
+        self.assertEqual(bucket_starts(start, end, 'week')[-1], date(2026, 3, 2))
+        self.assertEqual(bucket_starts(start, end, 'month'), [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)])
+
+    def test_hours_across_dst(self):
+        with timezone.override('Europe/Berlin'):
+            hours = bucket_starts(date(2026, 3, 29), date(2026, 3, 29), 'hour')
+            self.assertEqual(len(hours), 23)
+            self.assertEqual(len(set(hours)), 23)
+            self.assertEqual(hours[0], timezone.make_aware(datetime(2026, 3, 29)))
+            self.assertEqual(len(bucket_starts(date(2026, 10, 25), date(2026, 10, 25), 'hour')), 25)
+
+    def test_too_many_buckets(self):
+        with self.assertRaises(ValueError):
+            bucket_starts(date(2020, 1, 1), date(2020, 1, 1) + timedelta(days=MAX_BUCKETS), 'day')
+        self.assertEqual(len(bucket_starts(date(2020, 1, 1), date(2020, 1, 1) + timedelta(days=MAX_BUCKETS - 1), 'day')),
+                         MAX_BUCKETS)
+
+class TimeSeriesTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.start = date(2026, 5, 1)
+
+    def add_upload(self, day, size, hour=12):
+        user_file = UserFiles.objects.create(file_title='f', user=self.user, file_name='f.bin', file_size=size,
+                                             file='user_files/f.bin')
+        uploaded_at = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+        UserFiles.objects.filter(pk=user_file.pk).update(uploaded_at=uploaded_at)
+        return user_file
+
+    def test_uploads_and_bytes_are_zero_filled(self):
+        self.add_upload(date(2026, 5, 2), 100)
+        self.add_upload(date(2026, 5, 2), 50, hour=23)
+        self.add_upload(date(2026, 5, 5), 7)
+        self.add_upload(date(2026, 5, 9), 1000)  # Outside the range
+
+        uploads = time_series(self.user, 'uploads', self.start, date(2026, 5, 7))
+        self.assertEqual([point['value'] for point in uploads], [0, 2, 0, 0, 1, 0, 0])
+        self.assertEqual([point['period'] for point in uploads][:2], [date(2026, 5, 1), date(2026, 5, 2)])
+        self.assertEqual([point['value'] for point in time_series(self.user, 'bytes', self.start, date(2026, 5, 7))],
+                         [0, 150, 0, 0, 7, 0, 0])
+        # 2026-05-01 is a Friday
+        self.assertEqual(time_series(self.user, 'uploads', self.start, date(2026, 5, 10), 'week'),
+                         [{'period': date(2026, 4, 27), 'value': 2}, {'period': date(2026, 5, 4), 'value': 2}])
+
+        hours = time_series(self.user, 'uploads', date(2026, 5, 2), date(2026, 5, 2), 'hour')
+        self.assertEqual(len(hours), 24)
+        self.assertEqual({point['period'].hour: point['value'] for point in hours if point['value']}, {12: 1, 23: 1})
+
+    def test_other_users_are_not_counted(self):
+        self.add_upload(self.start, 10)
+        other = self.create_user('bob')
+        UserFiles.objects.create(file_title='f', user=other, file_name='f.bin', file_size=10, file='user_files/b.bin')
+        self.assertEqual(sum(point['value'] for point in time_series(other, 'uploads', self.start, self.start)), 0)
+
+    def test_downloads(self):
+        user_file = self.add_upload(self.start, 10)
+        DownloadRollup.objects.create(file=user_file, day=date(2026, 5, 2), browser='Firefox', device='Linux Desktop', count=3)
+        DownloadRollup.objects.create(file=user_file, day=date(2026, 5, 2), browser='Chrome', device='iPhone', count=2)
+        self.assertEqual([point['value'] for point in time_series(self.user, 'downloads', self.start, date(2026, 5, 3))],
+                         [0, 5, 0])
+        self.assertEqual(time_series(self.user, 'downloads', self.start, date(2026, 5, 3), 'month'),
+                         [{'period': date(2026, 5, 1), 'value': 5}])
+
+        # Hours come from the transactions themselves
+        download = FileDownloadTransaction.objects.create(file=user_file, user=self.user)
+        FileDownloadTransaction.objects.filter(pk=download.pk).update(
+            timestamp=timezone.make_aware(datetime(2026, 5, 2, 8, 30)))
+        FileDownloadTransaction.objects.create(file=user_file, user=self.user, is_partial=True)
+        hours = time_series(self.user, 'downloads', date(2026, 5, 2), date(2026, 5, 2), 'hour')
+        self.assertEqual({point['period'].hour: point['value'] for point in hours if point['value']}, {8: 1})
+
+    def test_bad_arguments(self):
+        for args in (('likes', self.start, self.start, 'day'), ('uploads', self.start, self.start, 'year'),
+                     ('uploads', self.start, self.start - timedelta(days=1), 'day'),
+                     ('uploads', date(2000, 1, 1), self.start, 'hour')):
+            with self.subTest(args=args):
+                with self.assertRaises(ValueError):
+                    time_series(self.user, *args)
+
+    def test_endpoint(self):
+        self.add_upload(date(2026, 5, 2), 100)
+        response = self.client.get('/api/statistics/time-series',
+                                   {'metric': 'bytes', 'start': '2026-05-01', 'end': '2026-05-03'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], [
+            {'period': '2026-05-01', 'value': 0},
+            {'period': '2026-05-02', 'value': 100},
+            {'period': '2026-05-03', 'value': 0},
+        ])
+        self.assertEqual(response.json()['total'], 100)
+        response = self.client.get('/api/statistics/time-series', {'granularity': 'minute'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,96 @@
+import os
+import hashlib
+from datetime import timedelta
+from unittest import mock
+from django.utils import timezone
+from ..models import UserFiles, UserUsage
+from ..utils.storage import get_storage
+from ..utils.upload_assembly import assemble_chunked_upload, get_upload_name, PHASE_COMPLETE, PHASE_FAILED, PHASE_QUEUED
+from ..utils.upload_gc import run_upload_gc
+from .base import APITestCase
+
+class UploadCompletionTests(APITestCase):
+    CHUNK_SIZE = 1000
+
+    def setUp(self):
+        super().setUp()
+        self.content = os.urandom(3 * self.CHUNK_SIZE + 5)
+
+    def receive_all(self, **fields):
+        upload_id = self.init_upload(self.content, self.CHUNK_SIZE, **fields).json()['upload_id']
+        for chunk_number in range(4):
+            self.send_chunk(upload_id, self.content, self.CHUNK_SIZE, chunk_number)
+        return upload_id
+
+    def status(self, upload_id):
+        return self.client.get(f'/api/upload-chunk/status/{upload_id}').json()
+
+    def test_inline_completion(self):
+        upload_id = self.receive_all(file_hash=hashlib.sha256(self.content).hexdigest())
+        response = self.complete_upload(upload_id)
+        self.assertEqual(response.status_code, 200)
+        status = self.status(upload_id)
+        self.assertTrue(status['is_complete'])
+        self.assertEqual(status['completion_phase'], PHASE_COMPLETE)
+        self.assertEqual(status['completion_bytes_done'], len(self.content))
+        self.assertIsNotNone(UserFiles.objects.get(upload_id=upload_id).blob)
+        self.assertEqual(self.complete_upload(upload_id).status_code, 400)
+
+    def test_async_completion(self):
+        self.set_settings(UPLOAD_COMPLETE_ASYNC=True)
+        upload_id = self.receive_all()
+        with mock.patch('account_management.api.enqueue_upload_completion') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.complete_upload(upload_id)
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()['job_id']
+            self.assertEqual(self.status(upload_id)['completion_phase'], PHASE_QUEUED)
+
+            # A repeated request joins the queued job instead of starting another
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.complete_upload(upload_id).json()['job_id'], job_id)
+        enqueue.assert_called_once_with(UserFiles.objects.get(upload_id=upload_id).pk, job_id)
+
+        result = assemble_chunked_upload(enqueue.call_args[0][0])
+        self.assertEqual(self.status(upload_id)['completion_phase'], PHASE_COMPLETE)
+        self.assertEqual(self.download(result['file_id'])[1], self.content)
+
+    def test_unreachable_broker_fails_the_job(self):
+        self.set_settings(UPLOAD_COMPLETE_ASYNC=True)
+        upload_id = self.receive_all()
+        with mock.patch('account_management.tasks.complete_chunked_upload.apply_async', side_effect=OSError):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.complete_upload(upload_id).status_code, 202)
+        status = self.status(upload_id)
+        self.assertEqual(status['completion_phase'], PHASE_FAILED)
+        self.assertFalse(status['is_complete'])
+
+    def finish_in_storage(self, upload_id):
+        """What a completion job leaves behind when it dies right after finishing the storage upload"""
+        user_file = UserFiles.objects.get(upload_id=upload_id)
+        name = get_upload_name(user_file)
+        get_storage().finish_upload(upload_id, name, user_file.storage_upload_id)
+        return name
+
+    def test_retry_after_storage_upload_finished(self):
+        upload_id = self.receive_all()
+        self.finish_in_storage(upload_id)
+
+        response = self.complete_upload(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.download(response.json()['file_id'])[1], self.content)
+        usage = UserUsage.objects.get(user=self.user)
+        self.assertEqual((usage.file_count, usage.total_bytes), (1, len(self.content)))
+
+    def test_gc_removes_finished_object_of_dead_job(self):
+        upload_id = self.receive_all()
+        name = self.finish_in_storage(upload_id)
+        UserFiles.objects.filter(upload_id=upload_id).update(
+            completion_phase=PHASE_FAILED,
+            last_activity_at=timezone.now() - timedelta(hours=30)
+        )
+
+        stats = run_upload_gc(idle_hours=24, pause=0)
+        self.assertEqual(stats['sessions_reclaimed'], 1)
+        self.assertFalse(UserFiles.objects.exists())
+        self.assertFalse(get_storage().exists(name))
@@ -0,0 +1,72 @@
+import os
+from datetime import timedelta
+from django.utils import timezone
+from project_main import settings
+from ..models import UserFiles
+from ..utils.storage import TEMP_CHUNKS_DIR
+from ..utils.upload_gc import run_upload_gc
+from .base import APITestCase
+
+class UploadGCTests(APITestCase):
+    CHUNK_SIZE = 1000
+
+    def start_upload(self, chunk_numbers=(0, 1), hours_idle=0, hours_old=0):
+        content = os.urandom(4 * self.CHUNK_SIZE)
+        upload_id = self.init_upload(content, self.CHUNK_SIZE).json()['upload_id']
+        for chunk_number in chunk_numbers:
+            self.send_chunk(upload_id, content, self.CHUNK_SIZE, chunk_number)
+        now = timezone.now()
+        UserFiles.objects.filter(upload_id=upload_id).update(
+            uploaded_at=now - timedelta(hours=max(hours_old, hours_idle)),
+            last_activity_at=now - timedelta(hours=hours_idle)
+        )
+        return upload_id
+
+    def chunks_dir(self, upload_id):
+        return os.path.join(self.media_root, TEMP_CHUNKS_DIR, upload_id)
+
+    def run_gc(self, **options):
+        return run_upload_gc(max_age_hours=72, idle_hours=24, pause=0, **options)
+
+    def test_reclaims_idle_and_old_sessions(self):
+        idle = self.start_upload(hours_idle=30)
+        old = self.start_upload(hours_old=100)
+        active = self.start_upload(hours_idle=1)
+        completed = self.upload_chunked(os.urandom(2500), self.CHUNK_SIZE)
+
+        stats = self.run_gc()
+        self.assertEqual(stats['sessions_reclaimed'], 2)
+        self.assertGreater(stats['bytes_reclaimed'], 0)
+        self.assertEqual(set(UserFiles.objects.values_list('upload_id', flat=True)),
+                         {active, UserFiles.objects.get(pk=completed).upload_id})
+        self.assertFalse(os.path.exists(self.chunks_dir(idle)))
+        self.assertFalse(os.path.exists(self.chunks_dir(old)))
+        self.assertTrue(os.path.exists(self.chunks_dir(active)))
+        self.assertEqual(self.download(completed)[0].status_code, 200)
+
+    def test_dry_run_deletes_nothing(self):
+        upload_id = self.start_upload(hours_idle=30)
+        stats = self.run_gc(dry_run=True)
+        self.assertTrue(stats['dry_run'])
+        self.assertEqual(stats['sessions_reclaimed'], 1)
+        self.assertGreater(stats['bytes_reclaimed'], 0)
+        self.assertTrue(UserFiles.objects.filter(upload_id=upload_id).exists())
+        self.assertTrue(os.path.exists(self.chunks_dir(upload_id)))
+
+    def test_sweeps_orphaned_temp_data(self):
+        orphan = self.chunks_dir('no-such-session')
+        os.makedirs(orphan)
+        with open(os.path.join(orphan, 'data.part'), 'wb') as f:
+            f.write(b'x' * 100)
+        blob_temp = os.path.join(settings.MEDIA_ROOT, 'blobs', 'tmp')
+        os.makedirs(blob_temp)
+        with open(os.path.join(blob_temp, 'stale'), 'wb') as f:
+            f.write(b'x' * 50)
+        stale = (timezone.now() - timedelta(hours=30)).timestamp()
+        for path in (orphan, os.path.join(blob_temp, 'stale')):
+            os.utime(path, (stale, stale))
+
+        stats = self.run_gc()
+        self.assertEqual(stats['bytes_reclaimed'], 150)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertEqual(os.listdir(blob_temp), [])
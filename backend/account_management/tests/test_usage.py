@@ -0,0 +1,64 @@
+import os
+import hashlib
+from ..models import UserFiles, UserUsage
+from ..utils.usage import recompute_usage, rebuild_usage
+from .base import APITestCase
+
+class UserUsageTests(APITestCase):
+    def usage(self, user=None):
+        usage = UserUsage.objects.get(user=user or self.user)
+        return usage.file_count, usage.total_bytes, usage.total_downloads
+
+    def assertMatchesRecount(self, user=None):
+        counted = self.usage(user)
+        recompute_usage((user or self.user).id)
+        self.assertEqual(counted, self.usage(user))
+
+    def test_counters_follow_uploads_downloads_and_deletes(self):
+        first = os.urandom(3000)
+        first_id = self.upload_file(first)
+        self.assertEqual(self.usage(), (1, 3000, 0))
+
+        second = os.urandom(2500)
+        second_id = self.upload_chunked(second, 1000, file_hash=hashlib.sha256(second).hexdigest())
+        # Same content again completes instantly, but is still a file of its own
+        response = self.init_upload(second, 1000, file_hash=hashlib.sha256(second).hexdigest())
+        self.assertTrue(response.json()['instant'])
+        self.assertEqual(self.usage(), (3, 8000, 0))
+
+        # Unfinished uploads don't count
+        pending = self.init_upload(os.urandom(4000), 1000).json()['upload_id']
+        self.assertEqual(self.usage(), (3, 8000, 0))
+
+        self.download(first_id)
+        self.download(first_id)
+        self.download(second_id)
+        self.download(second_id, HTTP_RANGE='bytes=100-')  # Partial
+        self.assertEqual(self.usage(), (3, 8000, 3))
+        self.assertMatchesRecount()
+
+        # A deleted file takes its downloads with it
+        self.assertEqual(self.client.delete(f'/api/delete-file/{first_id}').status_code, 200)
+        self.assertEqual(self.usage(), (2, 5000, 1))
+        self.assertEqual(self.client.delete(f'/api/upload-chunk/cancel/{pending}').status_code, 200)
+        self.assertEqual(self.usage(), (2, 5000, 1))
+        self.assertMatchesRecount()
+
+        stats = self.client.get('/api/account-stats').json()
+        self.assertEqual((stats['total_files'], stats['total_file_size'], stats['total_downloads']), (2, 5000, 1))
+
+    def test_users_are_counted_separately(self):
+        bob = self.create_user('bob')
+        file_id = self.upload_file(os.urandom(1000), client=self.client_for(bob))
+        self.download(file_id, client=self.client_for(bob))
+        self.upload_file(os.urandom(500))
+        self.assertEqual(self.usage(bob), (1, 1000, 1))
+        self.assertEqual(self.usage(), (1, 500, 0))
+
+    def test_rebuild(self):
+        self.upload_file(os.urandom(1000))
+        # Removed outside the API, so the counters are stale until rebuilt
+        UserFiles.objects.all().delete()
+        self.assertEqual(self.usage(), (1, 1000, 0))
+        self.assertEqual(rebuild_usage()['users'], 1)
+        self.assertEqual(self.usage(), (0, 0, 0))
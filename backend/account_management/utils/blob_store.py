@@ -0,0 +1,141 @@
+import os
+import secrets
+import hashlib
+import logging
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from project_main import settings
+from ..models import FileBlob
+from .storage import get_storage, sharded_name
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = 'blobs'
+
+def hash_stream(chunks: Iterable[bytes], hasher) -> Iterator[bytes]:
+    """Pass chunks through unchanged while feeding them to hasher"""
+    for chunk in chunks:
+        hasher.update(chunk)
+        yield chunk
+
+def hash_encrypted_file(source: BinaryIO, key: bytes, progress: Optional[Callable[[int], None]] = None) -> str:
+    """
+    SHA-256 of the plaintext of an encrypted file object, computed as a stream.
+
+    progress, if given, is called with the number of plaintext bytes hashed so far.
+    """
+    from .encryption import iter_decrypt_file
+    hasher = hashlib.sha256()
+    done = 0
+    for block in iter_decrypt_file(source, key):
+        hasher.update(block)
+        done += len(block)
+        if progress:
+            progress(done)
+    return hasher.hexdigest()
+
+def new_temp_path() -> str:
+    """Absolute path for an in-progress blob write under MEDIA_ROOT/blobs/tmp/"""
+    temp_dir = os.path.join(settings.MEDIA_ROOT, BLOB_DIR, 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    return os.path.join(temp_dir, secrets.token_hex(16))
+
+def find_blob(content_hash: str, user=None) -> Optional[FileBlob]:
+    """
+    Look up a stored blob by plaintext hash.
+
+    When user is given, only blobs that user already references are returned,
+    so knowing a hash is never enough to obtain someone else's file.
+    """
+    blobs = FileBlob.objects.filter(content_hash=content_hash, ref_count__gt=0)
+    if user is not None:
+        blobs = blobs.filter(user_files__user=user)
+    return blobs.first()
+
+def acquire_blob(blob: FileBlob) -> FileBlob:
+    """Take another reference on an existing blob"""
+    FileBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+    blob.refresh_from_db()
+    return blob
+
+def _reference_existing(content_hash: str) -> Optional[FileBlob]:
+    """Inside a transaction: take a reference on the blob for content_hash, if there is one"""
+    blob = FileBlob.objects.select_for_update().filter(content_hash=content_hash).first()
+    if blob is not None:
+        blob.ref_count = F('ref_count') + 1
+        blob.save(update_fields=['ref_count'])
+        blob.refresh_from_db()
+        logger.info(f"Deduplicated upload against blob {content_hash}")
+    return blob
+
+def store_blob(temp_path: str, content_hash: str, size: int, compression: Optional[str] = None) -> FileBlob:
+    """
+    Adopt a freshly encrypted local file as the blob for content_hash.
+
+    If the content is already stored the temp file is discarded and the existing
+    blob gains a reference; otherwise the temp file is moved into storage.
+    compression names the codec applied before encryption, if any.
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                blob = _reference_existing(content_hash)
+                if blob is not None:
+                    os.remove(temp_path)
+                    return blob
+
+                # Unique per write, so a blob being deleted can never remove a new copy
+                relative_path = sharded_name(BLOB_DIR, f"{content_hash}_{secrets.token_hex(4)}", key=content_hash)
+                blob = FileBlob.objects.create(
+                    content_hash=content_hash,
+                    file=relative_path,
+                    size=size,
+                    stored_size=os.path.getsize(temp_path),
+                    compression=compression,
+                    ref_count=1
+                )
+                get_storage().put_file(temp_path, relative_path)
+                return blob
+        except IntegrityError:
+            # Another upload stored the same content concurrently; retry as a duplicate
+            if attempt:
+                raise
+
+def adopt_blob(name: str, content_hash: str, size: int) -> FileBlob:
+    """
+    Like store_blob, for a file that is already in storage under name (e.g. a
+    completed multipart upload): it becomes the blob where it is, or is deleted
+    in favour of the existing copy.
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                blob = _reference_existing(content_hash)
+                if blob is not None:
+                    transaction.on_commit(lambda: get_storage().delete(name))
+                    return blob
+                return FileBlob.objects.create(
+                    content_hash=content_hash,
+                    file=name,
+                    size=size,
+                    stored_size=get_storage().stat(name)[0],
+                    ref_count=1
+                )
+        except IntegrityError:
+            if attempt:
+                raise
+
+def release_blob(blob_id: int):
+    """Drop one reference; the blob row and file are deleted with the last one"""
+    with transaction.atomic():
+        blob = FileBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            blob.ref_count = F('ref_count') - 1
+            blob.save(update_fields=['ref_count'])
+            return
+        name = str(blob.file)
+        blob.delete()
+        transaction.on_commit(lambda: get_storage().delete(name))
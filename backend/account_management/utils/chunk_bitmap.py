@@ -0,0 +1,77 @@
+from typing import Iterable, List, Optional, Tuple
+
+# Chunk i of an upload is bit (i % 8) of byte (i // 8), least significant bit first.
+# A 20k-chunk upload needs 2.5 KB, instead of 20k FileChunk rows.
+
+def empty_bitmap(total_chunks: int) -> bytes:
+    """Bitmap with room for total_chunks chunks, none received"""
+    return bytes((total_chunks + 7) // 8)
+
+def set_chunks(bitmap: Optional[bytes], chunk_numbers: Iterable[int], total_chunks: int) -> Tuple[bytes, List[int]]:
+    """
+    Mark chunk_numbers as received.
+
+    Returns the updated bitmap and the chunk numbers that were not already set.
+    """
+    data = bytearray(bitmap or empty_bitmap(total_chunks))
+    if len(data) < (total_chunks + 7) // 8:
+        data.extend(bytes((total_chunks + 7) // 8 - len(data)))
+    newly_set = []
+    for chunk_number in chunk_numbers:
+        byte_index, bit = divmod(chunk_number, 8)
+        mask = 1 << bit
+        if not data[byte_index] & mask:
+            data[byte_index] |= mask
+            newly_set.append(chunk_number)
+    return bytes(data), newly_set
+
+def is_set(bitmap: Optional[bytes], chunk_number: int) -> bool:
+    """Check whether a chunk has been received"""
+    byte_index, bit = divmod(chunk_number, 8)
+    return bool(bitmap) and byte_index < len(bitmap) and bool(bitmap[byte_index] & (1 << bit))
+
+def count_set(bitmap: Optional[bytes]) -> int:
+    """Number of chunks received"""
+    return int.from_bytes(bitmap or b'', 'little').bit_count()
+
+def missing_ranges(bitmap: Optional[bytes], total_chunks: int) -> List[List[int]]:
+    """
+    Run-length encode the chunks not yet received as inclusive [start, end] pairs.
+
+    Fully received bytes are skipped eight chunks at a time, so the cost is
+    dominated by the size of the bitmap rather than a per-chunk Python loop.
+    """
+    bitmap = bitmap or b''
+    ranges = []
+    run_start = None
+    full_bytes = total_chunks // 8
+    chunk_number = 0
+    while chunk_number < total_chunks:
+        byte_index = chunk_number // 8
+        if chunk_number % 8 == 0 and byte_index < full_bytes:
+            value = bitmap[byte_index] if byte_index < len(bitmap) else 0
+            if value == 0xFF:
+                if run_start is not None:
+                    ranges.append([run_start, chunk_number - 1])
+                    run_start = None
+                chunk_number += 8
+                continue
+            if value == 0:
+                if run_start is None:
+                    run_start = chunk_number
+                chunk_number += 8
+                continue
+        if is_set(bitmap, chunk_number):
+            if run_start is not None:
+                ranges.append([run_start, chunk_number - 1])
+                run_start = None
+        elif run_start is None:
+            run_start = chunk_number
+        chunk_number += 1
+    if run_start is not None:
+        ranges.append([run_start, total_chunks - 1])
+    return ranges
+
+def expand_ranges(ranges: List[List[int]]) -> List[int]:
+    """Turn [start, end] pairs back into a flat list of chunk numbers"""
+    return [n for start, end in ranges for n in range(start, end + 1)]
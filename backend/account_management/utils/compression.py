@@ -0,0 +1,70 @@
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+# Codec ids, stored in the low bits of the container header flags byte
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_MASK = 0x03
+CODEC_NAMES = {CODEC_NONE: None, CODEC_ZLIB: 'zlib', CODEC_ZSTD: 'zstd'}
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Already-compressed formats are never worth a second pass
+INCOMPRESSIBLE_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.mp3', '.mp4', '.m4a', '.mov', '.mkv', '.avi',
+    '.webm', '.ogg', '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.docx', '.xlsx',
+    '.pptx', '.pdf', '.apk', '.jar',
+}
+
+# Compress only when the first block shrinks to at most this fraction of its size
+MIN_SAMPLE_RATIO = 0.9
+
+def preferred_codec() -> int:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+def choose_codec(filename: str, sample: bytes) -> int:
+    """Pick a codec for a file from its extension and a fast trial compression of its first block"""
+    if os.path.splitext(filename)[1].lower() in INCOMPRESSIBLE_EXTENSIONS or not sample:
+        return CODEC_NONE
+    if len(zlib.compress(sample, 1)) > len(sample) * MIN_SAMPLE_RATIO:
+        return CODEC_NONE
+    return preferred_codec()
+
+def new_compressor(codec: int):
+    """Incremental compressor (compress/flush) for codec, or None for CODEC_NONE"""
+    if codec == CODEC_NONE:
+        return None
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(ZLIB_LEVEL)
+
+def decompress_stream(blocks: Iterable[bytes], codec: int) -> Iterator[bytes]:
+    """Decompress a stream of blocks written through new_compressor(codec); CODEC_NONE passes them through"""
+    if codec == CODEC_NONE:
+        yield from blocks
+        return
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("File is zstd-compressed but the zstandard package is not installed")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        decompressor = zlib.decompressobj()
+    for block in blocks:
+        data = decompressor.decompress(block)
+        if data:
+            yield data
+    if codec == CODEC_ZLIB:
+        data = decompressor.flush()
+        if data:
+            yield data
+
+def codec_name(codec: int) -> Optional[str]:
+    return CODEC_NAMES.get(codec)
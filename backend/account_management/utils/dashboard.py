@@ -0,0 +1,153 @@
+"""
+Chart payloads of the statistics endpoints, and the /statistics/dashboard
+bundle that builds all of them from one pass over the user's download
+rollups and one query for recent uploads.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional
+from django.utils import timezone
+from ..models import UserFiles, DownloadRollup
+from .usage import get_usage
+
+DASHBOARD_SECTIONS = ('overview', 'daily_downloads', 'daily_uploads', 'device_pie', 'device_bar', 'browser_pie')
+DOWNLOAD_SECTIONS = {'overview', 'daily_downloads', 'device_pie', 'device_bar', 'browser_pie'}
+
+def daily_points(counts_by_day: Dict, end_date, count_key: str, days: int = 7) -> List[Dict]:
+    """One point per day up to end_date, in the shape the dashboard charts use"""
+    points = []
+    for offset in range(days - 1, -1, -1):
+        day = end_date - timedelta(days=offset)
+        points.append({
+            "date": day.strftime("%Y-%m-%d"),
+            "day_name": day.strftime("%a"),  # Mon, Tue, etc.
+            count_key: counts_by_day.get(day, 0)
+        })
+    return points
+
+def daily_downloads_chart(points: List[Dict]) -> Dict:
+    return {
+        "chart_type": "line_chart",
+        "title": "Daily Downloads (Last 7 Days)",
+        "data": points,
+        "total_downloads": sum(point["download_count"] for point in points)
+    }
+
+def daily_uploads_chart(points: List[Dict]) -> Dict:
+    return {
+        "chart_type": "bar_chart",
+        "title": "Daily File Uploads (Last 7 Days)",
+        "data": points,
+        "total_uploads": sum(point["upload_count"] for point in points)
+    }
+
+def _pie(counts: Dict[str, int], label: str, title: str) -> Dict:
+    total_downloads = sum(counts.values())
+    data = [
+        {
+            label: name,
+            "count": count,
+            "percentage": round((count / total_downloads * 100), 1) if total_downloads > 0 else 0
+        }
+        for name, count in counts.items()
+    ]
+    data.sort(key=lambda x: x["count"], reverse=True)
+    return {"chart_type": "pie_chart", "title": title, "data": data, "total_downloads": total_downloads}
+
+def device_pie_chart(device_counts: Dict[str, int]) -> Dict:
+    return _pie(device_counts, "device", "Downloads by Device Type")
+
+def browser_pie_chart(browser_counts: Dict[str, int]) -> Dict:
+    return _pie(browser_counts, "browser", "Downloads by Browser")
+
+def device_bar_chart(device_counts: Dict[str, int]) -> Dict:
+    data = [{"device": device, "download_count": count} for device, count in device_counts.items()]
+    data.sort(key=lambda x: x["download_count"], reverse=True)
+    return {
+        "chart_type": "bar_chart",
+        "title": "Downloads by Device Type",
+        "data": data,
+        "total_downloads": sum(item["download_count"] for item in data)
+    }
+
+def overview(usage, recent_uploads: int, recent_downloads: int, top_file: Optional[UserFiles],
+             top_downloads: int) -> Dict:
+    return {
+        "overview": {
+            "total_files": usage.file_count,
+            "total_downloads": usage.total_downloads,
+            "total_file_size_bytes": usage.total_bytes,
+            "total_file_size_mb": round(usage.total_bytes / (1024 * 1024), 2),
+            "recent_uploads_7_days": recent_uploads,
+            "recent_downloads_7_days": recent_downloads,
+            "most_downloaded_file": {
+                "file_title": top_file.file_title,
+                "download_count": top_downloads
+            } if top_file else None
+        },
+        "generated_at": timezone.now().isoformat()
+    }
+
+def parse_sections(sections: Optional[str]) -> List[str]:
+    """Comma-separated section names (all when empty); ValueError on unknown ones"""
+    if not sections:
+        return list(DASHBOARD_SECTIONS)
+    requested = [section.strip() for section in sections.split(',') if section.strip()]
+    unknown = [section for section in requested if section not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown sections: {', '.join(unknown)}; expected any of: {', '.join(DASHBOARD_SECTIONS)}")
+    return requested
+
+def _sum_rollups(rows: Iterable[tuple], since) -> Dict[str, Counter]:
+    """Every download total the dashboard needs, from a single scan of (file, day, browser, device, count)"""
+    totals = {"day": Counter(), "device": Counter(), "browser": Counter(), "file": Counter()}
+    for file_id, day, browser, device, count in rows:
+        if day >= since:
+            totals["day"][day] += count
+        totals["device"][device] += count
+        totals["browser"][browser] += count
+        totals["file"][file_id] += count
+    return totals
+
+def dashboard(user, sections: List[str]) -> Dict:
+    today = timezone.localdate()
+    week_start = today - timedelta(days=6)
+    result = {}
+
+    if DOWNLOAD_SECTIONS.intersection(sections):
+        downloads = _sum_rollups(DownloadRollup.objects.filter(file__user=user)
+                                 .values_list('file_id', 'day', 'browser', 'device', 'count').iterator(), week_start)
+        if 'daily_downloads' in sections:
+            result["daily_downloads"] = daily_downloads_chart(daily_points(downloads["day"], today, "download_count"))
+        if 'device_pie' in sections:
+            result["device_pie"] = device_pie_chart(downloads["device"])
+        if 'device_bar' in sections:
+            result["device_bar"] = device_bar_chart(downloads["device"])
+        if 'browser_pie' in sections:
+            result["browser_pie"] = browser_pie_chart(downloads["browser"])
+
+    if 'daily_uploads' in sections or 'overview' in sections:
+        # Covers both the calendar days of the chart and the overview's rolling 7 x 24 hours
+        last_week = timezone.now() - timedelta(days=7)
+        since = min(last_week, timezone.make_aware(datetime.combine(week_start, time.min)))
+        uploaded = list(UserFiles.objects.filter(user=user, uploaded_at__gte=since)
+                        .values_list('uploaded_at', flat=True))
+        if 'daily_uploads' in sections:
+            uploads_by_day = Counter(timezone.localdate(uploaded_at) for uploaded_at in uploaded)
+            result["daily_uploads"] = daily_uploads_chart(daily_points(uploads_by_day, today, "upload_count"))
+
+    if 'overview' in sections:
+        top = downloads["file"].most_common(1)
+        top_file_id, top_downloads = top[0] if top else (None, 0)
+        files = UserFiles.objects.filter(user=user).only('id', 'file_title')
+        top_file = files.filter(id=top_file_id).first() if top_file_id else files.first()
+        result["overview"] = overview(
+            get_usage(user),
+            recent_uploads=sum(1 for uploaded_at in uploaded if uploaded_at >= last_week),
+            recent_downloads=sum(downloads["day"].values()),
+            top_file=top_file,
+            top_downloads=top_downloads
+        )["overview"]
+
+    result["generated_at"] = timezone.now().isoformat()
+    return result
@@ -0,0 +1,65 @@
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+from django.utils import timezone
+from ..models import FileDownloadTransaction
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+EXPORT_FIELDS = ('id', 'file_id', 'file_title', 'timestamp', 'ip_address', 'user_agent', 'browser', 'os', 'device',
+                 'is_partial', 'range_start', 'range_end')
+TIMESTAMP_INDEX = EXPORT_FIELDS.index('timestamp')
+# Rows fetched per round trip; with a server-side cursor (PostgreSQL) only this many are held at once
+EXPORT_CHUNK_SIZE = 2000
+# Rows are sent in blocks of about this many characters rather than one write per row
+EXPORT_BLOCK_SIZE = 64 * 1024
+
+def download_history(user, start: Optional[date] = None, end: Optional[date] = None, file_id: Optional[int] = None):
+    """A user's downloads as EXPORT_FIELDS tuples in id order, optionally for local dates start..end and one file"""
+    downloads = FileDownloadTransaction.objects.filter(file__user=user)
+    if start is not None:
+        downloads = downloads.filter(timestamp__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end is not None:
+        downloads = downloads.filter(timestamp__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    if file_id is not None:
+        downloads = downloads.filter(file_id=file_id)
+    fields = ['file__file_title' if field == 'file_title' else field for field in EXPORT_FIELDS]
+    return downloads.order_by('id').values_list(*fields)
+
+class _Line:
+    """Write target for csv.writer that hands back each formatted row"""
+
+    def write(self, value):
+        return value
+
+def _iter_rows(rows) -> Iterator[list]:
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = list(row)
+        row[TIMESTAMP_INDEX] = row[TIMESTAMP_INDEX].isoformat()
+        yield row
+
+def iter_ndjson(rows) -> Iterator[str]:
+    for row in _iter_rows(rows):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+def iter_csv(rows) -> Iterator[str]:
+    writer = csv.writer(_Line())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in _iter_rows(rows):
+        yield writer.writerow(row)
+
+def iter_export(rows, export_format: str) -> Iterator[str]:
+    """The rows formatted as NDJSON or CSV, in blocks of about EXPORT_BLOCK_SIZE characters"""
+    lines = iter_csv(rows) if export_format == 'csv' else iter_ndjson(rows)
+    block, block_size = [], 0
+    for line in lines:
+        block.append(line)
+        block_size += len(line)
+        if block_size >= EXPORT_BLOCK_SIZE:
+            yield ''.join(block)
+            block, block_size = [], 0
+    if block:
+        yield ''.join(block)
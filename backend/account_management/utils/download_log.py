@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import secrets
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List
+from asgiref.sync import sync_to_async
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from project_main import settings
+from ..models import UserFiles, FileDownloadTransaction
+from .download_rollup import add_to_rollups, count_downloads
+from .usage import record_downloads
+from .user_agent import classify_user_agent
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): downloads are logged straight to the database
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = '.jsonl'
+
+def _lock(fd: int, blocking: bool = True) -> bool:
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+def new_download(**fields) -> FileDownloadTransaction:
+    """An unsaved download row with its user agent classified"""
+    return FileDownloadTransaction(**fields, **classify_user_agent(fields.get('user_agent'))._asdict())
+
+def backfill_download_agents(batch_size: int = 1000, pause: float = 0.0) -> Dict[str, int]:
+    """
+    Classify the user agent of downloads logged before browser/os/device were
+    stored. Walks unclassified rows by primary key, one short transaction per
+    batch, with one UPDATE per distinct agent in the batch.
+    """
+    started = time.monotonic()
+    stats = {"rows": 0, "batches": 0}
+    last_id = 0
+    while True:
+        batch = list(FileDownloadTransaction.objects.filter(id__gt=last_id, browser='')
+                     .order_by('id').values_list('id', 'user_agent')[:batch_size])
+        if not batch:
+            break
+        ids_by_agent = {}
+        for download_id, user_agent in batch:
+            ids_by_agent.setdefault(user_agent, []).append(download_id)
+        with transaction.atomic():
+            for user_agent, ids in ids_by_agent.items():
+                FileDownloadTransaction.objects.filter(id__in=ids).update(**classify_user_agent(user_agent)._asdict())
+        last_id = batch[-1][0]
+        stats["rows"] += len(batch)
+        stats["batches"] += 1
+        if pause:
+            time.sleep(pause)
+    stats["duration_ms"] = int((time.monotonic() - started) * 1000)
+    logger.info(f"Backfilled download user agents: {stats}")
+    return stats
+
+def count_logged(downloads: List[FileDownloadTransaction]):
+    """Inside the logging transaction: add new download rows to the rollups and usage counters"""
+    add_to_rollups(count_downloads(downloads))
+    record_downloads(Counter(download.file_id for download in downloads if not download.is_partial))
+
+def insert_events(events: List[Dict]) -> int:
+    """
+    bulk_create download events and add them to the rollups, skipping ones
+    already inserted (a replayed journal, or a concurrent flush of the same
+    events) or whose file is gone
+    """
+    with transaction.atomic():
+        # Events with the same id share their file, so locking the files makes a concurrent
+        # writer of these events commit first: its rows then show up as existing below
+        live_files = set(UserFiles.objects.select_for_update().filter(id__in={event['file_id'] for event in events})
+                         .order_by('id').values_list('id', flat=True))
+        events = [event for event in events if event['file_id'] in live_files]
+        event_ids = [uuid.UUID(event['event_id']) for event in events]
+        existing = set(FileDownloadTransaction.objects.filter(event_id__in=event_ids)
+                       .values_list('event_id', flat=True))
+        rows = [
+            new_download(
+                event_id=event_id,
+                file_id=event['file_id'],
+                user_id=event['user_id'],
+                timestamp=parse_datetime(event['timestamp']),
+                ip_address=event['ip_address'],
+                user_agent=event['user_agent'],
+                is_partial=event['is_partial'],
+                range_start=event['range_start'],
+                range_end=event['range_end']
+            )
+            for event_id, event in zip(event_ids, events)
+        ]
+        # A duplicate is skipped by the unique event_id instead of failing the whole batch
+        FileDownloadTransaction.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+        # Only rows that weren't there before count, once each
+        inserted = []
+        for row in rows:
+            if row.event_id not in existing:
+                existing.add(row.event_id)
+                inserted.append(row)
+        count_logged(inserted)
+    return len(inserted)
+
+def read_journal(path: str) -> List[Dict]:
+    events = []
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                # A line torn by a crash mid-write was never acknowledged
+                logger.warning(f"Skipping unreadable line in download journal {path}")
+    return events
+
+def replay_orphaned_journals(journal_dir: str = None) -> Dict[str, int]:
+    """
+    Insert the events of journals no running process holds (left by a crash or
+    a failed flush) and delete them. Journals of live processes are locked and
+    skipped.
+    """
+    journal_dir = journal_dir or settings.DOWNLOAD_LOG_JOURNAL_DIR
+    stats = {"journals": 0, "events": 0}
+    if fcntl is None or not os.path.isdir(journal_dir):
+        return stats
+    for name in sorted(os.listdir(journal_dir)):
+        if not name.endswith(JOURNAL_SUFFIX):
+            continue
+        path = os.path.join(journal_dir, name)
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            if not _lock(fd, blocking=False):
+                continue
+            events = read_journal(path)
+            if events:
+                stats["events"] += insert_events(events)
+            os.remove(path)
+            stats["journals"] += 1
+        finally:
+            os.close(fd)
+    if stats["journals"]:
+        logger.info(f"Replayed download journals: {stats}")
+    return stats
+
+class DownloadLog:
+    """
+    In-process buffer for download events.
+
+    record() appends the event to this process's journal (an append-only,
+    flock-held file) and to memory, and never touches the database. A flusher
+    thread writes the buffer with one bulk_create every flush_interval seconds,
+    or sooner once batch_size events are waiting. Only once a flush has
+    committed is the journal cut back to the events still pending, so a crash
+    loses nothing: the next process replays journals nobody holds. A failed
+    flush leaves the journal as it is for the next attempt.
+    """
+
+    def __init__(self, journal_dir: str, batch_size: int, flush_interval: float, fsync: bool = False):
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = []
+        self._journal = None  # (path, fd)
+        self._pid = None
+
+    def _open_journal(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        path = os.path.join(self.journal_dir, f"downloads-{os.getpid()}-{secrets.token_hex(4)}{JOURNAL_SUFFIX}")
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        _lock(fd)
+        return path, fd
+
+    def _start(self):
+        """First use in this process (or in a forked child): open a journal and start the flusher"""
+        self._pid = os.getpid()
+        self._pending = []
+        self._journal = self._open_journal()
+        threading.Thread(target=self._run, name='download-log-flusher', daemon=True).start()
+        atexit.register(self.shutdown)
+
+    def _write(self, fd: int, events: List[Dict]):
+        os.write(fd, b''.join((json.dumps(event, separators=(',', ':')) + '\n').encode() for event in events))
+        if self.fsync:
+            os.fsync(fd)
+
+    def _compact_journal(self):
+        """With the lock held, after a flush: keep only the still pending events in the journal"""
+        path, fd = self._journal
+        if not self._pending:
+            os.ftruncate(fd, 0)
+            return
+        # Events recorded during the flush are copied to a fresh journal before the old one
+        # goes; a crash in between leaves both, and the replay skips the duplicates
+        self._journal = self._open_journal()
+        self._write(self._journal[1], self._pending)
+        os.remove(path)
+        os.close(fd)
+
+    def record(self, **fields):
+        event = dict(fields, event_id=uuid.uuid4().hex, timestamp=timezone.now().isoformat())
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            self._write(self._journal[1], [event])
+            self._pending.append(event)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        try:
+            replay_orphaned_journals(self.journal_dir)
+        except Exception as e:
+            logger.error(f"Replaying download journals failed: {str(e)}")
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Flushing download log failed, will retry: {str(e)}")
+            finally:
+                connections.close_all()
+
+    def flush(self) -> int:
+        """Write buffered events to the database; returns how many were written"""
+        with self._lock:
+            if not self._pending or self._pid != os.getpid():
+                return 0
+            events, self._pending = self._pending, []
+        try:
+            written = insert_events(events)
+        except Exception:
+            # Keep the events for the next attempt; they are still in the journal
+            with self._lock:
+                self._pending = events + self._pending
+            raise
+        with self._lock:
+            self._compact_journal()
+        return written
+
+    def shutdown(self):
+        """Flush at exit and drop the journal if everything made it to the database"""
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Final download log flush failed, events stay in the journal: {str(e)}")
+            return
+        with self._lock:
+            if self._pending or self._pid != os.getpid():
+                return
+            path, fd = self._journal
+            os.remove(path)
+            os.close(fd)
+            self._journal = None
+            self._pid = None
+
+download_log = DownloadLog(
+    journal_dir=settings.DOWNLOAD_LOG_JOURNAL_DIR,
+    batch_size=settings.DOWNLOAD_LOG_BATCH_SIZE,
+    flush_interval=settings.DOWNLOAD_LOG_FLUSH_SECONDS,
+    fsync=settings.DOWNLOAD_LOG_FSYNC
+)
+
+def is_buffered() -> bool:
+    return settings.DOWNLOAD_LOG_BUFFERED and fcntl is not None
+
+def log_download(**fields):
+    """Record a download; fields are FileDownloadTransaction fields (file_id, user_id, ...)"""
+    if is_buffered():
+        download_log.record(**fields)
+        return
+    with transaction.atomic():
+        download = new_download(**fields)
+        download.save()
+        count_logged([download])
+
+async def alog_download(**fields):
+    if is_buffered():
+        # The journal write (and fsync) blocks, so it runs in the thread pool rather than on the event loop
+        await sync_to_async(download_log.record, thread_sensitive=False)(**fields)
+    else:
+        await sync_to_async(log_download)(**fields)
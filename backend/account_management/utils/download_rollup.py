@@ -0,0 +1,68 @@
+import time
+import logging
+from collections import Counter
+from typing import Dict, Iterable
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import UserFiles, FileDownloadTransaction, DownloadRollup
+from .user_agent import classify_user_agent
+
+logger = logging.getLogger(__name__)
+
+def rollup_key(download: FileDownloadTransaction):
+    return (download.file_id, timezone.localdate(download.timestamp), download.browser, download.device)
+
+def add_to_rollups(counts: Dict[tuple, int]):
+    """Add {(file_id, day, browser, device): downloads} to the rollup rows; call inside the logging transaction"""
+    for (file_id, day, browser, device), count in counts.items():
+        rows = DownloadRollup.objects.filter(file_id=file_id, day=day, browser=browser, device=device)
+        if rows.update(count=F('count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                DownloadRollup.objects.create(file_id=file_id, day=day, browser=browser, device=device, count=count)
+        except IntegrityError:
+            # Created concurrently
+            rows.update(count=F('count') + count)
+
+def count_downloads(transactions: Iterable[FileDownloadTransaction]) -> Dict[tuple, int]:
+    """Rollup increments for newly logged downloads; partial (range) downloads are not counted"""
+    return Counter(rollup_key(t) for t in transactions if not t.is_partial)
+
+def rebuild_download_rollups(batch_size: int = 200, pause: float = 0.0) -> Dict[str, int]:
+    """
+    Recompute every rollup row from FileDownloadTransaction, a batch of files
+    at a time, grouping on the stored browser/device columns. Rows logged
+    before those were stored are classified from their user agent on the way.
+    Each batch is replaced in one transaction, so the statistics stay
+    readable (and downloads keep being logged) while it runs.
+    """
+    started = time.monotonic()
+    stats = {"files": 0, "rows": 0}
+    file_ids = list(UserFiles.objects.order_by('id').values_list('id', flat=True))
+    for offset in range(0, len(file_ids), batch_size):
+        batch = file_ids[offset:offset + batch_size]
+        with transaction.atomic():
+            downloads = (FileDownloadTransaction.objects.filter(file_id__in=batch, is_partial=False)
+                         .annotate(day=TruncDate('timestamp')))
+            counts = Counter()
+            for row in (downloads.exclude(browser='').values('file_id', 'day', 'browser', 'device')
+                        .annotate(count=Count('id')).order_by()):
+                counts[row['file_id'], row['day'], row['browser'], row['device']] += row['count']
+            for row in (downloads.filter(browser='').values('file_id', 'day', 'user_agent')
+                        .annotate(count=Count('id')).order_by()):
+                agent = classify_user_agent(row['user_agent'])
+                counts[row['file_id'], row['day'], agent.browser, agent.device] += row['count']
+            rollups = [DownloadRollup(file_id=file_id, day=day, browser=browser, device=device, count=count)
+                       for (file_id, day, browser, device), count in counts.items()]
+            DownloadRollup.objects.filter(file_id__in=batch).delete()
+            DownloadRollup.objects.bulk_create(rollups, batch_size=500)
+        stats["files"] += len(batch)
+        stats["rows"] += len(rollups)
+        if pause and offset + batch_size < len(file_ids):
+            time.sleep(pause)
+    stats["duration_ms"] = int((time.monotonic() - started) * 1000)
+    logger.info(f"Rebuilt download rollups: {stats}")
+    return stats
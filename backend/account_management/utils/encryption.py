@@ -1,25 +1,24 @@
+import io
 import os
 import secrets
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, Optional
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.backends import default_backend
-
-def random_filename(ext):
-    return ''.join(secrets.choice('0123456789') for _ in range(10)) + ext
+from .compression import CODEC_MASK, decompress_stream
 
 # WARNING: In production, store this key securely!
 AES_KEY = b'0123456789abcdef0123456789abcdef'  # 32 bytes for AES-256
 
-def encrypt_file_content(content: bytes, key: bytes) -> bytes:
-    iv = secrets.token_bytes(16)
-    padder = padding.PKCS7(128).padder()
-    padded_data = padder.update(content) + padder.finalize()
-    cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-    encryptor = cipher.encryptor()
-    encrypted = encryptor.update(padded_data) + encryptor.finalize()
-    return iv + encrypted  # Prepend IV for later decryption
-
 def decrypt_file_content(encrypted: bytes, key: bytes) -> bytes:
+    if detect_format(encrypted) == FORMAT_SEGMENTED:
+        reader = SegmentedReader(io.BytesIO(encrypted), key)
+        return b''.join(decompress_stream(reader.iter_range(0), reader.codec))
     iv = encrypted[:16]
     encrypted_data = encrypted[16:]
     cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
@@ -28,3 +27,249 @@ def decrypt_file_content(encrypted: bytes, key: bytes) -> bytes:
     unpadder = padding.PKCS7(128).unpadder()
     data = unpadder.update(padded_data) + unpadder.finalize()
     return data
+
+
+# Size of the blocks read from disk when streaming data through the cipher
+STREAM_BLOCK_SIZE = 1024 * 1024  # 1 MiB
+
+# Read size for streaming decryption; keeps per-download memory to a few blocks
+DECRYPT_BLOCK_SIZE = 64 * 1024
+
+def iter_decrypt_cbc(source: BinaryIO, key: bytes, block_size: int = DECRYPT_BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    Incrementally decrypt a legacy IV + AES-CBC file.
+
+    Produces exactly the same bytes as decrypt_file_content, but only ever holds
+    one block of ciphertext; PKCS7 padding is stripped from the final block.
+    """
+    iv = source.read(16)
+    if len(iv) != 16:
+        raise ValueError("Encrypted data is too short")
+    cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
+    decryptor = cipher.decryptor()
+    # The unpadder holds back the last block until finalize(), so padding is only
+    # ever removed from the true end of the stream
+    unpadder = padding.PKCS7(128).unpadder()
+    while True:
+        block = source.read(block_size)
+        if not block:
+            break
+        data = unpadder.update(decryptor.update(block))
+        if data:
+            yield data
+    tail = unpadder.update(decryptor.finalize()) + unpadder.finalize()
+    if tail:
+        yield tail
+
+def iter_decrypt_file(source: BinaryIO, key: bytes) -> Iterator[bytes]:
+    """Stream the plaintext of an encrypted file in either container format, decompressing if needed"""
+    prefix = source.read(HEADER_SIZE)
+    source.seek(0)
+    if detect_format(prefix) == FORMAT_SEGMENTED:
+        reader = SegmentedReader(source, key)
+        yield from decompress_stream(reader.iter_range(0), reader.codec)
+    else:
+        yield from iter_decrypt_cbc(source, key)
+
+
+# Segmented container format (version 2)
+#
+# Version 1 files are the original layout: a 16 byte IV followed by one AES-CBC
+# stream over the whole PKCS7-padded file. Version 2 files start with a header
+#
+#     magic (4) | version (1) | flags (1) | segment_size (4) | file_id (16)
+#
+# followed by the plaintext split into segment_size pieces, each stored as
+#
+#     nonce (12) | AES-GCM ciphertext | tag (16)
+#
+# Every segment except the last holds exactly segment_size bytes, so segment i
+# lives at HEADER_SIZE + i * (segment_size + SEGMENT_OVERHEAD) and any byte range
+# can be decrypted without touching the rest of the file. The header, segment
+# index and a last-segment flag are bound in as associated data, so segments
+# cannot be reordered, spliced between files or truncated undetected.
+#
+# The low two bits of flags name a compression codec (see compression.py). A
+# compressed file is one zlib/zstd stream split into segments, so it can only
+# be read from the start.
+
+FORMAT_CBC = 1
+FORMAT_SEGMENTED = 2
+
+CONTAINER_MAGIC = b'\x89SEG'
+HEADER_FORMAT = '>4sBBI16s'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+NONCE_SIZE = 12
+TAG_SIZE = 16
+SEGMENT_OVERHEAD = NONCE_SIZE + TAG_SIZE
+SEGMENT_SIZE = 1024 * 1024  # 1 MiB of plaintext per segment
+
+class ContainerError(Exception):
+    """Raised when an encrypted container is malformed or fails authentication"""
+    pass
+
+def detect_format(prefix: bytes) -> int:
+    """Return FORMAT_SEGMENTED or FORMAT_CBC based on the first bytes of an encrypted file"""
+    if len(prefix) >= HEADER_SIZE and prefix[:len(CONTAINER_MAGIC)] == CONTAINER_MAGIC \
+            and prefix[len(CONTAINER_MAGIC)] == FORMAT_SEGMENTED:
+        return FORMAT_SEGMENTED
+    return FORMAT_CBC
+
+def _segment_aad(header: bytes, index: int, is_last: bool) -> bytes:
+    return header + struct.pack('>QB', index, 1 if is_last else 0)
+
+def new_container_header(segment_size: int = SEGMENT_SIZE, flags: int = 0) -> bytes:
+    """Build a fresh container header with a random file id"""
+    return struct.pack(HEADER_FORMAT, CONTAINER_MAGIC, FORMAT_SEGMENTED, flags,
+                       segment_size, secrets.token_bytes(16))
+
+def segment_offset(segment_size: int, index: int) -> int:
+    """Byte offset of segment index inside a container"""
+    return HEADER_SIZE + index * (segment_size + SEGMENT_OVERHEAD)
+
+def container_size(plaintext_size: int, segment_size: int = SEGMENT_SIZE) -> int:
+    """Size of the segmented container holding plaintext_size bytes"""
+    segments = max(-(-plaintext_size // segment_size), 1)
+    return HEADER_SIZE + plaintext_size + segments * SEGMENT_OVERHEAD
+
+def encrypt_segment(header: bytes, key: bytes, index: int, data: bytes, is_last: bool) -> bytes:
+    """
+    Seal one segment of the container identified by header.
+
+    Segments are independent, so they can be produced out of order (e.g. as
+    chunks of an upload arrive) and written at segment_offset().
+    """
+    nonce = secrets.token_bytes(NONCE_SIZE)
+    return nonce + AESGCM(key).encrypt(nonce, data, _segment_aad(header, index, is_last))
+
+class SegmentedWriter:
+    """
+    Streaming writer for the segmented container format.
+
+    With workers > 1 segments are sealed on a thread pool (AES-GCM in the
+    cryptography backend runs without the GIL) and written in order; at most
+    2 * workers segments are in flight, so memory stays bounded.
+    """
+
+    def __init__(self, destination: BinaryIO, key: bytes, segment_size: int = SEGMENT_SIZE, flags: int = 0,
+                 workers: int = 1):
+        self.destination = destination
+        self.segment_size = segment_size
+        self.header = new_container_header(segment_size, flags)
+        self.bytes_written = 0
+        self._key = key
+        self._buffer = bytearray()
+        self._index = 0
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self._pending = deque()
+        self._max_pending = 2 * workers
+        self.destination.write(self.header)
+
+    def _emit(self, data: bytes, is_last: bool):
+        if self._pool is None:
+            self.destination.write(encrypt_segment(self.header, self._key, self._index, data, is_last))
+        else:
+            self._pending.append(self._pool.submit(encrypt_segment, self.header, self._key,
+                                                   self._index, data, is_last))
+            while len(self._pending) >= self._max_pending:
+                self.destination.write(self._pending.popleft().result())
+        self._index += 1
+
+    def write(self, data: bytes):
+        """Buffer plaintext and write out every complete segment"""
+        if self._closed:
+            raise ValueError("write to closed SegmentedWriter")
+        self._buffer += data
+        self.bytes_written += len(data)
+        # Keep at least one byte back so the final segment is always written by close()
+        while len(self._buffer) > self.segment_size:
+            self._emit(bytes(self._buffer[:self.segment_size]), is_last=False)
+            del self._buffer[:self.segment_size]
+
+    def close(self):
+        """Write the final (possibly short or empty) segment"""
+        if self._closed:
+            return
+        try:
+            self._emit(bytes(self._buffer), is_last=True)
+            while self._pending:
+                self.destination.write(self._pending.popleft().result())
+        finally:
+            self.abort()
+
+    def abort(self):
+        """Stop without writing anything further, e.g. when the source failed"""
+        self._closed = True
+        self._buffer = bytearray()
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+class SegmentedReader:
+    """Random-access reader for the segmented container format"""
+
+    def __init__(self, source: BinaryIO, key: bytes, total_size: Optional[int] = None):
+        self.source = source
+        self.header = source.read(HEADER_SIZE)
+        if detect_format(self.header) != FORMAT_SEGMENTED:
+            raise ContainerError("Not a segmented container")
+        _, _, self.flags, self.segment_size, _ = struct.unpack(HEADER_FORMAT, self.header)
+        if self.segment_size <= 0:
+            raise ContainerError("Invalid segment size")
+        self._aead = AESGCM(key)
+
+        if total_size is None:
+            source.seek(0, os.SEEK_END)
+            total_size = source.tell()
+        body_size = total_size - HEADER_SIZE
+        stride = self.segment_size + SEGMENT_OVERHEAD
+        full_segments, remainder = divmod(body_size, stride)
+        if remainder == 0:
+            if full_segments == 0:
+                raise ContainerError("Container has no segments")
+            self.segment_count = full_segments
+            self.size = full_segments * self.segment_size
+        elif remainder < SEGMENT_OVERHEAD:
+            raise ContainerError("Truncated segment")
+        else:
+            self.segment_count = full_segments + 1
+            self.size = full_segments * self.segment_size + remainder - SEGMENT_OVERHEAD
+
+    @property
+    def codec(self) -> int:
+        """Compression codec applied before encryption; sizes and ranges refer to the compressed bytes"""
+        return self.flags & CODEC_MASK
+
+    def read_segment(self, index: int) -> bytes:
+        """Decrypt and authenticate a single segment"""
+        if not 0 <= index < self.segment_count:
+            raise IndexError(index)
+        stride = self.segment_size + SEGMENT_OVERHEAD
+        is_last = index == self.segment_count - 1
+        length = (self.size - index * self.segment_size) + SEGMENT_OVERHEAD if is_last else stride
+        self.source.seek(HEADER_SIZE + index * stride)
+        raw = self.source.read(length)
+        if len(raw) != length:
+            raise ContainerError(f"Segment {index} is truncated")
+        try:
+            return self._aead.decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:],
+                                      _segment_aad(self.header, index, is_last))
+        except InvalidTag:
+            raise ContainerError(f"Segment {index} failed authentication")
+
+    def iter_range(self, start: int, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the plaintext bytes [start, end), decrypting only the segments that cover them"""
+        if end is None or end > self.size:
+            end = self.size
+        if start >= end:
+            return
+        first = start // self.segment_size
+        last = (end - 1) // self.segment_size
+        for index in range(first, last + 1):
+            segment = self.read_segment(index)
+            offset = index * self.segment_size
+            yield segment[max(start - offset, 0):end - offset]
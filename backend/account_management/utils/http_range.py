@@ -0,0 +1,48 @@
+from typing import Optional, Tuple
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header cannot be satisfied for the resource size"""
+    pass
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range: bytes=...`` header.
+
+    Returns an inclusive (start, end) tuple, or None when the header should be
+    ignored and the full content served (missing, malformed, non-byte units or
+    multiple ranges, all of which RFC 9110 allows a server to disregard).
+    Raises RangeNotSatisfiable when the range lies entirely past the end.
+    """
+    if not header:
+        return None
+    units, _, spec = header.strip().partition('=')
+    if units.strip().lower() != 'bytes' or not spec or ',' in spec:
+        return None
+    first, dash, last = spec.strip().partition('-')
+    if not dash:
+        return None
+    try:
+        if first == '':
+            # Suffix range: the final N bytes
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable(header)
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if start < 0 or (end is not None and end < start):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, size - 1 if end is None else min(end, size - 1)
+
+def if_range_matches(if_range: str, etag: str, last_modified: str) -> bool:
+    """Check an If-Range validator against the current strong ETag or Last-Modified date"""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return if_range == last_modified
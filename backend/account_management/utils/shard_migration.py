@@ -0,0 +1,106 @@
+import os
+import time
+import logging
+from typing import Dict, List, Tuple
+from django.db import transaction
+from ..models import FileBlob, UserFiles
+from .storage import get_storage, sharded_name, LocalStorage, SHARDED_NAME_PATTERN
+
+logger = logging.getLogger(__name__)
+
+def _sharded_target(name: str, key: str = None) -> str:
+    directory, filename = os.path.split(name)
+    return sharded_name(directory, filename, key=key)
+
+def _unsharded_blobs():
+    return FileBlob.objects.exclude(file__regex=SHARDED_NAME_PATTERN).order_by('id')
+
+def _unsharded_files():
+    # Blob-backed rows move together with their blob; unfinished chunked uploads have no file yet
+    return (UserFiles.objects.filter(blob__isnull=True)
+            .exclude(file='').exclude(file__regex=SHARDED_NAME_PATTERN).order_by('id'))
+
+def _relocate_blob(blob_id: int, old: str, new: str) -> bool:
+    """Point a blob and every file referencing it at new; False if the blob changed meanwhile"""
+    with transaction.atomic():
+        blob = FileBlob.objects.select_for_update().filter(pk=blob_id, file=old).first()
+        if blob is None:
+            return False
+        FileBlob.objects.filter(pk=blob_id).update(file=new)
+        UserFiles.objects.filter(file=old).update(file=new)
+    return True
+
+def _relocate_file(user_file_id: int, old: str, new: str) -> bool:
+    with transaction.atomic():
+        updated = UserFiles.objects.filter(pk=user_file_id, file=old).update(file=new)
+        UserFiles.objects.filter(pk=user_file_id, storage_name=old).update(storage_name=new)
+    return updated > 0
+
+def _relocate_batch(storage: LocalStorage, rows: List[Tuple], relocate, stats: Dict[str, int]) -> List[str]:
+    """
+    Hard-link each file under its sharded name, then switch the database over.
+    Returns the old names, which stay readable until the caller unlinks them.
+    """
+    moved = []
+    for row_id, old, new in rows:
+        if not storage.exists(old):
+            logger.warning(f"Shard migration: {old} is missing, leaving row {row_id} as is")
+            stats["missing"] += 1
+            continue
+        if not storage.exists(new):
+            storage.link(old, new)
+        if relocate(row_id, old, new):
+            moved.append(old)
+            stats["relocated"] += 1
+        else:
+            # Deleted or moved concurrently; drop the link we just made
+            storage.delete(new)
+    return moved
+
+def migrate_to_sharded_layout(batch_size: int = 200, pause: float = 0.5, max_batches: int = None,
+                              dry_run: bool = False) -> Dict[str, int]:
+    """
+    Move files stored under the old flat blobs/ and user_files/ layout into
+    hash-prefix shards, batch by batch, while the site keeps serving them.
+
+    Every file is linked under its new name before the database points at it,
+    and the old name is only unlinked a pause later, so a request that read
+    the old name just before the switch still finds the file.
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise ValueError("Only the local storage backend uses directory shards")
+
+    started = time.monotonic()
+    stats = {"relocated": 0, "missing": 0, "batches": 0}
+    sources = [
+        (_unsharded_blobs, lambda blob: (blob.id, blob.file.name, _sharded_target(blob.file.name, blob.content_hash)),
+         _relocate_blob),
+        (_unsharded_files, lambda user_file: (user_file.id, user_file.file.name, _sharded_target(user_file.file.name)),
+         _relocate_file),
+    ]
+    for queryset, target, relocate in sources:
+        # Rows that stay unsharded (dry run, missing file) are paged past rather than retried
+        skipped = 0
+        batch = 0
+        while max_batches is None or batch < max_batches:
+            rows = [target(obj) for obj in queryset()[skipped:skipped + batch_size]]
+            if not rows:
+                break
+            batch += 1
+            stats["batches"] += 1
+            if dry_run:
+                stats["relocated"] += len(rows)
+                skipped += len(rows)
+                continue
+            missing = stats["missing"]
+            moved = _relocate_batch(storage, rows, relocate, stats)
+            skipped += stats["missing"] - missing
+            time.sleep(pause)
+            for old in moved:
+                storage.delete(old)
+
+    stats["duration_ms"] = int((time.monotonic() - started) * 1000)
+    stats["dry_run"] = dry_run
+    logger.info(f"Shard migration: {stats}")
+    return stats
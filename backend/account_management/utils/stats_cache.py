@@ -0,0 +1,102 @@
+"""
+Per-user cache for statistics responses.
+
+Every cached response of a user is keyed by that user's current generation
+token; invalidate_user_stats() replaces the token, which orphans all of them
+at once (they expire on their own). A computation racing an invalidation
+stores its result under the old token, where it is never read.
+"""
+import time
+import secrets
+import hashlib
+import logging
+from functools import wraps
+from typing import Dict
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from project_main import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'stats'
+# Endpoints wrapped with cached_stats, for the metrics report
+CACHED_ENDPOINTS = set()
+
+def _generation_key(user_id: int) -> str:
+    return f"{KEY_PREFIX}:gen:{user_id}"
+
+def _generation(user_id: int) -> str:
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Random, so a generation evicted from the cache can't bring back entries made under it
+        cache.add(key, secrets.token_hex(4), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+def invalidate_user_stats(user_id: int):
+    """Drop a user's cached statistics once the current transaction (if any) commits"""
+    transaction.on_commit(lambda: cache.set(_generation_key(user_id), secrets.token_hex(4), timeout=None))
+
+def _count(endpoint: str, metric: str, amount: int = 1):
+    key = f"{KEY_PREFIX}:metrics:{endpoint}:{metric}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        pass  # Evicted in between; metrics are best effort
+
+def cached_stats(view):
+    """
+    Cache a statistics view's response per user and arguments (and the local
+    date, which the default ranges depend on) for STATS_CACHE_SECONDS.
+    Error responses are not cached.
+    """
+    endpoint = view.__name__
+    CACHED_ENDPOINTS.add(endpoint)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if settings.STATS_CACHE_SECONDS <= 0:
+            return view(request, *args, **kwargs)
+        user_id = request.user.id
+        arguments = repr((args, sorted(kwargs.items()), timezone.localdate()))
+        key = (f"{KEY_PREFIX}:{user_id}:{_generation(user_id)}:{endpoint}:"
+               f"{hashlib.sha256(arguments.encode()).hexdigest()[:16]}")
+        response = cache.get(key)
+        if response is not None:
+            _count(endpoint, 'hits')
+            return response
+        started = time.perf_counter()
+        response = view(request, *args, **kwargs)
+        elapsed_us = int((time.perf_counter() - started) * 1_000_000)
+        _count(endpoint, 'misses')
+        _count(endpoint, 'recompute_us', elapsed_us)
+        if isinstance(response, (dict, list)):
+            cache.set(key, response, timeout=settings.STATS_CACHE_SECONDS)
+        return response
+    return wrapper
+
+def cache_metrics() -> Dict:
+    """Hits, misses, hit ratio and mean recompute time per cached endpoint, across processes sharing the cache"""
+    endpoints = {}
+    total_hits = total_misses = 0
+    for endpoint in sorted(CACHED_ENDPOINTS):
+        keys = {metric: f"{KEY_PREFIX}:metrics:{endpoint}:{metric}" for metric in ('hits', 'misses', 'recompute_us')}
+        values = cache.get_many(keys.values())
+        hits, misses, recompute_us = (values.get(keys[metric], 0) for metric in ('hits', 'misses', 'recompute_us'))
+        endpoints[endpoint] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+            "avg_recompute_ms": round(recompute_us / misses / 1000, 2) if misses else None
+        }
+        total_hits += hits
+        total_misses += misses
+    return {
+        "enabled": settings.STATS_CACHE_SECONDS > 0,
+        "timeout_seconds": settings.STATS_CACHE_SECONDS,
+        "hit_ratio": round(total_hits / (total_hits + total_misses), 3) if total_hits + total_misses else None,
+        "endpoints": endpoints
+    }
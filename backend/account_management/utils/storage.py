@@ -0,0 +1,298 @@
+import io
+import os
+import hashlib
+import logging
+from functools import lru_cache
+from typing import BinaryIO, List, Optional, Tuple
+from django.core.exceptions import ImproperlyConfigured
+from project_main import settings
+from .encryption import segment_offset
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # only needed for FILE_STORAGE_BACKEND=s3
+    boto3 = None
+    ClientError = None
+
+logger = logging.getLogger(__name__)
+
+TEMP_CHUNKS_DIR = 'temp_chunks'
+
+# Where encrypted files live. Names are the relative paths stored in FileFields
+# (e.g. blobs/ab/cd/<hash>_<token>, see sharded_name). Both backends also accept a chunked upload as a
+# series of sealed segments (see encryption.py) and turn it into a named file
+# on completion:
+#
+#   start_upload   -> a backend token for the session (S3 UploadId, or None)
+#   write_segment  -> store segment index; segment 0 is preceded by the header
+#   upload_size    -> bytes received so far
+#   finish_upload  -> make the data readable under its name
+#   abort_upload   -> throw the received data away
+
+def sharded_name(directory: str, filename: str, key: Optional[str] = None) -> str:
+    """
+    directory/ab/cd/filename, where abcd are the first hex digits of key (by
+    default a SHA-256 of filename), so no single directory grows past ~65k
+    shards worth of entries
+    """
+    key = key or hashlib.sha256(filename.encode()).hexdigest()
+    return os.path.join(directory, key[0:2], key[2:4], filename)
+
+# Matches names produced by sharded_name (also usable as a __regex lookup)
+SHARDED_NAME_PATTERN = r'^[^/]+/[0-9a-f]{2}/[0-9a-f]{2}/[^/]+$'
+
+def preallocate(f: BinaryIO, size: int):
+    """Reserve size bytes for a file about to be written, where the platform supports it"""
+    if size <= 0 or not hasattr(os, 'posix_fallocate'):
+        return
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except OSError:
+        # Not supported by every filesystem; the write simply goes unreserved
+        pass
+
+def _fsync_path(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class LocalStorage:
+    """
+    Files under MEDIA_ROOT; in-progress uploads are part files in temp_chunks/.
+
+    put_file is atomic: the data is fsynced, renamed into place and the directory
+    entry fsynced, so a crash leaves either the old state or the complete file,
+    never a torn one.
+    """
+
+    min_part_size = 0
+    max_parts = None
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def part_path(self, upload_id: str) -> str:
+        """Encrypted container that chunks are written into as they arrive"""
+        return os.path.join(self.root, TEMP_CHUNKS_DIR, upload_id, 'data.part')
+
+    def open(self, name: str) -> BinaryIO:
+        return open(self.path(name), 'rb')
+
+    def stat(self, name: str) -> Tuple[int, float]:
+        """(size, modification time); raises FileNotFoundError"""
+        st = os.stat(self.path(name))
+        return st.st_size, st.st_mtime
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def delete(self, name: str):
+        if os.path.exists(self.path(name)):
+            os.remove(self.path(name))
+
+    def put_file(self, local_path: str, name: str):
+        """Move a finished local file (on the same filesystem) into storage under name"""
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        _fsync_path(local_path)
+        os.replace(local_path, full_path)
+        _fsync_path(os.path.dirname(full_path))
+
+    def link(self, name: str, new_name: str):
+        """Make the file also available as new_name, without copying it"""
+        new_path = self.path(new_name)
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        os.link(self.path(name), new_path)
+        _fsync_path(os.path.dirname(new_path))
+
+    def start_upload(self, upload_id: str, name: str, header: bytes) -> Optional[str]:
+        part_path = self.part_path(upload_id)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        with open(part_path, 'wb') as f:
+            f.write(header)
+        return None
+
+    def write_segment(self, upload_id: str, name: str, token: Optional[str], index: int,
+                      segment_size: int, header: bytes, sealed: bytes):
+        with open(self.part_path(upload_id), 'r+b') as f:
+            f.seek(segment_offset(segment_size, index))
+            f.write(sealed)
+
+    def upload_exists(self, upload_id: str, name: str, token: Optional[str]) -> bool:
+        return os.path.exists(self.part_path(upload_id))
+
+    def upload_size(self, upload_id: str, name: str, token: Optional[str]) -> int:
+        return os.path.getsize(self.part_path(upload_id))
+
+    def finish_upload(self, upload_id: str, name: str, token: Optional[str]):
+        self.put_file(self.part_path(upload_id), name)
+
+    def abort_upload(self, upload_id: str, name: str, token: Optional[str]):
+        if os.path.exists(self.part_path(upload_id)):
+            os.remove(self.part_path(upload_id))
+
+class S3ObjectReader(io.RawIOBase):
+    """Seekable read-only view of an object, fetched with ranged GETs"""
+
+    def __init__(self, client, bucket: str, key: str, size: int):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(offset, 0)
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size or not len(buffer):
+            return 0
+        end = min(self.position + len(buffer), self.size) - 1
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key,
+                                          Range=f'bytes={self.position}-{end}')
+        data = response['Body'].read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+class S3Storage:
+    """
+    S3-compatible object storage (AWS, MinIO, ...).
+
+    A chunked upload is a native multipart upload of the final object, one part
+    per segment, so completion is a server-side CompleteMultipartUpload and no
+    bytes are copied. S3 requires every part but the last to be at least 5 MiB.
+    """
+
+    min_part_size = 5 * 1024 * 1024
+    max_parts = 10000
+    read_buffer_size = 8 * 1024 * 1024
+
+    def __init__(self, bucket: str, prefix: str = '', client=None, **client_kwargs):
+        if client is None:
+            if boto3 is None:
+                raise ImproperlyConfigured("FILE_STORAGE_BACKEND=s3 requires the boto3 package")
+            client = boto3.client('s3', **client_kwargs)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def key(self, name: str) -> str:
+        return self.prefix + name
+
+    def open(self, name: str) -> BinaryIO:
+        size, _ = self.stat(name)
+        return io.BufferedReader(S3ObjectReader(self.client, self.bucket, self.key(name), size),
+                                 buffer_size=self.read_buffer_size)
+
+    def stat(self, name: str) -> Tuple[int, float]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(name)
+            raise
+        return head['ContentLength'], head['LastModified'].timestamp()
+
+    def exists(self, name: str) -> bool:
+        try:
+            self.stat(name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete(self, name: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+
+    def put_file(self, local_path: str, name: str):
+        # upload_file switches to a multipart upload by itself for large files
+        self.client.upload_file(local_path, self.bucket, self.key(name))
+        os.remove(local_path)
+
+    def start_upload(self, upload_id: str, name: str, header: bytes) -> Optional[str]:
+        response = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key(name))
+        return response['UploadId']
+
+    def write_segment(self, upload_id: str, name: str, token: Optional[str], index: int,
+                      segment_size: int, header: bytes, sealed: bytes):
+        self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key(name),
+            UploadId=token,
+            PartNumber=index + 1,
+            Body=header + sealed if index == 0 else sealed
+        )
+
+    def _list_parts(self, name: str, token: str) -> List[dict]:
+        paginator = self.client.get_paginator('list_parts')
+        parts = []
+        for page in paginator.paginate(Bucket=self.bucket, Key=self.key(name), UploadId=token):
+            parts.extend(page.get('Parts', []))
+        return parts
+
+    def upload_exists(self, upload_id: str, name: str, token: Optional[str]) -> bool:
+        if not token:
+            return False
+        try:
+            self.client.list_parts(Bucket=self.bucket, Key=self.key(name), UploadId=token, MaxParts=1)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'NoSuchUpload':
+                return False
+            raise
+        return True
+
+    def upload_size(self, upload_id: str, name: str, token: Optional[str]) -> int:
+        return sum(part['Size'] for part in self._list_parts(name, token))
+
+    def finish_upload(self, upload_id: str, name: str, token: Optional[str]):
+        parts = [{'ETag': part['ETag'], 'PartNumber': part['PartNumber']}
+                 for part in self._list_parts(name, token)]
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key(name),
+            UploadId=token,
+            MultipartUpload={'Parts': parts}
+        )
+
+    def abort_upload(self, upload_id: str, name: str, token: Optional[str]):
+        if not token:
+            return
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key(name), UploadId=token)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'NoSuchUpload':
+                raise
+
+@lru_cache(maxsize=None)
+def get_storage():
+    """The configured storage backend (FILE_STORAGE_BACKEND)"""
+    if settings.FILE_STORAGE_BACKEND == 's3':
+        client_kwargs = {}
+        if settings.S3_ENDPOINT_URL:
+            client_kwargs['endpoint_url'] = settings.S3_ENDPOINT_URL
+        if settings.S3_REGION:
+            client_kwargs['region_name'] = settings.S3_REGION
+        return S3Storage(settings.S3_BUCKET, prefix=settings.S3_PREFIX, **client_kwargs)
+    if settings.FILE_STORAGE_BACKEND != 'local':
+        raise ImproperlyConfigured(f"Unknown FILE_STORAGE_BACKEND {settings.FILE_STORAGE_BACKEND!r}")
+    return LocalStorage(settings.MEDIA_ROOT)
@@ -0,0 +1,82 @@
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Dict, List
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from ..models import UserFiles, FileDownloadTransaction, DownloadRollup
+
+METRICS = ('uploads', 'downloads', 'bytes')
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+# Zero-filled buckets per series; a year of days is 365, a month of hours 744
+MAX_BUCKETS = 2000
+
+def _local_midnight(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def bucket_starts(start: date, end: date, granularity: str) -> list:
+    """
+    Start of every bucket touching [start, end], matching what Trunc returns:
+    aware local datetimes for hours, dates otherwise (weeks start on Monday)
+    """
+    if granularity == 'hour':
+        # Step in UTC so DST changes don't skip or repeat an hour
+        current = _local_midnight(start).astimezone(dt_timezone.utc)
+        stop = _local_midnight(end + timedelta(days=1))
+        step = lambda value: value + timedelta(hours=1)
+    elif granularity == 'day':
+        current, stop = start, end + timedelta(days=1)
+        step = lambda value: value + timedelta(days=1)
+    elif granularity == 'week':
+        current, stop = start - timedelta(days=start.weekday()), end + timedelta(days=1)
+        step = lambda value: value + timedelta(days=7)
+    else:
+        current, stop = start.replace(day=1), end + timedelta(days=1)
+        step = lambda value: (value + timedelta(days=32)).replace(day=1)
+
+    buckets = []
+    while current < stop:
+        if len(buckets) == MAX_BUCKETS:
+            raise ValueError(f"Range too large for {granularity} granularity (max {MAX_BUCKETS} points)")
+        buckets.append(timezone.localtime(current) if granularity == 'hour' else current)
+        current = step(current)
+    return buckets
+
+def _metric_source(user, metric: str, granularity: str):
+    """(queryset, time field, aggregate) a metric is computed from"""
+    if metric == 'downloads':
+        if granularity == 'hour':
+            return (FileDownloadTransaction.objects.filter(file__user=user, is_partial=False),
+                    'timestamp', Count('id'))
+        # Days and coarser come from the daily rollups
+        return DownloadRollup.objects.filter(file__user=user), 'day', Sum('count')
+    uploads = UserFiles.objects.filter(user=user)
+    if metric == 'bytes':
+        return uploads, 'uploaded_at', Sum('file_size')
+    return uploads, 'uploaded_at', Count('id')
+
+def time_series(user, metric: str, start: date, end: date, granularity: str = 'day') -> List[Dict]:
+    """
+    A user's uploads, downloads or uploaded bytes per bucket from start to end
+    (inclusive, local dates), with one GROUP BY query; empty buckets are 0.
+    Raises ValueError on an unknown metric/granularity or an oversized range.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of: {', '.join(METRICS)}")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}', expected one of: {', '.join(GRANULARITIES)}")
+    if start > end:
+        raise ValueError("start must not be after end")
+    buckets = bucket_starts(start, end, granularity)
+
+    queryset, field, aggregate = _metric_source(user, metric, granularity)
+    if field == 'day':
+        queryset = queryset.filter(day__range=(start, end))
+    else:
+        queryset = queryset.filter(**{
+            f"{field}__gte": _local_midnight(start),
+            f"{field}__lt": _local_midnight(end + timedelta(days=1))
+        })
+    period = Trunc(field, granularity) if granularity == 'hour' else Trunc(field, granularity, output_field=DateField())
+    totals = dict(queryset.annotate(period=period).values_list('period').annotate(value=aggregate).order_by())
+
+    return [{"period": bucket, "value": totals.get(bucket) or 0} for bucket in buckets]
@@ -0,0 +1,159 @@
+import os
+import time
+import shutil
+import logging
+from typing import Dict
+from django.db import transaction
+from django.utils import timezone
+from project_main import settings
+from ..models import UserFiles
+from .encryption import encrypt_segment, HEADER_SIZE, SEGMENT_OVERHEAD, AES_KEY
+from .blob_store import hash_encrypted_file, adopt_blob
+from .storage import get_storage, sharded_name, TEMP_CHUNKS_DIR
+from .usage import record_file_stored
+
+logger = logging.getLogger(__name__)
+
+# Completion job phases, reported through /upload-chunk/status
+PHASE_QUEUED = 'queued'
+PHASE_ASSEMBLING = 'assembling'
+PHASE_VERIFYING = 'verifying'
+PHASE_FINALIZING = 'finalizing'
+PHASE_COMPLETE = 'complete'
+PHASE_FAILED = 'failed'
+ACTIVE_PHASES = (PHASE_QUEUED, PHASE_ASSEMBLING, PHASE_VERIFYING, PHASE_FINALIZING)
+
+# Progress is written to the database at most this often while hashing
+PROGRESS_INTERVAL = 1.0
+
+class UploadAssemblyError(Exception):
+    """Raised when the received data cannot be turned into the final file"""
+    pass
+
+def get_chunks_dir(upload_id):
+    """Local temporary directory of an in-progress chunked upload (declared hashes, local part file)"""
+    return os.path.join(settings.MEDIA_ROOT, TEMP_CHUNKS_DIR, upload_id)
+
+def get_upload_storage_name(upload_id):
+    """Name the completed upload is stored under; fixed at init so S3 can upload parts straight to it"""
+    return sharded_name('user_files', upload_id)
+
+def get_upload_name(user_file):
+    """Storage name of a chunked upload's data"""
+    return user_file.storage_name or get_upload_storage_name(user_file.upload_id)
+
+def get_container_header(user_file):
+    """Container header of a chunked upload; sessions from before it was kept on the row have it in the part file"""
+    if user_file.container_header:
+        return bytes(user_file.container_header)
+    with open(get_storage().part_path(user_file.upload_id), 'rb') as f:
+        return f.read(HEADER_SIZE)
+
+def set_completion_phase(user_file_id: int, phase: str, bytes_done: int = 0, error: str = None):
+    UserFiles.objects.filter(pk=user_file_id).update(
+        completion_phase=phase,
+        completion_bytes_done=bytes_done,
+        completion_error=error,
+        last_activity_at=timezone.now()
+    )
+
+def _progress_reporter(user_file_id: int, phase: str):
+    """Callback for byte progress that only touches the database every PROGRESS_INTERVAL seconds"""
+    last_write = [0.0]
+
+    def report(bytes_done: int):
+        now = time.monotonic()
+        if now - last_write[0] >= PROGRESS_INTERVAL:
+            last_write[0] = now
+            set_completion_phase(user_file_id, phase, bytes_done)
+    return report
+
+def _check_size(actual_size: int, expected_size: int, upload_id: str):
+    if actual_size != expected_size:
+        logger.error(f"Upload data size {actual_size} != expected {expected_size} for upload {upload_id}")
+        raise UploadAssemblyError("Upload data is incomplete")
+
+def assemble_chunked_upload(user_file_id: int) -> Dict:
+    """
+    Turn the part file of a fully received chunked upload into the stored file.
+
+    Chunks were encrypted into storage as they arrived, so this checks the
+    received size, completes the storage upload, verifies a declared content
+    hash (the only step that reads the whole file) and adopts the result into
+    the blob store. Progress is recorded on the UserFiles row as it goes. A
+    retry after a job died past the storage completion picks up from there.
+    """
+    user_file = UserFiles.objects.get(pk=user_file_id)
+    storage = get_storage()
+    upload_id = user_file.upload_id
+    token = user_file.storage_upload_id
+    name = get_upload_name(user_file)
+    file_size = user_file.file_size
+    chunks_dir = get_chunks_dir(upload_id)
+
+    try:
+        set_completion_phase(user_file_id, PHASE_ASSEMBLING)
+        expected_size = HEADER_SIZE + file_size + max(user_file.total_chunks, 1) * SEGMENT_OVERHEAD
+        if storage.upload_exists(upload_id, name, token):
+            if user_file.total_chunks == 0:
+                # Empty file: the container still needs its (empty) final segment
+                header = get_container_header(user_file)
+                storage.write_segment(upload_id, name, token, 0, user_file.chunk_size, header,
+                                      encrypt_segment(header, AES_KEY, 0, b'', is_last=True))
+            _check_size(storage.upload_size(upload_id, name, token), expected_size, upload_id)
+
+            # Local part file is renamed, an S3 multipart upload is completed server-side
+            storage.finish_upload(upload_id, name, token)
+        elif storage.exists(name):
+            # An earlier attempt got as far as finishing the storage upload; carry on from there
+            logger.info(f"Upload {upload_id} is already finished in storage, resuming at verification")
+            _check_size(storage.stat(name)[0], expected_size, upload_id)
+        else:
+            raise UploadAssemblyError("Upload data not found")
+
+        # A hash declared at init is verified against the actual plaintext before the
+        # upload may join (or seed) the shared blob store
+        verified_hash = None
+        if user_file.content_hash:
+            set_completion_phase(user_file_id, PHASE_VERIFYING)
+            with storage.open(name) as f:
+                actual_hash = hash_encrypted_file(f, AES_KEY,
+                                                  progress=_progress_reporter(user_file_id, PHASE_VERIFYING))
+            if actual_hash == user_file.content_hash:
+                verified_hash = actual_hash
+            else:
+                logger.warning(f"Declared hash mismatch for upload {upload_id}, storing without deduplication")
+                user_file.content_hash = None
+        set_completion_phase(user_file_id, PHASE_FINALIZING, file_size)
+
+        user_file.is_upload_complete = True
+        user_file.completion_phase = PHASE_COMPLETE
+        user_file.completion_bytes_done = file_size
+        user_file.completion_error = None
+        user_file.last_activity_at = timezone.now()
+        with transaction.atomic():
+            # Adopted in the same transaction as the save, so a job dying in between
+            # leaves the object under name for the retry (adopt_blob only deletes it on commit)
+            user_file.blob = adopt_blob(name, verified_hash, file_size) if verified_hash else None
+            user_file.file = user_file.blob.file.name if user_file.blob is not None else name
+            # A retried job must not count the file twice
+            already_stored = UserFiles.objects.select_for_update().filter(pk=user_file_id).exclude(file='').exists()
+            user_file.save()
+            if not already_stored:
+                record_file_stored(user_file)
+    except Exception as e:
+        logger.error(f"Error completing chunked upload {upload_id}: {str(e)}")
+        set_completion_phase(user_file_id, PHASE_FAILED, error=str(e))
+        raise
+
+    if os.path.exists(chunks_dir):
+        shutil.rmtree(chunks_dir, ignore_errors=True)
+
+    return {
+        "detail": "File upload completed successfully",
+        "file_id": user_file.id,
+        "file_name": user_file.file_name,
+        "file_size": user_file.file_size,
+        "upload_id": upload_id,
+        "stored_file_path": user_file.file.url
+    }
@@ -0,0 +1,169 @@
+import os
+import time
+import shutil
+import logging
+from datetime import timedelta
+from typing import Dict
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from project_main import settings
+from ..models import UserFiles, FileChunk
+from .storage import get_storage, TEMP_CHUNKS_DIR
+from .stats_cache import invalidate_user_stats
+from .upload_assembly import ACTIVE_PHASES, get_upload_storage_name
+
+logger = logging.getLogger(__name__)
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _remove_path(path: str) -> int:
+    """Delete a file or directory tree, returning the bytes freed"""
+    if os.path.isdir(path):
+        size = _directory_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        return size
+    if os.path.exists(path):
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    return 0
+
+def _remove_finished_upload(name: str, dry_run: bool) -> int:
+    """Delete the stored file of a session that never completed, returning the bytes freed"""
+    storage = get_storage()
+    if not storage.exists(name):
+        return 0
+    size = storage.stat(name)[0]
+    if not dry_run:
+        storage.delete(name)
+    return size
+
+def abandoned_uploads(max_age: timedelta, idle: timedelta):
+    """Incomplete chunked upload sessions that are too old or have gone quiet"""
+    now = timezone.now()
+    return UserFiles.objects.filter(
+        is_upload_complete=False,
+        upload_id__isnull=False,
+        file=''
+    ).exclude(
+        # Being assembled right now; a job that stopped reporting progress is fair game
+        completion_phase__in=ACTIVE_PHASES,
+        last_activity_at__gte=now - idle
+    ).filter(
+        Q(uploaded_at__lt=now - max_age)
+        | Q(last_activity_at__lt=now - idle)
+        | Q(last_activity_at__isnull=True, uploaded_at__lt=now - idle)
+    )
+
+def collect_abandoned_uploads(max_age: timedelta, idle: timedelta, batch_size: int,
+                              pause: float, max_batches: int, dry_run: bool = False) -> Dict[str, int]:
+    """Delete abandoned sessions with their temp_chunks data and FileChunk rows, batch by batch"""
+    stats = {"sessions": 0, "rows": 0, "bytes": 0}
+    for batch in range(max_batches):
+        # A dry run deletes nothing, so it has to page through the matches instead
+        offset = batch * batch_size if dry_run else 0
+        sessions = list(abandoned_uploads(max_age, idle).order_by('id')
+                        .values_list('id', 'upload_id', 'storage_name', 'storage_upload_id')[offset:offset + batch_size])
+        if not sessions:
+            break
+        ids = [session[0] for session in sessions]
+        for _, upload_id, storage_name, storage_upload_id in sessions:
+            # Object storage keeps the parts of an unfinished multipart upload until it is aborted
+            if storage_upload_id and not dry_run:
+                get_storage().abort_upload(upload_id, storage_name, storage_upload_id)
+            # A completion job that died after finishing the storage upload left the
+            # assembled file behind, with no row pointing at it once the session is gone
+            stats["bytes"] += _remove_finished_upload(storage_name or get_upload_storage_name(upload_id), dry_run)
+            chunks_dir = os.path.join(settings.MEDIA_ROOT, TEMP_CHUNKS_DIR, upload_id)
+            stats["bytes"] += _directory_size(chunks_dir) if dry_run else _remove_path(chunks_dir)
+        stats["sessions"] += len(ids)
+        if dry_run:
+            stats["rows"] += len(ids) + FileChunk.objects.filter(user_file_id__in=ids).count()
+            continue
+        with transaction.atomic():
+            user_ids = set(UserFiles.objects.filter(id__in=ids).values_list('user_id', flat=True))
+            chunk_rows, _ = FileChunk.objects.filter(user_file_id__in=ids).delete()
+            session_rows, _ = UserFiles.objects.filter(id__in=ids, is_upload_complete=False).delete()
+            for user_id in user_ids:
+                invalidate_user_stats(user_id)
+        stats["rows"] += chunk_rows + session_rows
+        if len(sessions) == batch_size:
+            time.sleep(pause)
+    return stats
+
+def compact_completed_chunk_rows(batch_size: int, pause: float, max_batches: int,
+                                 dry_run: bool = False) -> int:
+    """Drop FileChunk rows left behind by uploads that have already completed"""
+    completed = FileChunk.objects.filter(user_file__is_upload_complete=True)
+    if dry_run:
+        return completed.count()
+    deleted = 0
+    for batch in range(max_batches):
+        ids = list(completed.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        count, _ = FileChunk.objects.filter(id__in=ids).delete()
+        deleted += count
+        if len(ids) == batch_size:
+            time.sleep(pause)
+    return deleted
+
+def sweep_orphaned_temp_data(idle: timedelta, dry_run: bool = False) -> int:
+    """
+    Remove temp_chunks directories with no incomplete session and stale blob
+    temp files left by interrupted writes; returns bytes reclaimed
+    """
+    cutoff = time.time() - idle.total_seconds()
+    reclaimed = 0
+
+    temp_root = os.path.join(settings.MEDIA_ROOT, TEMP_CHUNKS_DIR)
+    if os.path.isdir(temp_root):
+        names = [entry.name for entry in os.scandir(temp_root)
+                 if entry.is_dir() and entry.stat().st_mtime < cutoff]
+        live = set(UserFiles.objects.filter(upload_id__in=names, is_upload_complete=False)
+                   .values_list('upload_id', flat=True))
+        for name in names:
+            if name not in live:
+                path = os.path.join(temp_root, name)
+                reclaimed += _directory_size(path) if dry_run else _remove_path(path)
+
+    blob_temp = os.path.join(settings.MEDIA_ROOT, 'blobs', 'tmp')
+    if os.path.isdir(blob_temp):
+        for entry in os.scandir(blob_temp):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                reclaimed += entry.stat().st_size if dry_run else _remove_path(entry.path)
+    return reclaimed
+
+def run_upload_gc(max_age_hours: float = None, idle_hours: float = None, batch_size: int = None,
+                  pause: float = None, max_batches: int = None, dry_run: bool = False) -> Dict[str, int]:
+    """Run every GC step with the configured limits and log what was reclaimed"""
+    max_age = timedelta(hours=max_age_hours if max_age_hours is not None else settings.UPLOAD_GC_MAX_AGE_HOURS)
+    idle = timedelta(hours=idle_hours if idle_hours is not None else settings.UPLOAD_GC_IDLE_HOURS)
+    batch_size = batch_size or settings.UPLOAD_GC_BATCH_SIZE
+    pause = settings.UPLOAD_GC_BATCH_PAUSE if pause is None else pause
+    max_batches = max_batches or settings.UPLOAD_GC_MAX_BATCHES
+
+    started = time.monotonic()
+    sessions = collect_abandoned_uploads(max_age, idle, batch_size, pause, max_batches, dry_run)
+    compacted = compact_completed_chunk_rows(batch_size, pause, max_batches, dry_run)
+    orphaned_bytes = sweep_orphaned_temp_data(idle, dry_run)
+
+    stats = {
+        "sessions_reclaimed": sessions["sessions"],
+        "rows_reclaimed": sessions["rows"] + compacted,
+        "chunk_rows_compacted": compacted,
+        "bytes_reclaimed": sessions["bytes"] + orphaned_bytes,
+        "duration_ms": int((time.monotonic() - started) * 1000),
+        "dry_run": dry_run
+    }
+    logger.info(f"Upload GC: {stats}")
+    return stats
@@ -0,0 +1,169 @@
+import os
+import hashlib
+from functools import wraps
+from typing import Optional
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from project_main import settings
+from .encryption import SegmentedWriter, container_size, STREAM_BLOCK_SIZE, AES_KEY
+from .compression import choose_codec, new_compressor, codec_name, CODEC_NONE
+from .blob_store import new_temp_path
+from .storage import preallocate
+
+class EncryptedUploadedFile(UploadedFile):
+    """
+    An upload that was encrypted as it arrived. There is no plaintext to read:
+    temp_path holds the finished container, ready for store_blob.
+    """
+
+    def __init__(self, name: str, content_type: str, size: int, charset: Optional[str],
+                 temp_path: str, content_hash: str, codec: int, stored_size: int):
+        super().__init__(None, name, content_type, size, charset)
+        self.temp_path = temp_path
+        self.content_hash = content_hash
+        self.codec = codec
+        self.stored_size = stored_size
+
+    @property
+    def compression(self) -> Optional[str]:
+        return codec_name(self.codec)
+
+    def discard(self):
+        """Remove the encrypted temp file if it was not handed to the blob store"""
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+class EncryptingUploadHandler(FileUploadHandler):
+    """
+    Upload handler that hashes, compresses and encrypts the file field as the
+    request body is parsed, writing ciphertext straight to a blob temp file on
+    the same filesystem as the blob store.
+
+    Django's default handlers would spool the plaintext to memory or a temp
+    file first; here only the first block (to choose a codec) and the segments
+    in flight are ever held in memory. Other fields fall through to the next
+    handler.
+    """
+
+    def __init__(self, request=None, field_name: str = 'file'):
+        super().__init__(request)
+        self.target_field = field_name
+        self.active = False
+        self.temp_file = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None,
+                 content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.active = field_name == self.target_field
+        if not self.active:
+            return
+        self.temp_path = new_temp_path()
+        self.temp_file = open(self.temp_path, 'wb')
+        # The request body bounds the file size, so this never reserves too little
+        body_size = int(self.request.META.get('CONTENT_LENGTH') or 0) if self.request is not None else 0
+        preallocate(self.temp_file, container_size(content_length or body_size))
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.sample = bytearray()
+        self.codec = CODEC_NONE
+        self.compressor = None
+        self.writer = None
+        # Keeps the default handlers from opening a spool file of their own
+        raise StopFutureHandlers()
+
+    def _start_writer(self):
+        """Pick the codec from the first block and start the container"""
+        if settings.UPLOAD_COMPRESSION:
+            self.codec = choose_codec(self.file_name, bytes(self.sample))
+        self.compressor = new_compressor(self.codec)
+        self.writer = SegmentedWriter(self.temp_file, AES_KEY, flags=self.codec, workers=settings.ENCRYPT_WORKERS)
+        self._encrypt(bytes(self.sample))
+        self.sample = bytearray()
+
+    def _encrypt(self, data: bytes):
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        if data:
+            self.writer.write(data)
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        self.hasher.update(raw_data)
+        self.size += len(raw_data)
+        if self.writer is None:
+            self.sample += raw_data
+            if len(self.sample) >= STREAM_BLOCK_SIZE:
+                self._start_writer()
+        else:
+            self._encrypt(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+        try:
+            if self.writer is None:
+                self._start_writer()
+            if self.compressor is not None:
+                self.writer.write(self.compressor.flush())
+            self.writer.close()
+            self.temp_file.truncate()
+            stored_size = self.temp_file.tell()
+        except Exception:
+            self._cleanup()
+            raise
+        self.temp_file.close()
+        return EncryptedUploadedFile(
+            name=self.file_name,
+            content_type=self.content_type,
+            size=self.size,
+            charset=self.charset,
+            temp_path=self.temp_path,
+            content_hash=self.hasher.hexdigest(),
+            codec=self.codec,
+            stored_size=stored_size
+        )
+
+    def upload_interrupted(self):
+        if self.active:
+            self.active = False
+            self._cleanup()
+
+    def _cleanup(self):
+        if self.writer is not None:
+            self.writer.abort()
+        self.temp_file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+def encrypt_uploaded_file(file: UploadedFile) -> EncryptedUploadedFile:
+    """Run an already-received upload through EncryptingUploadHandler"""
+    if isinstance(file, EncryptedUploadedFile):
+        return file
+    handler = EncryptingUploadHandler()
+    try:
+        handler.new_file(handler.target_field, file.name, file.content_type, file.size, file.charset)
+    except StopFutureHandlers:
+        pass
+    try:
+        for chunk in file.chunks(STREAM_BLOCK_SIZE):
+            handler.receive_data_chunk(chunk, handler.size)
+    except Exception:
+        handler.upload_interrupted()
+        raise
+    return handler.file_complete(handler.size)
+
+def encrypt_uploads_on_receipt(field_name: str = 'file'):
+    """
+    View decorator installing EncryptingUploadHandler ahead of Django's own
+    handlers; it has to run before anything touches request.FILES.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            request.upload_handlers.insert(0, EncryptingUploadHandler(request, field_name))
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,78 @@
+import time
+import logging
+from typing import Dict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from ..models import UserFiles, FileDownloadTransaction, UserUsage
+from .stats_cache import invalidate_user_stats
+
+logger = logging.getLogger(__name__)
+
+def stored_files(user_id: int):
+    """Files that count towards usage: those with content (unfinished chunked uploads have none)"""
+    return UserFiles.objects.filter(user_id=user_id).exclude(file='')
+
+def recompute_usage(user_id: int) -> UserUsage:
+    """Recount a user's usage from their files and downloads and store it"""
+    totals = stored_files(user_id).aggregate(file_count=Count('id'), total_bytes=Sum('file_size'))
+    usage, _ = UserUsage.objects.update_or_create(user_id=user_id, defaults={
+        "file_count": totals["file_count"],
+        "total_bytes": totals["total_bytes"] or 0,
+        "total_downloads": FileDownloadTransaction.objects.filter(file__user_id=user_id, is_partial=False).count()
+    })
+    return usage
+
+def adjust_usage(user_id: int, files: int = 0, size: int = 0, downloads: int = 0):
+    """
+    Apply deltas to a user's usage and drop their cached statistics. Call
+    inside the transaction making the change, after it: a user without a row
+    yet is recounted instead, which already includes it.
+    """
+    rows = UserUsage.objects.filter(user_id=user_id)
+    deltas = {
+        "file_count": F('file_count') + files,
+        "total_bytes": F('total_bytes') + size,
+        "total_downloads": F('total_downloads') + downloads,
+        "updated_at": timezone.now()
+    }
+    invalidate_user_stats(user_id)
+    if rows.update(**deltas):
+        return
+    try:
+        with transaction.atomic():
+            recompute_usage(user_id)
+    except IntegrityError:
+        # Created concurrently, possibly without this change
+        rows.update(**deltas)
+
+def record_file_stored(user_file: UserFiles):
+    adjust_usage(user_file.user_id, files=1, size=user_file.file_size)
+
+def record_file_removed(user_file: UserFiles, downloads: int):
+    """downloads: full downloads of the file, which go with it"""
+    adjust_usage(user_file.user_id, files=-1, size=-user_file.file_size, downloads=-downloads)
+
+def record_downloads(counts_by_file: dict):
+    """Add {file_id: full downloads} to the usage of the files' owners"""
+    counts_by_user = {}
+    for file_id, user_id in UserFiles.objects.filter(id__in=counts_by_file).values_list('id', 'user_id'):
+        counts_by_user[user_id] = counts_by_user.get(user_id, 0) + counts_by_file[file_id]
+    for user_id, count in counts_by_user.items():
+        adjust_usage(user_id, downloads=count)
+
+def get_usage(user) -> UserUsage:
+    """A user's usage row, counted on first use"""
+    return UserUsage.objects.filter(user=user).first() or recompute_usage(user.id)
+
+def rebuild_usage() -> Dict[str, int]:
+    """Recount every user's usage, e.g. after files were removed outside the API"""
+    started = time.monotonic()
+    user_ids = set(UserFiles.objects.values_list('user_id', flat=True).distinct())
+    user_ids |= set(UserUsage.objects.values_list('user_id', flat=True))
+    for user_id in sorted(user_ids):
+        with transaction.atomic():
+            recompute_usage(user_id)
+    stats = {"users": len(user_ids), "duration_ms": int((time.monotonic() - started) * 1000)}
+    logger.info(f"Rebuilt user usage: {stats}")
+    return stats
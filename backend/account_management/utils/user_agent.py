@@ -0,0 +1,90 @@
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+class UserAgentInfo(NamedTuple):
+    browser: str
+    os: str
+    device: str
+
+def extract_device_from_user_agent(user_agent):
+    """Extract device type from user agent string"""
+    if not user_agent:
+        return "Unknown"
+
+    user_agent = user_agent.lower()
+
+    if "mobile" in user_agent or "android" in user_agent or "iphone" in user_agent:
+        if "android" in user_agent:
+            return "Android Mobile"
+        elif "iphone" in user_agent or "ios" in user_agent:
+            return "iPhone"
+        else:
+            return "Mobile"
+    elif "tablet" in user_agent or "ipad" in user_agent:
+        if "ipad" in user_agent:
+            return "iPad"
+        else:
+            return "Tablet"
+    elif "windows" in user_agent:
+        return "Windows Desktop"
+    elif "mac" in user_agent and "iphone" not in user_agent and "ipad" not in user_agent:
+        return "Mac Desktop"
+    elif "linux" in user_agent:
+        return "Linux Desktop"
+    else:
+        return "Desktop"
+
+def extract_browser_from_user_agent(user_agent):
+    """Extract browser from user agent string"""
+    if not user_agent:
+        return "Unknown"
+
+    user_agent = user_agent.lower()
+
+    # Edge and Opera also announce Chrome, and every iOS browser announces Safari,
+    # so the specific tokens are checked first
+    if "edg/" in user_agent or "edge/" in user_agent or "edga/" in user_agent or "edgios/" in user_agent:
+        return "Edge"
+    elif "opr/" in user_agent or "opera" in user_agent:
+        return "Opera"
+    elif "firefox" in user_agent or "fxios" in user_agent:
+        return "Firefox"
+    elif "chrome" in user_agent or "crios" in user_agent or "chromium" in user_agent:
+        return "Chrome"
+    elif "safari" in user_agent:
+        return "Safari"
+    elif "msie" in user_agent or "trident" in user_agent:
+        return "Internet Explorer"
+    else:
+        return "Other"
+
+def extract_os_from_user_agent(user_agent):
+    """Extract operating system from user agent string"""
+    if not user_agent:
+        return "Unknown"
+
+    user_agent = user_agent.lower()
+
+    if "android" in user_agent:
+        return "Android"
+    elif "iphone" in user_agent or "ipad" in user_agent or "ipod" in user_agent:
+        return "iOS"
+    elif "windows" in user_agent:
+        return "Windows"
+    elif "cros " in user_agent:
+        return "ChromeOS"
+    elif "mac os" in user_agent or "macintosh" in user_agent:
+        return "macOS"
+    elif "linux" in user_agent:
+        return "Linux"
+    else:
+        return "Other"
+
+@lru_cache(maxsize=4096)
+def classify_user_agent(user_agent: Optional[str]) -> UserAgentInfo:
+    """Browser, OS and device of a user agent; memoized, since a site sees few distinct agents"""
+    return UserAgentInfo(
+        browser=extract_browser_from_user_agent(user_agent),
+        os=extract_os_from_user_agent(user_agent),
+        device=extract_device_from_user_agent(user_agent)
+    )
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-chunk vs batch chunk uploads
+
+Uploads the same payload through /api/upload-chunk/{upload_id} (one request per
+chunk) and /api/upload-chunk/batch/{upload_id} (several chunks per request) at
+64 KB, 1 MB and 8 MB chunk sizes and prints the throughput of each.
+
+Requires the Django server to be running on http://localhost:8000.
+
+Usage:
+    python benchmark_chunk_upload.py [total_mb] [batch_mb]
+"""
+import os
+import sys
+import time
+import hashlib
+import requests
+
+BASE_URL = "http://localhost:8000/api"
+CHUNK_SIZES = [64 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+
+def get_token():
+    """Register a throwaway user and log in"""
+    suffix = int(time.time() * 1000)
+    credentials = {
+        "username": f"bench_{suffix}",
+        "email": f"bench_{suffix}@example.com",
+        "password": "benchmarkpassword123"
+    }
+    requests.post(f"{BASE_URL}/signup", json=credentials).raise_for_status()
+    response = requests.post(f"{BASE_URL}/login", json={
+        "email": credentials["email"],
+        "password": credentials["password"]
+    })
+    response.raise_for_status()
+    return response.json()["access"]
+
+def init_upload(session, payload, chunk_size):
+    total_chunks = -(-len(payload) // chunk_size)
+    response = session.post(f"{BASE_URL}/upload-chunk/init", json={
+        "file_title": "benchmark",
+        "file_name": "benchmark.bin",
+        "file_size": len(payload),
+        "total_chunks": total_chunks,
+        "chunk_size": chunk_size
+    })
+    response.raise_for_status()
+    return response.json()["upload_id"], total_chunks
+
+def cancel_upload(session, upload_id):
+    session.delete(f"{BASE_URL}/upload-chunk/cancel/{upload_id}")
+
+def upload_single(session, payload, chunk_size):
+    upload_id, total_chunks = init_upload(session, payload, chunk_size)
+    started = time.perf_counter()
+    for chunk_number in range(total_chunks):
+        chunk = payload[chunk_number * chunk_size:(chunk_number + 1) * chunk_size]
+        response = session.post(
+            f"{BASE_URL}/upload-chunk/{upload_id}",
+            data={"chunk_number": chunk_number, "chunk_hash": hashlib.md5(chunk).hexdigest()},
+            files={"chunk": ("chunk", chunk)}
+        )
+        response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    cancel_upload(session, upload_id)
+    return elapsed
+
+def upload_batch(session, payload, chunk_size, batch_bytes):
+    upload_id, total_chunks = init_upload(session, payload, chunk_size)
+    per_batch = max(1, batch_bytes // chunk_size)
+    started = time.perf_counter()
+    for first in range(0, total_chunks, per_batch):
+        numbers = list(range(first, min(first + per_batch, total_chunks)))
+        chunks = [payload[n * chunk_size:(n + 1) * chunk_size] for n in numbers]
+        response = session.post(
+            f"{BASE_URL}/upload-chunk/batch/{upload_id}",
+            data={
+                "chunk_numbers": numbers,
+                "chunk_hashes": [hashlib.md5(chunk).hexdigest() for chunk in chunks]
+            },
+            files=[("chunks", (f"chunk_{n}", chunk)) for n, chunk in zip(numbers, chunks)]
+        )
+        response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    cancel_upload(session, upload_id)
+    return elapsed
+
+def main():
+    total_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    batch_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    payload = os.urandom(total_mb * 1024 * 1024)
+
+    try:
+        token = get_token()
+    except requests.exceptions.ConnectionError:
+        print("❌ Could not connect to Django server. Make sure it's running on http://localhost:8000")
+        return
+
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+
+    print(f"Uploading {total_mb} MB per run, batch requests carry ~{batch_mb} MB")
+    print(f"{'chunk size':>10} {'single MB/s':>12} {'batch MB/s':>11} {'speedup':>8}")
+    for chunk_size in CHUNK_SIZES:
+        single = upload_single(session, payload, chunk_size)
+        batch = upload_batch(session, payload, chunk_size, batch_mb * 1024 * 1024)
+        label = f"{chunk_size // 1024} KB" if chunk_size < 1024 * 1024 else f"{chunk_size // (1024 * 1024)} MB"
+        print(f"{label:>10} {total_mb / single:>12.1f} {total_mb / batch:>11.1f} {single / batch:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark for parallel segment encryption
+
+Encrypts the same in-memory payload with SegmentedWriter (as whole-file
+uploads do) using 1, 2, 4 and 8
+worker threads and prints the throughput of each, next to a sequential
+AES-CBC pass producing the legacy format.
+
+Usage:
+    python benchmark_parallel_encryption.py [size_mb] [workers ...]
+"""
+import os
+import sys
+import time
+
+DEFAULT_WORKERS = [1, 2, 4, 8]
+
+class NullSink:
+    """Discards output so the numbers measure the cipher, not the disk"""
+
+    def write(self, data):
+        return len(data)
+
+def blocks(payload, block_size):
+    for offset in range(0, len(payload), block_size):
+        yield payload[offset:offset + block_size]
+
+def time_cbc(payload):
+    from cryptography.hazmat.primitives import padding
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from account_management.utils.encryption import STREAM_BLOCK_SIZE, AES_KEY
+    started = time.perf_counter()
+    # Legacy layout: IV + AES-CBC over the PKCS7-padded payload
+    padder = padding.PKCS7(128).padder()
+    encryptor = Cipher(algorithms.AES(AES_KEY), modes.CBC(os.urandom(16))).encryptor()
+    for block in blocks(payload, STREAM_BLOCK_SIZE):
+        encryptor.update(padder.update(block))
+    encryptor.update(padder.finalize())
+    encryptor.finalize()
+    return time.perf_counter() - started
+
+def time_segmented(payload, workers):
+    from account_management.utils.encryption import SegmentedWriter, STREAM_BLOCK_SIZE, AES_KEY
+    started = time.perf_counter()
+    writer = SegmentedWriter(NullSink(), AES_KEY, workers=workers)
+    for block in blocks(payload, STREAM_BLOCK_SIZE):
+        writer.write(block)
+    writer.close()
+    return time.perf_counter() - started
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    workers = [int(n) for n in sys.argv[2:]] or DEFAULT_WORKERS
+    payload = os.urandom(size_mb * 1024 * 1024)
+
+    print(f"Encrypting {size_mb} MB on {os.cpu_count()} CPUs")
+    print(f"{'mode':>16} {'seconds':>9} {'MB/s':>8} {'speedup':>8}")
+    cbc = time_cbc(payload)
+    print(f"{'CBC (legacy)':>16} {cbc:>9.2f} {size_mb / cbc:>8.1f} {'':>8}")
+    baseline = None
+    for count in workers:
+        elapsed = time_segmented(payload, count)
+        baseline = baseline or elapsed
+        label = f"GCM {count} worker{'s' if count > 1 else ''}"
+        print(f"{label:>16} {elapsed:>9.2f} {size_mb / elapsed:>8.1f} {baseline / elapsed:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
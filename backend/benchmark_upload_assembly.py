@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark for chunked upload completion
+
+For each file size, runs the server-side path of a chunked upload in a fresh
+subprocess against a throwaway database and media root: chunks are sealed into
+their segments as they would be on arrival (untimed), then
+assemble_chunked_upload completes the upload, including the declared SHA-256
+check that reads the whole file back. Reports the completion time and the peak
+RSS of the subprocess.
+
+Usage:
+    python benchmark_upload_assembly.py                 # 10MB 100MB 1GB 5GB
+    python benchmark_upload_assembly.py 10MB 500MB      # custom sizes
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import subprocess
+
+CHUNK_SIZE = 5 * 1024 * 1024  # 5 MiB, same as the frontend default
+DEFAULT_SIZES = ['10MB', '100MB', '1GB', '5GB']
+UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+def parse_size(value):
+    """Parse sizes like 10MB or 5GB into bytes"""
+    value = value.upper()
+    for unit, factor in UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+def setup_django(work_dir):
+    """Point the project at a database and media root inside work_dir and create the schema"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_main.settings')
+    from project_main import settings
+    settings.MEDIA_ROOT = os.path.join(work_dir, 'media')
+    settings.DATABASES['default']['NAME'] = os.path.join(work_dir, 'db.sqlite3')
+    settings.FILE_STORAGE_BACKEND = 'local'
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+def receive_chunks(file_size):
+    """Create an upload session and seal every chunk into storage, as the chunk endpoints do"""
+    from django.contrib.auth.models import User
+    from account_management.models import UserFiles
+    from account_management.utils.encryption import new_container_header, encrypt_segment, AES_KEY
+    from account_management.utils.storage import get_storage
+    from account_management.utils.upload_assembly import get_upload_storage_name
+
+    upload_id = 'benchmark'
+    total_chunks = -(-file_size // CHUNK_SIZE)
+    header = new_container_header(CHUNK_SIZE)
+    name = get_upload_storage_name(upload_id)
+    storage = get_storage()
+    token = storage.start_upload(upload_id, name, header)
+
+    pattern = os.urandom(CHUNK_SIZE)
+    digest = hashlib.sha256()
+    for index in range(total_chunks):
+        chunk = pattern[:min(CHUNK_SIZE, file_size - index * CHUNK_SIZE)]
+        digest.update(chunk)
+        sealed = encrypt_segment(header, AES_KEY, index, chunk, is_last=index == total_chunks - 1)
+        storage.write_segment(upload_id, name, token, index, CHUNK_SIZE, header, sealed)
+
+    user = User.objects.create_user('benchmark', 'benchmark@example.com', 'benchmarkpassword123')
+    return UserFiles.objects.create(
+        file_title='benchmark', user=user, file_name='benchmark.bin', file_size=file_size,
+        upload_id=upload_id, total_chunks=total_chunks, chunk_size=CHUNK_SIZE,
+        uploaded_chunks=total_chunks, content_hash=digest.hexdigest(), container_header=header,
+        storage_name=name, storage_upload_id=token, file=''
+    )
+
+def run_assembly(work_dir, file_size):
+    """Child process entry point: complete an upload of file_size bytes and print stats as JSON"""
+    import resource
+    setup_django(work_dir)
+    from account_management.utils.upload_assembly import assemble_chunked_upload
+
+    user_file = receive_chunks(file_size)
+    started = time.perf_counter()
+    assemble_chunked_upload(user_file.pk)
+    elapsed = time.perf_counter() - started
+
+    # ru_maxrss is reported in KB on Linux
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"bytes": file_size, "seconds": elapsed, "peak_rss_kb": peak_rss_kb}))
+
+def benchmark(file_size):
+    work_dir = tempfile.mkdtemp(prefix='assembly_bench_')
+    try:
+        result = subprocess.run(
+            [sys.executable, __file__, '--child', work_dir, str(file_size)],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_assembly(sys.argv[2], int(sys.argv[3]))
+        return
+
+    sizes = sys.argv[1:] or DEFAULT_SIZES
+    print(f"{'size':>8} {'peak RSS (MB)':>14} {'seconds':>9} {'MB/s':>8}")
+    for label in sizes:
+        stats = benchmark(parse_size(label))
+        mb = stats["bytes"] / (1024 * 1024)
+        print(f"{label:>8} {stats['peak_rss_kb'] / 1024:>14.1f} {stats['seconds']:>9.2f} {mb / stats['seconds']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Load test for concurrent slow downloads, WSGI vs ASGI
+
+Opens N downloads of the same file at once, each reading at a mobile-like
+rate for --hold seconds, and reports how many were actually being served
+(response headers received before --timeout) for each deployment. A WSGI
+server can serve only as many transfers as it has threads; under uvicorn the
+/api/async/ endpoints keep serving while the others wait on the network.
+
+Start both deployments against the same database and media, e.g.:
+    gunicorn project_main.wsgi -w 4 --threads 8 -b 127.0.0.1:8000
+    uvicorn project_main.asgi:application --workers 4 --port 8001
+
+Usage:
+    python loadtest_transfers.py --token <JWT> --file-id 1 \\
+        --target wsgi=http://127.0.0.1:8000/api \\
+        --target asgi=http://127.0.0.1:8001/api/async \\
+        --connections 100 500 1000 2000
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+import aiohttp
+
+READ_SIZE = 16 * 1024
+
+async def slow_download(session, url, token, hold, read_rate, timeout):
+    """One client: wait for headers, then trickle the body for hold seconds"""
+    started = time.perf_counter()
+    try:
+        async with session.get(url, headers={'Authorization': f'Bearer {token}'},
+                               timeout=aiohttp.ClientTimeout(total=None, sock_connect=timeout,
+                                                             sock_read=timeout)) as response:
+            ttfb = time.perf_counter() - started
+            if response.status != 200:
+                return 'error', ttfb
+            while time.perf_counter() - started < hold:
+                chunk = await response.content.read(READ_SIZE)
+                if not chunk:
+                    break
+                await asyncio.sleep(len(chunk) / read_rate)
+            return 'served', ttfb
+    except asyncio.TimeoutError:
+        return 'timeout', None
+    except aiohttp.ClientError:
+        return 'error', None
+
+async def run_round(url, token, connections, hold, read_rate, timeout):
+    connector = aiohttp.TCPConnector(limit=0, force_close=True)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        return await asyncio.gather(*(slow_download(session, url, token, hold, read_rate, timeout)
+                                      for _ in range(connections)))
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare concurrent slow-download capacity of WSGI and ASGI")
+    parser.add_argument('--target', action='append', required=True,
+                        help="name=base URL of the API, e.g. asgi=http://127.0.0.1:8001/api/async")
+    parser.add_argument('--token', required=True, help="JWT access token of the file's owner")
+    parser.add_argument('--file-id', type=int, required=True)
+    parser.add_argument('--connections', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--hold', type=float, default=20.0, help="Seconds each client keeps reading")
+    parser.add_argument('--read-rate', type=int, default=64 * 1024, help="Bytes per second per client")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Seconds to wait for headers")
+    args = parser.parse_args()
+
+    print(f"{'target':>8} {'conns':>6} {'served':>7} {'timeout':>8} {'error':>6} {'ttfb p50':>9} {'ttfb p95':>9}")
+    for target in args.target:
+        name, base_url = target.split('=', 1)
+        url = f"{base_url.rstrip('/')}/download-file/{args.file_id}"
+        for connections in args.connections:
+            results = asyncio.run(run_round(url, args.token, connections, args.hold, args.read_rate, args.timeout))
+            outcomes = [outcome for outcome, _ in results]
+            ttfbs = [ttfb for outcome, ttfb in results if outcome == 'served']
+            print(f"{name:>8} {connections:>6} {outcomes.count('served'):>7} {outcomes.count('timeout'):>8} "
+                  f"{outcomes.count('error'):>6} {statistics.median(ttfbs) if ttfbs else float('nan'):>9.3f} "
+                  f"{percentile(ttfbs, 0.95):>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -100,6 +100,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent read-modify-write
+            # transactions (e.g. chunk bitmap updates) queue up instead of failing
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # On disk rather than shared in-memory, so tests running concurrent
+        # connections wait for the write lock as they would in production
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -157,3 +165,66 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+
+# Chunked upload configuration
+# Per-chunk FileChunk rows are optional; the received-chunk bitmap on UserFiles is authoritative
+UPLOAD_TRACK_CHUNK_ROWS = os.getenv('UPLOAD_TRACK_CHUNK_ROWS', 'False') == 'True'
+# /upload-chunk/batch sends one file part per chunk; allow e.g. 8 MB of 64 KB chunks in one body
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.getenv('DATA_UPLOAD_MAX_NUMBER_FILES', '256'))
+# /upload-chunk/complete assembles the file inline; set True to assemble it in a Celery job and answer 202
+# (needs a running broker and worker)
+UPLOAD_COMPLETE_ASYNC = os.getenv('UPLOAD_COMPLETE_ASYNC', 'False') == 'True'
+# A completion job that has not reported progress for this long is replaced by the next completion request
+UPLOAD_COMPLETE_STALE_SECONDS = int(os.getenv('UPLOAD_COMPLETE_STALE_SECONDS', '600'))
+
+# Threads sealing encrypted segments of whole-file uploads (see benchmark_parallel_encryption.py)
+ENCRYPT_WORKERS = int(os.getenv('ENCRYPT_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Where encrypted files are stored: 'local' (MEDIA_ROOT) or 's3' (any S3-compatible service, needs boto3).
+# S3 credentials come from the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY environment variables.
+FILE_STORAGE_BACKEND = os.getenv('FILE_STORAGE_BACKEND', 'local')
+S3_BUCKET = os.getenv('S3_BUCKET', '')
+S3_PREFIX = os.getenv('S3_PREFIX', '')
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL', '')  # e.g. http://localhost:9000 for MinIO
+S3_REGION = os.getenv('S3_REGION', '')
+
+# Compress whole-file uploads before encryption when the first block compresses well (zstd if installed, else zlib)
+UPLOAD_COMPRESSION = os.getenv('UPLOAD_COMPRESSION', 'True') == 'True'
+
+# Download transactions are buffered in process and bulk-inserted every DOWNLOAD_LOG_FLUSH_SECONDS
+# (or every DOWNLOAD_LOG_BATCH_SIZE events), with an append-only journal per process so a crash
+# loses nothing (manage.py flush_download_log replays leftover journals). False writes each row inline.
+DOWNLOAD_LOG_BUFFERED = os.getenv('DOWNLOAD_LOG_BUFFERED', 'True') == 'True'
+DOWNLOAD_LOG_BATCH_SIZE = int(os.getenv('DOWNLOAD_LOG_BATCH_SIZE', '500'))
+DOWNLOAD_LOG_FLUSH_SECONDS = float(os.getenv('DOWNLOAD_LOG_FLUSH_SECONDS', '2'))
+DOWNLOAD_LOG_FSYNC = os.getenv('DOWNLOAD_LOG_FSYNC', 'False') == 'True'  # Also survive power loss, at an fsync per download
+DOWNLOAD_LOG_JOURNAL_DIR = os.getenv('DOWNLOAD_LOG_JOURNAL_DIR', os.path.join(BASE_DIR, 'download_journal'))
+
+# Statistics responses are cached per user until that user's files or downloads change.
+# The default local-memory cache is per process: with several workers (or Celery completing
+# uploads) set CACHE_REDIS_URL so invalidations reach every process. 0 seconds disables it.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '')
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_REDIS_URL}
+    if CACHE_REDIS_URL else {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+STATS_CACHE_SECONDS = int(os.getenv('STATS_CACHE_SECONDS', '300'))
+
+# Content-addressed blob store
+# 'user': a declared file_hash only completes instantly against content the same user already stored
+# 'global': any stored content matches (knowing a file's hash is then enough to obtain it)
+BLOB_INSTANT_UPLOAD_SCOPE = os.getenv('BLOB_INSTANT_UPLOAD_SCOPE', 'user')
+
+# Upload garbage collection (account_management.tasks.cleanup_abandoned_uploads / manage.py cleanup_uploads)
+UPLOAD_GC_MAX_AGE_HOURS = float(os.getenv('UPLOAD_GC_MAX_AGE_HOURS', '72'))  # Incomplete uploads older than this are reclaimed
+UPLOAD_GC_IDLE_HOURS = float(os.getenv('UPLOAD_GC_IDLE_HOURS', '24'))  # ...as are ones with no chunk activity for this long
+UPLOAD_GC_BATCH_SIZE = int(os.getenv('UPLOAD_GC_BATCH_SIZE', '200'))
+UPLOAD_GC_BATCH_PAUSE = float(os.getenv('UPLOAD_GC_BATCH_PAUSE', '0.5'))  # Seconds between batches, keeps the DB responsive
+UPLOAD_GC_MAX_BATCHES = int(os.getenv('UPLOAD_GC_MAX_BATCHES', '50'))
+
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-abandoned-uploads': {
+        'task': 'account_management.tasks.cleanup_abandoned_uploads',
+        'schedule': timedelta(hours=1),
+    },
+}
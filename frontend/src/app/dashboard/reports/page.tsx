@@ -71,32 +71,20 @@ const Reports = () => {
     setError("");
 
     try {
-      // Fetch all three APIs in parallel
-      const [downloadsRes, uploadsRes, deviceRes] = await Promise.all([
-        fetch(STATS_ENDPOINTS.DAILY_DOWNLOADS, {
-          headers: API_UTILS.createFormDataHeaders(access)
-        }),
-        fetch(STATS_ENDPOINTS.DAILY_UPLOADS, {
-          headers: API_UTILS.createFormDataHeaders(access)
-        }),
-        fetch(STATS_ENDPOINTS.DEVICE_DOWNLOADS_PIE, {
-          headers: API_UTILS.createFormDataHeaders(access)
-        })
-      ]);
+      // All three charts in one request
+      const res = await fetch(`${STATS_ENDPOINTS.DASHBOARD}?sections=daily_downloads,daily_uploads,device_pie`, {
+        headers: API_UTILS.createFormDataHeaders(access)
+      });
 
-      if (!downloadsRes.ok || !uploadsRes.ok || !deviceRes.ok) {
+      if (!res.ok) {
         throw new Error("Failed to fetch statistics data");
       }
 
-      const [downloadsData, uploadsData, deviceStatsData] = await Promise.all([
-        downloadsRes.json(),
-        uploadsRes.json(),
-        deviceRes.json()
-      ]);
+      const dashboard = await res.json();
 
-      setDownloadData(downloadsData);
-      setUploadData(uploadsData);
-      setDeviceData(deviceStatsData);
+      setDownloadData(dashboard.daily_downloads);
+      setUploadData(dashboard.daily_uploads);
+      setDeviceData(dashboard.device_pie);
     } catch (err: any) {
       setError(err.message || "Failed to fetch statistics");
     } finally {
@@ -4,7 +4,7 @@ import { Upload, X, FileText, AlertCircle, CheckCircle, Pause, Play, RotateCcw }
 import { useSelector } from 'react-redux';
 import CryptoJS from 'crypto-js';
 import type { RootState } from '@/store/store';
-import { FILE_ENDPOINTS, API_UTILS } from '@/config/endpoints';
+import { FILE_ENDPOINTS, API_UTILS, MIN_CHUNK_SIZE } from '@/config/endpoints';
 
 interface ChunkedUploadResponse {
   upload_id: string;
@@ -31,13 +31,17 @@ interface UploadStatus {
   is_complete: boolean;
   progress_percentage: number;
   missing_chunks: number[];
+  completion_phase?: string | null;
+  completion_bytes_done?: number;
+  completion_bytes_total?: number;
+  completion_error?: string | null;
 }
 
 interface ChunkedFileUploadProps {
   onUploadComplete?: (fileId: number) => void;
   onUploadError?: (error: string) => void;
   maxFileSize?: number; // in bytes, default 100MB
-  chunkSize?: number; // in bytes, default 1MB
+  chunkSize?: number; // in bytes, default and minimum 5MB
   acceptedFileTypes?: string[];
   className?: string;
   showProgress?: boolean;
@@ -57,15 +61,20 @@ interface UploadState {
   retryCount: number;
 }
 
+// Polling of a background completion job
+const COMPLETION_POLL_INTERVAL_MS = 1000;
+const COMPLETION_STALL_TIMEOUT_MS = 2 * 60 * 1000;
+
 const ChunkedFileUpload: React.FC<ChunkedFileUploadProps> = ({
   onUploadComplete,
   onUploadError,
   maxFileSize = 100 * 1024 * 1024, // 100MB
-  chunkSize = 1024 * 1024, // 1MB
+  chunkSize: requestedChunkSize = MIN_CHUNK_SIZE,
   acceptedFileTypes = [],
   className = "",
   showProgress = true
 }) => {
+  const chunkSize = Math.max(requestedChunkSize, MIN_CHUNK_SIZE);
   const { access } = useSelector((state: RootState) => state.auth);
   const fileInputRef = useRef<HTMLInputElement>(null);
   
@@ -172,6 +181,27 @@ const ChunkedFileUpload: React.FC<ChunkedFileUploadProps> = ({
     return await response.json();
   };
 
+  // The server assembles the file in a background job (202); poll until it is done,
+  // giving up once the job has made no progress for COMPLETION_STALL_TIMEOUT_MS
+  const waitForCompletion = async (uploadId: string): Promise<void> => {
+    let lastProgress = '';
+    let lastProgressAt = Date.now();
+    while (Date.now() - lastProgressAt < COMPLETION_STALL_TIMEOUT_MS) {
+      await new Promise(resolve => setTimeout(resolve, COMPLETION_POLL_INTERVAL_MS));
+      const status = await getUploadStatus(uploadId);
+      if (status.is_complete) return;
+      if (status.completion_phase === 'failed') {
+        throw new Error(status.completion_error || 'Failed to complete upload');
+      }
+      const progress = `${status.completion_phase}:${status.completion_bytes_done}`;
+      if (progress !== lastProgress) {
+        lastProgress = progress;
+        lastProgressAt = Date.now();
+      }
+    }
+    throw new Error('Upload completion timed out, please try again');
+  };
+
   // Complete upload
   const completeUpload = async (uploadId: string): Promise<void> => {
     console.log('Completing upload for ID:', uploadId);
@@ -213,6 +243,10 @@ const ChunkedFileUpload: React.FC<ChunkedFileUploadProps> = ({
       throw new Error(errorData.detail || 'Failed to complete upload');
     }
 
+    if (response.status === 202) {
+      await waitForCompletion(uploadId);
+    }
+
     console.log('Upload completed successfully');
   };
 
@@ -2,6 +2,7 @@
 import React, { useState } from 'react';
 import { Upload, Loader2, CheckCircle, AlertCircle } from 'lucide-react';
 import useChunkedUpload from '@/hooks/useChunkedUpload';
+import { MIN_CHUNK_SIZE } from '@/config/endpoints';
 
 interface ChunkedUploadButtonProps {
   onUploadComplete?: (fileId: number) => void;
@@ -20,7 +21,7 @@ const ChunkedUploadButton: React.FC<ChunkedUploadButtonProps> = ({
   onUploadComplete,
   onUploadError,
   maxFileSize = 100 * 1024 * 1024, // 100MB
-  chunkSize = 1024 * 1024, // 1MB
+  chunkSize = MIN_CHUNK_SIZE,
   acceptedFileTypes = [],
   className = "",
   buttonText = "Upload File",
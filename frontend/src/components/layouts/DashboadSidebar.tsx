@@ -207,7 +207,7 @@ const DashboardSidebar = ({ onUploadSuccess }: { onUploadSuccess?: () => void })
               onUploadComplete={handleUploadComplete}
               onUploadError={handleUploadError}
               maxFileSize={500 * 1024 * 1024} // 500MB
-              chunkSize={2 * 1024 * 1024} // 2MB chunks
+              chunkSize={5 * 1024 * 1024} // 5MB chunks
               showProgress={true}
               className="w-full"
             />
@@ -243,17 +243,31 @@ export class StatsService extends BaseApiService {
     return this.request(STATS_ENDPOINTS.DEVICE_DOWNLOADS_PIE, { token });
   }
 
+  async getTimeSeries(
+    token: string,
+    metric: 'uploads' | 'downloads' | 'bytes',
+    options: { granularity?: 'hour' | 'day' | 'week' | 'month'; start?: string; end?: string } = {}
+  ) {
+    const params = new URLSearchParams({ metric });
+    Object.entries(options).forEach(([key, value]) => {
+      if (value) params.append(key, value);
+    });
+    return this.request(`${STATS_ENDPOINTS.TIME_SERIES}?${params.toString()}`, { token });
+  }
+
+  async getDashboard(token: string, sections?: string[]) {
+    const query = sections && sections.length ? `?sections=${sections.join(',')}` : '';
+    return this.request(`${STATS_ENDPOINTS.DASHBOARD}${query}`, { token });
+  }
+
   async getAllStatistics(token: string) {
-    const [downloads, uploads, deviceStats] = await Promise.all([
-      this.getDailyDownloads(token),
-      this.getDailyUploads(token),
-      this.getDeviceDownloadsPie(token),
-    ]);
+    // One request for all three charts
+    const dashboard: any = await this.getDashboard(token, ['daily_downloads', 'daily_uploads', 'device_pie']);
 
     return {
-      downloads,
-      uploads,
-      deviceStats,
+      downloads: dashboard.daily_downloads,
+      uploads: dashboard.daily_uploads,
+      deviceStats: dashboard.device_pie,
     };
   }
 }
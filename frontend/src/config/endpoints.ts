@@ -32,6 +32,15 @@ export const BASE_URLS = {
     : 'http://127.0.0.1:3001',
 } as const;
 
+/**
+ * Prefix for the transfer endpoints (chunk upload, upload status, download).
+ * Set NEXT_PUBLIC_ASYNC_TRANSFERS=true when the backend runs under an ASGI
+ * server to use the async variants mounted under /api/async.
+ */
+const TRANSFER_API = process.env.NEXT_PUBLIC_ASYNC_TRANSFERS === 'true'
+  ? `${BASE_URLS.MAIN_API}/api/async`
+  : `${BASE_URLS.MAIN_API}/api`;
+
 // =======================================
 // AUTHENTICATION ENDPOINTS
 // =======================================
@@ -65,15 +74,15 @@ export const FILE_ENDPOINTS = {
   
   // Chunked upload endpoints for large files
   CHUNK_INIT: `${BASE_URLS.MAIN_API}/api/upload-chunk/init`,
-  CHUNK_UPLOAD: (uploadId: string) => `${BASE_URLS.MAIN_API}/api/upload-chunk/${uploadId}`,
-  CHUNK_STATUS: (uploadId: string) => `${BASE_URLS.MAIN_API}/api/upload-chunk/status/${uploadId}`,
+  CHUNK_UPLOAD: (uploadId: string) => `${TRANSFER_API}/upload-chunk/${uploadId}`,
+  CHUNK_STATUS: (uploadId: string) => `${TRANSFER_API}/upload-chunk/status/${uploadId}`,
   CHUNK_COMPLETE: `${BASE_URLS.MAIN_API}/api/upload-chunk/complete`,
   CHUNK_CANCEL: (uploadId: string) => `${BASE_URLS.MAIN_API}/api/upload-chunk/cancel/${uploadId}`,
   
   // File operations
   MY_FILES: `${BASE_URLS.MAIN_API}/api/my-files`,
   FILE_DETAILS: (fileId: number) => `${BASE_URLS.MAIN_API}/api/file/${fileId}`,
-  DOWNLOAD_FILE: (fileId: number) => `${BASE_URLS.MAIN_API}/api/download-file/${fileId}`,
+  DOWNLOAD_FILE: (fileId: number) => `${TRANSFER_API}/download-file/${fileId}`,
   DELETE_FILE: (fileId: number) => `${BASE_URLS.MAIN_API}/api/file/${fileId}`,
   UPDATE_FILE: (fileId: number) => `${BASE_URLS.MAIN_API}/api/file/${fileId}`,
   
@@ -83,6 +92,12 @@ export const FILE_ENDPOINTS = {
   FILE_PREVIEW: (fileId: number) => `${BASE_URLS.MAIN_API}/api/file-preview/${fileId}`,
 } as const;
 
+/**
+ * Smallest chunk size for chunked uploads: with object storage every chunk but
+ * the last becomes a multipart part, which must be at least 5 MiB
+ */
+export const MIN_CHUNK_SIZE = 5 * 1024 * 1024;
+
 // =======================================
 // DOCUMENT MANAGEMENT ENDPOINTS
 // =======================================
@@ -115,6 +130,9 @@ export const STATS_ENDPOINTS = {
   DAILY_DOWNLOADS: `${BASE_URLS.MAIN_API}/api/statistics/daily-downloads`,
   DAILY_UPLOADS: `${BASE_URLS.MAIN_API}/api/statistics/daily-uploads`,
   DEVICE_DOWNLOADS_PIE: `${BASE_URLS.MAIN_API}/api/statistics/device-downloads-pie`,
+  TIME_SERIES: `${BASE_URLS.MAIN_API}/api/statistics/time-series`,
+  DASHBOARD: `${BASE_URLS.MAIN_API}/api/statistics/dashboard`,
+  DOWNLOAD_HISTORY_EXPORT: `${BASE_URLS.MAIN_API}/api/download-history/export`, // ?format=ndjson|csv&start=&end=&file_id=
   MONTHLY_ACTIVITY: `${BASE_URLS.MAIN_API}/api/statistics/monthly-activity`,
   STORAGE_USAGE: `${BASE_URLS.MAIN_API}/api/statistics/storage-usage`,
   TOP_FILES: `${BASE_URLS.MAIN_API}/api/statistics/top-files`,
@@ -1,7 +1,7 @@
 import { useState, useCallback } from 'react';
 import { useSelector } from 'react-redux';
 import type { RootState } from '@/store/store';
-import { FILE_ENDPOINTS, API_UTILS } from '@/config/endpoints';
+import { FILE_ENDPOINTS, API_UTILS, MIN_CHUNK_SIZE } from '@/config/endpoints';
 
 interface ChunkedUploadResponse {
   upload_id: string;
@@ -28,6 +28,10 @@ interface UploadStatus {
   is_complete: boolean;
   progress_percentage: number;
   missing_chunks: number[];
+  completion_phase?: string | null;
+  completion_bytes_done?: number;
+  completion_bytes_total?: number;
+  completion_error?: string | null;
 }
 
 interface UseChunkedUploadOptions {
@@ -54,15 +58,20 @@ interface UseChunkedUploadReturn {
   uploadId: string | null;
 }
 
+// Polling of a background completion job
+const COMPLETION_POLL_INTERVAL_MS = 1000;
+const COMPLETION_STALL_TIMEOUT_MS = 2 * 60 * 1000;
+
 export const useChunkedUpload = (options: UseChunkedUploadOptions = {}): UseChunkedUploadReturn => {
   const {
-    chunkSize = 1024 * 1024, // 1MB default
+    chunkSize: requestedChunkSize = MIN_CHUNK_SIZE,
     maxRetries = 3,
     onProgress,
     onChunkComplete,
     onError,
     onComplete
   } = options;
+  const chunkSize = Math.max(requestedChunkSize, MIN_CHUNK_SIZE);
 
   const { access } = useSelector((state: RootState) => state.auth);
   
@@ -157,6 +166,27 @@ export const useChunkedUpload = (options: UseChunkedUploadOptions = {}): UseChun
     return await response.json();
   }, [access]);
 
+  // The server assembles the file in a background job (202); poll until it is done,
+  // giving up once the job has made no progress for COMPLETION_STALL_TIMEOUT_MS
+  const waitForCompletion = async (uploadId: string): Promise<void> => {
+    let lastProgress = '';
+    let lastProgressAt = Date.now();
+    while (Date.now() - lastProgressAt < COMPLETION_STALL_TIMEOUT_MS) {
+      await new Promise(resolve => setTimeout(resolve, COMPLETION_POLL_INTERVAL_MS));
+      const status = await getUploadStatus(uploadId);
+      if (status.is_complete) return;
+      if (status.completion_phase === 'failed') {
+        throw new Error(status.completion_error || 'Failed to complete upload');
+      }
+      const progress = `${status.completion_phase}:${status.completion_bytes_done}`;
+      if (progress !== lastProgress) {
+        lastProgress = progress;
+        lastProgressAt = Date.now();
+      }
+    }
+    throw new Error('Upload completion timed out, please try again');
+  };
+
   // Complete upload
   const completeUpload = async (uploadId: string): Promise<void> => {
     const response = await fetch(FILE_ENDPOINTS.CHUNK_COMPLETE, {
@@ -171,6 +201,10 @@ export const useChunkedUpload = (options: UseChunkedUploadOptions = {}): UseChun
       const errorData = await response.json().catch(() => ({}));
       throw new Error(errorData.detail || 'Failed to complete upload');
     }
+
+    if (response.status === 202) {
+      await waitForCompletion(uploadId);
+    }
   };
 
   // Main upload function